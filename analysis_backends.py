@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline backends for the Gemini analyzer.
+
+GeminiIELTSAnalyzer uses a small part of the google-genai client:
+models.generate_content, models.generate_content_stream and
+aio.models.generate_content. The clients here implement the same surface, so
+the service can be load- and regression-tested without spending quota:
+
+- RecordingClient wraps a real client and saves every response to a directory;
+- ReplayClient serves saved responses, keyed by model, system instruction,
+  response schema and contents;
+- SyntheticClient generates schema-valid responses from the request's schema.
+
+Replayed and synthetic responses are delayed by a latency distribution and
+fail with injected HTTP errors (e.g. 503, 429) at configured rates; the errors
+carry an HTTP code like the SDK's, so the analyzer's retry policy applies.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# Size of the text chunks a streamed offline response is delivered in
+STREAM_CHUNK_CHARS = 128
+# Share of the latency spent before the first streamed chunk
+STREAM_FIRST_CHUNK = 0.3
+
+_SENTENCE = re.compile(r'[^.!?\n]*[A-Za-z][^.!?\n]*[.!?]')
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+
+
+class BackendError(Exception):
+    """Injected or offline failure, shaped like the SDK's API errors (an HTTP code and a status)."""
+
+    def __init__(self, code, message):
+        super().__init__(f'{code} {message}')
+        self.code = code
+        self.message = message
+
+
+def parse_latency(spec):
+    """Latency distribution from a spec; returns sample(recorded_seconds) -> seconds.
+
+    'fixed:S', 'uniform:LOW:HIGH', 'lognormal:MEDIAN:SIGMA', or 'recorded[:SCALE]' (the
+    latency saved with a recording, scaled; no delay for answers that were not recorded).
+    An empty spec means no delay.
+    """
+    if not spec:
+        return lambda recorded: 0.0
+    kind, *params = spec.split(':')
+    try:
+        values = [float(param) for param in params]
+        if kind == 'fixed':
+            return lambda recorded: values[0]
+        if kind == 'uniform':
+            return lambda recorded: random.uniform(values[0], values[1])
+        if kind == 'lognormal':
+            return lambda recorded: random.lognormvariate(math.log(values[0]), values[1])
+        if kind == 'recorded':
+            scale = values[0] if values else 1.0
+            return lambda recorded: (recorded or 0.0) * scale
+    except (ValueError, IndexError):
+        pass
+    raise ValueError(f'Invalid latency spec {spec!r}')
+
+
+def parse_errors(spec):
+    """Injected failures from 'STATUS:RATE,...' (e.g. '503:0.02,429:0.01') as [(status, rate)]."""
+    errors = []
+    for part in filter(None, (part.strip() for part in (spec or '').split(','))):
+        try:
+            status, rate = part.split(':')
+            errors.append((int(status), float(rate)))
+        except ValueError:
+            raise ValueError(f'Invalid error spec {part!r}')
+    return errors
+
+
+def _field(config, name):
+    return config.get(name) if isinstance(config, dict) else getattr(config, name, None)
+
+
+def _plain(value):
+    """SDK config values (pydantic models, enums) as plain JSON-compatible data."""
+    if hasattr(value, 'model_dump'):
+        value = value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items() if item is not None}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return getattr(value, 'value', value)
+
+
+def request_key(model, contents, config):
+    """Identity of a request for recording and replay."""
+    material = json.dumps([model, _plain(_field(config, 'system_instruction')),
+                           _plain(_field(config, 'response_schema')), _plain(contents)],
+                          sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _usage(prompt_tokens, output_tokens, cached_tokens=None):
+    return SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+                           cached_content_token_count=cached_tokens,
+                           total_token_count=prompt_tokens + output_tokens)
+
+
+def _response(text, usage=None):
+    return SimpleNamespace(text=text, parsed=None, usage_metadata=usage)
+
+
+def _estimated_usage(contents, config, text):
+    prompt = json.dumps(_plain(_field(config, 'system_instruction')), ensure_ascii=False) + str(_plain(contents))
+    return _usage(len(prompt) // 4, len(text) // 4)
+
+
+class _Models:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def generate_content(self, model, contents, config=None):
+        text, usage, latency, error = self._backend.answer(model, contents, config)
+        time.sleep(latency)
+        if error is not None:
+            raise error
+        return _response(text, usage)
+
+    def generate_content_stream(self, model, contents, config=None):
+        text, usage, latency, error = self._backend.answer(model, contents, config)
+        if error is not None:
+            time.sleep(latency)
+            raise error
+        pieces = [text[index:index + STREAM_CHUNK_CHARS] for index in range(0, len(text), STREAM_CHUNK_CHARS)]
+        pieces = pieces or ['']
+        time.sleep(latency * STREAM_FIRST_CHUNK)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(latency * (1 - STREAM_FIRST_CHUNK) / max(len(pieces) - 1, 1))
+            yield _response(piece, usage if index == len(pieces) - 1 else None)
+
+
+class _AsyncModels:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def generate_content(self, model, contents, config=None):
+        text, usage, latency, error = self._backend.answer(model, contents, config)
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        return _response(text, usage)
+
+
+class OfflineClient(abc.ABC):
+    """Base of the offline clients: injects failures, samples latency and counts requests."""
+
+    def __init__(self, latency='', errors=''):
+        self._latency = parse_latency(latency)
+        self._errors = parse_errors(errors)
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'injected_errors': 0}
+        self.models = _Models(self)
+        self.aio = SimpleNamespace(models=_AsyncModels(self))
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def answer(self, model, contents, config):
+        """(text, usage, seconds to wait, error) for a request; error is a BackendError to raise after the wait."""
+        self._count('requests')
+        draw = random.random()
+        for status, rate in self._errors:
+            if draw < rate:
+                self._count('injected_errors')
+                # A failed call still takes a while; fail after a fraction of the usual latency
+                return None, None, max(self._latency(None) * 0.1, 0.0), BackendError(status, 'injected failure')
+            draw -= rate
+        try:
+            text, usage, recorded = self.respond(request_key(model, contents, config), model, contents, config)
+        except BackendError as e:
+            return None, None, 0.0, e
+        return text, usage, max(self._latency(recorded), 0.0), None
+
+    @abc.abstractmethod
+    def respond(self, key, model, contents, config):
+        """(text, usage, recorded latency or None) for a request; raises BackendError when there is no answer."""
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def _synthesize(schema, rng, sentences, words, name=''):
+    """A value matching a (plain) response schema, drawing quotes from the request text."""
+    kind = str(schema.get('type', 'STRING')).upper()
+    if kind == 'OBJECT':
+        properties = schema.get('properties') or {}
+        order = schema.get('propertyOrdering') or list(properties)
+        return {key: _synthesize(properties[key], rng, sentences, words, key) for key in order if key in properties}
+    if kind == 'ARRAY':
+        items = schema.get('items') or {}
+        return [_synthesize(items, rng, sentences, words, name) for _ in range(rng.randint(0, 3))]
+    if kind in ('NUMBER', 'INTEGER'):
+        # Scores: half bands between 4 and 8
+        return rng.randint(8, 16) / 2 if kind == 'NUMBER' else rng.randint(0, 9)
+    if kind == 'BOOLEAN':
+        return rng.random() < 0.5
+    if name in ('original_sentence', 'example') and sentences:
+        return rng.choice(sentences)
+    if name in ('text', 'overused_word', 'marker', 'advanced_words_found') and words:
+        return rng.choice(words)
+    if name in ('suggestion', 'suggestions', 'suggested_rewrites'):
+        return ' '.join(rng.choice(words) for _ in range(6)) if words else 'suggestion'
+    return '模拟分析：' + '，'.join(rng.choice(words) for _ in range(rng.randint(3, 12))) if words else '模拟分析'
+
+
+class SyntheticClient(OfflineClient):
+    """Generates schema-valid responses; the same request always gets the same response."""
+
+    def respond(self, key, model, contents, config):
+        self._count('synthesized')
+        schema = _plain(_field(config, 'response_schema')) or {'type': 'OBJECT'}
+        text = str(_plain(contents))
+        rng = random.Random(key)
+        sentences = [sentence.strip() for sentence in _SENTENCE.findall(text)]
+        words = _WORD.findall(text)
+        answer = json.dumps(_synthesize(schema, rng, sentences, words), ensure_ascii=False)
+        return answer, _estimated_usage(contents, config, answer), None
+
+
+class ReplayClient(OfflineClient):
+    """Serves responses saved by RecordingClient; unknown requests go to fallback (or fail with 404)."""
+
+    def __init__(self, directory, latency='recorded', errors='', fallback=None):
+        super().__init__(latency, errors)
+        self.directory = directory
+        self.fallback = fallback
+
+    def respond(self, key, model, contents, config):
+        try:
+            with open(os.path.join(self.directory, f'{key}.json'), encoding='utf-8') as f:
+                recording = json.load(f)
+        except FileNotFoundError:
+            self._count('missed')
+            if self.fallback is None:
+                raise BackendError(404, f'no recording for request {key[:12]}')
+            return self.fallback.respond(key, model, contents, config)
+        self._count('replayed')
+        usage = recording.get('usage') or {}
+        return (recording['text'],
+                _usage(usage.get('prompt', 0), usage.get('output', 0), usage.get('cached')),
+                recording.get('elapsed'))
+
+
+class _RecordingModels:
+    def __init__(self, recorder, models):
+        self._recorder = recorder
+        self._models = models
+
+    def generate_content(self, model, contents, config=None):
+        start = time.perf_counter()
+        response = self._models.generate_content(model=model, contents=contents, config=config)
+        self._recorder.save(model, contents, config, response.text, response, time.perf_counter() - start)
+        return response
+
+    def generate_content_stream(self, model, contents, config=None):
+        start = time.perf_counter()
+        parts = []
+        chunk = None
+        for chunk in self._models.generate_content_stream(model=model, contents=contents, config=config):
+            parts.append(chunk.text or '')
+            yield chunk
+        self._recorder.save(model, contents, config, ''.join(parts), chunk, time.perf_counter() - start)
+
+
+class _RecordingAsyncModels:
+    def __init__(self, recorder, models):
+        self._recorder = recorder
+        self._models = models
+
+    async def generate_content(self, model, contents, config=None):
+        start = time.perf_counter()
+        response = await self._models.generate_content(model=model, contents=contents, config=config)
+        self._recorder.save(model, contents, config, response.text, response, time.perf_counter() - start)
+        return response
+
+
+class RecordingClient:
+    """Wraps a real client and saves each successful response (text, token usage, latency) for replay."""
+
+    def __init__(self, client, directory):
+        self.client = client
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.recorded = 0
+        self.models = _RecordingModels(self, client.models)
+        self.aio = SimpleNamespace(models=_RecordingAsyncModels(self, client.aio.models))
+
+    def save(self, model, contents, config, text, response, elapsed):
+        usage = getattr(response, 'usage_metadata', None)
+        recording = {
+            'model': model,
+            'chars': len(str(_plain(contents))),
+            'text': text,
+            'usage': {
+                'prompt': getattr(usage, 'prompt_token_count', None) or 0,
+                'output': getattr(usage, 'candidates_token_count', None) or 0,
+                'cached': getattr(usage, 'cached_content_token_count', None),
+            },
+            'elapsed': round(elapsed, 3),
+            'recorded_at': int(time.time()),
+        }
+        path = os.path.join(self.directory, f'{request_key(model, contents, config)}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(recording, f, ensure_ascii=False)
+        os.replace(temporary, path)
+        self.recorded += 1
+
+    def stats(self):
+        return {'recorded': self.recorded}
+
+
+def offline_client(kind, directory, latency='', errors=''):
+    """Client for an offline backend: 'synthetic', or 'replay' (with synthetic answers for unknown requests)."""
+    if kind == 'synthetic':
+        return SyntheticClient(latency or 'lognormal:1.5:0.4', errors)
+    if kind == 'replay':
+        return ReplayClient(directory, latency or 'recorded', errors, fallback=SyntheticClient())
+    raise ValueError(f'Unknown offline backend {kind!r}')
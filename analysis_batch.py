@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch analysis of many transcripts in one request.
+
+A batch arrives as JSON ({"items": [...]}) or as a zip of markdown files.
+run_batch() analyzes the items on a bounded thread pool and yields each
+result as soon as it finishes, so the service can stream them back
+(newline-delimited JSON) while the slower items are still running. Pacing
+against the Gemini quotas is left to the shared RateLimiter.
+"""
+
+import io
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class BatchRequestError(Exception):
+    """Invalid batch request, carrying the HTTP status to return."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _check_items(items, max_items):
+    if not items:
+        raise BatchRequestError('Batch contains no transcripts')
+    if len(items) > max_items:
+        raise BatchRequestError(f'Batch has {len(items)} transcripts, the limit is {max_items}', 413)
+    return items
+
+
+def items_from_json(payload, max_items):
+    """Items from {"items": [...]}, where each item is a string or {"id": ..., "text": ...}."""
+    entries = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(entries, list):
+        raise BatchRequestError('Expected a JSON object with an "items" list')
+    items = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {'text': entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get('text'), str):
+            raise BatchRequestError(f'Item {index} must be a string or an object with a "text" string')
+        items.append({'index': index, 'id': str(entry.get('id', index)), 'text': entry['text']})
+    return _check_items(items, max_items)
+
+
+def items_from_zip(data, max_items, max_bytes):
+    """Items from the .md files of a zip archive, in archive order, identified by their path."""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise BatchRequestError('Invalid zip archive')
+    items = []
+    total = 0
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = os.path.basename(name)
+            if info.is_dir() or not base.lower().endswith('.md') or base.startswith('.') or '__MACOSX' in name:
+                continue
+            total += info.file_size
+            if total > max_bytes:
+                raise BatchRequestError('Zip archive is too large once extracted', 413)
+            try:
+                text = archive.read(info).decode('utf-8')
+            except UnicodeDecodeError:
+                raise BatchRequestError(f'{name} is not valid UTF-8')
+            items.append({'index': len(items), 'id': name, 'text': text})
+            if len(items) > max_items:
+                break
+    return _check_items(items, max_items)
+
+
+def run_batch(items, analyze, concurrency):
+    """Run analyze(text) -> (payload, status) for every item; yields (item, payload, status) as each finishes.
+
+    Empty transcripts fail on their own (400) without reaching analyze; the other items still run.
+    Closing the generator early (e.g. the client disconnected) cancels the items not yet started.
+    """
+    runnable = []
+    for item in items:
+        if item['text'].strip():
+            runnable.append(item)
+        else:
+            yield item, {'error': 'Transcript is empty or contains no text'}, 400
+    if not runnable:
+        return
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(runnable))),
+                                  thread_name_prefix='analysis-batch')
+    try:
+        pending = {executor.submit(analyze, item['text']): item for item in runnable}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    payload, status = future.result()
+                except Exception as e:
+                    payload, status = {'error': f'Analysis failed: {e}'}, 500
+                yield item, payload, status
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
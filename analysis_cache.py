@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache for IELTS analysis results.
+
+Keys are SHA-256 digests of the normalized transcript, the Gemini model name and
+a prompt/schema version, so editing the prompt or switching models never serves
+a stale analysis. Entries live in an in-memory LRU in front of a SQLite file;
+both tiers expire entries after a TTL, and the disk tier is capped by size.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Canonical form of a transcript: NFC, whitespace runs collapsed, ends stripped (case is kept)."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def prompt_version(*parts):
+    """Short fingerprint of everything that shapes the model output besides the text."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def cache_key(text, model, version):
+    material = '\0'.join((version, model, normalize_text(text)))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier (memory LRU + SQLite) cache of analysis results, safe to share between threads.
+
+    Args:
+        path: SQLite file for the persistent tier; None keeps the cache in memory only
+        memory_entries: maximum entries held in the in-memory LRU
+        max_bytes: maximum total size of the stored results on disk; oldest-accessed entries go first
+        ttl_seconds: entries older than this are treated as misses and deleted
+        table: SQLite table, so several caches can share one file
+    """
+
+    def __init__(self, path=None, memory_entries=256, max_bytes=64 * 1024 * 1024, ttl_seconds=7 * 86400,
+                 table='analysis_cache'):
+        self.path = path
+        self.table = table
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (created_at, value_json)
+        self._db = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                ' key TEXT PRIMARY KEY, model TEXT, value TEXT NOT NULL, size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self._db.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)')
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds and now - created_at > self.ttl_seconds
+
+    def get(self, key):
+        """Return (result, info) on a hit, where info has 'tier' and 'age_seconds'; None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[0], now):
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1]), {'tier': 'memory', 'age_seconds': round(now - entry[0], 1)}
+
+            row = None
+            if self._db is not None:
+                row = self._db.execute(
+                    f'SELECT value, created_at FROM {self.table} WHERE key = ?', (key,)).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    self._db.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            self._db.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+            self._remember(key, created_at, value)
+            self.disk_hits += 1
+            return json.loads(value), {'tier': 'disk', 'age_seconds': round(now - created_at, 1)}
+
+    def put(self, key, result, model=None):
+        value = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is None:
+                return
+            self._db.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, model, value, size, created_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (key, model, value, len(value.encode('utf-8')), now, now),
+            )
+            self._evict_disk(now)
+
+    def _remember(self, key, created_at, value):
+        """Insert into the memory LRU; requires _lock."""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        """Drop expired rows, then least-recently-accessed rows until under max_bytes; requires _lock."""
+        if self.ttl_seconds:
+            cursor = self._db.execute(f'DELETE FROM {self.table} WHERE created_at < ?', (now - self.ttl_seconds,))
+            self.evictions += max(cursor.rowcount, 0)
+        if not self.max_bytes:
+            return
+        total = self._db.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table}').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._db.execute(f'SELECT key, size FROM {self.table} ORDER BY accessed_at'):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        self._db.executemany(f'DELETE FROM {self.table} WHERE key = ?', victims)
+        for (key,) in victims:
+            self._memory.pop(key, None)
+        self.evictions += len(victims)
+
+    def invalidate(self, key=None):
+        """Remove one entry, or every entry when key is None; returns the number removed."""
+        with self._lock:
+            if key is None:
+                removed = len(self._memory)
+                self._memory.clear()
+                if self._db is not None:
+                    removed = self._db.execute(f'DELETE FROM {self.table}').rowcount
+                return removed
+            removed = 1 if self._memory.pop(key, None) is not None else 0
+            if self._db is not None:
+                removed = max(removed, self._db.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,)).rowcount)
+            return removed
+
+    def stats(self):
+        with self._lock:
+            disk_entries = disk_bytes = None
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}').fetchone()
+            return {
+                'path': self.path,
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Asynchronous analysis jobs for the IELTS analysis service.
+
+Submitting a transcript returns a job id at once; a fixed pool of worker
+threads runs the Gemini calls, so a burst of submissions waits in a bounded
+FIFO queue instead of holding one request thread each. A full queue is
+rejected with an estimated wait, which the service turns into
+429 + Retry-After. Finished jobs are kept for a TTL so clients can poll them.
+A runner may publish partial results (sections) while it works, which
+follow() hands to streaming clients as they arrive.
+"""
+
+import itertools
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+
+class QueueFull(Exception):
+    """The pending queue is at capacity; retry_after is the estimated wait in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('Analysis queue is full')
+        self.retry_after = retry_after
+
+
+class AnalysisJob:
+    def __init__(self, job_id, text, options):
+        self.job_id = job_id
+        self.text = text
+        self.chars = len(text) if text is not None else None
+        self.options = options
+        self.status = 'pending'
+        self.sections = []  # (name, value) published while running
+        self.result = None
+        self.http_status = None
+        self.cancelled = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def describe(self):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'chars': self.chars,
+            'sections': [name for name, _ in self.sections],
+            'queue_seconds': round(self.started_at - self.submitted_at, 3) if self.started_at else None,
+            'run_seconds': round(self.finished_at - self.started_at, 3)
+            if self.started_at and self.finished_at else None,
+        }
+
+
+class AnalysisJobQueue:
+    """Bounded FIFO of analysis jobs served by a fixed number of worker threads.
+
+    Args:
+        runner: callable(text, options, publish) -> (result, http_status), run on a worker thread;
+            publish(name, value) makes a partial result visible before the job finishes
+        workers: concurrent runner calls (i.e. concurrent Gemini requests)
+        max_pending: jobs allowed to wait; submit() raises QueueFull beyond this
+        result_ttl: seconds a finished job stays pollable
+        max_jobs: finished jobs retained at most (oldest dropped first)
+    """
+
+    def __init__(self, runner, workers=4, max_pending=64, result_ttl=600.0, max_jobs=1000):
+        self.runner = runner
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+
+        self._pending = deque()
+        self._jobs = OrderedDict()  # job_id -> AnalysisJob
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._seq = itertools.count()
+        # Moving average of runner time, used for queue wait estimates
+        self._avg_seconds = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'analysis-job-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, text, **options):
+        """Queue a transcript and return its job; raises QueueFull when the queue is at capacity."""
+        with self._cond:
+            self._expire()
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(self._estimate_wait(len(self._pending)))
+            job = self._add(text, options)
+            self._pending.append(job)
+            # Pollers and followers share the condition, so notify() could miss the workers
+            self._cond.notify_all()
+        return job
+
+    def add_finished(self, text, result, http_status=200, **options):
+        """Record a job that needed no worker (e.g. a cache hit) so it is pollable like any other."""
+        with self._cond:
+            self._expire()
+            job = self._add(text, options)
+            job.started_at = job.submitted_at
+            self._finish(job, 'done', result, http_status)
+            self.completed += 1
+        return job
+
+    def _add(self, text, options):
+        """Requires _cond."""
+        job = AnalysisJob(f'{uuid.uuid4().hex[:12]}{next(self._seq):x}', text, options)
+        self._jobs[job.job_id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id, wait=0.0):
+        """Return (job, queue position or None), waiting up to `wait` seconds for it to finish; None if unknown."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if job.done or remaining <= 0:
+                    return job, self._position(job)
+                self._cond.wait(remaining)
+
+    def follow(self, job_id, after=0, timeout=15.0):
+        """Wait until the job has more than `after` sections, finishes, or changes state, at most `timeout`.
+
+        Returns (job, queue position, sections published after index `after`); None if unknown.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if len(job.sections) <= after and not job.done:
+                self._cond.wait(timeout)
+            return job, self._position(job), job.sections[after:]
+
+    def _publish(self, job, name, value):
+        with self._cond:
+            if job.cancelled:
+                return
+            job.sections.append((name, value))
+            self._cond.notify_all()
+
+    def cancel(self, job_id):
+        """Cancel a job; a running job's Gemini call completes but its result is discarded. None if unknown."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.done:
+                return job
+            job.cancelled = True
+            if job.status == 'pending':
+                self._pending.remove(job)
+            self._finish(job, 'cancelled')
+            self.cancelled += 1
+            return job
+
+    def _position(self, job):
+        """1-based position among pending jobs, 0 when running, None when finished; requires _cond."""
+        if job.status == 'running':
+            return 0
+        if job.status != 'pending':
+            return None
+        for index, pending in enumerate(self._pending):
+            if pending is job:
+                return index + 1
+        return None
+
+    def estimated_wait(self, job):
+        """Rough seconds until a pending job starts, from its position and the average run time."""
+        with self._cond:
+            position = self._position(job)
+            if not position:
+                return 0.0
+            return self._estimate_wait(position - 1)
+
+    def _estimate_wait(self, ahead):
+        """Requires _cond."""
+        average = self._avg_seconds or 5.0
+        return math.ceil((ahead // self.workers + 1) * average)
+
+    def _finish(self, job, status, result=None, http_status=None):
+        """Requires _cond."""
+        job.status = status
+        job.result = result
+        job.http_status = http_status
+        job.finished_at = time.time()
+        # The transcript is no longer needed once the job is over
+        job.text = None
+        self._cond.notify_all()
+
+    def _expire(self):
+        """Drop finished jobs past their TTL or beyond max_jobs, oldest first; requires _cond."""
+        deadline = time.time() - self.result_ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.done and (job.finished_at < deadline or len(self._jobs) > self.max_jobs):
+                del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                text = job.text
+                job.status = 'running'
+                job.started_at = time.time()
+                self._running += 1
+                # Queue positions moved; wake followers so they can report it
+                self._cond.notify_all()
+            try:
+                result, http_status = self.runner(
+                    text, job.options, lambda name, value, job=job: self._publish(job, name, value))
+                status = 'done' if http_status < 400 else 'failed'
+            except Exception as e:
+                result, http_status, status = {'error': f'Analysis failed: {e}'}, 500, 'failed'
+            elapsed = time.time() - job.started_at
+            with self._cond:
+                self._running -= 1
+                self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+                if job.cancelled:
+                    continue
+                if status == 'done':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._finish(job, status, result, http_status)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': len(self._pending),
+                'running': self._running,
+                'jobs': len(self._jobs),
+                'avg_run_seconds': round(self._avg_seconds, 3) if self._avg_seconds is not None else None,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'cancelled': self.cancelled,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Provider-side caching of the analysis system prompt.
+
+Every analysis call used to resend the system prompt, example JSON included,
+so its tokens were billed and processed again on each request. PromptCache
+registers the prompt once as Gemini cached content, named after the prompt
+version so every process running the same prompt finds and shares it, and
+hands out the cache name for requests. The cache's TTL is extended shortly
+before it expires. When caching is unavailable (offline backends, a prompt
+below the provider's minimum size, an API error) requests send the prompt
+inline, and creation is retried after a pause.
+"""
+
+import threading
+import time
+
+
+def _expiry(cached, default):
+    expire_time = getattr(cached, 'expire_time', None)
+    return expire_time.timestamp() if expire_time is not None else default
+
+
+class PromptCache:
+    """One system prompt as Gemini cached content, safe to share between threads.
+
+    Args:
+        client: google-genai client; clients without a caches API disable caching
+        model: model the cached content is created for
+        system_prompt: the prompt to cache
+        key: prompt version, used as the cache's display name suffix
+        ttl_seconds: lifetime of the cached content, extended on use
+        refresh_margin: extend the TTL once less than this is left
+        min_tokens: provider minimum for cached content; smaller prompts are always sent inline
+        retry_seconds: pause before trying again after a failure
+        on_event: optional callable(event, **fields) for created/reused/refreshed/failed/disabled
+    """
+
+    def __init__(self, client, model, system_prompt, key, ttl_seconds=3600, refresh_margin=300, min_tokens=1024,
+                 retry_seconds=600, on_event=None):
+        self.client = client
+        self.model = model
+        self.system_prompt = system_prompt
+        self.display_name = f'ielts-analysis-{key}'
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self.on_event = on_event
+        self._lock = threading.Lock()
+        self._name = None
+        self._expires = 0.0
+        self._retry_at = 0.0
+        self.reason = None  # why requests currently send the prompt inline
+        self.counts = {'created': 0, 'reused': 0, 'refreshed': 0, 'failed': 0}
+        if not hasattr(client, 'caches'):
+            self._disable('unsupported')
+        # Gemini counts about two characters per token for this mostly Chinese prompt
+        elif len(system_prompt) // 2 < min_tokens:
+            self._disable('too_small')
+
+    def _emit(self, event, **fields):
+        if self.on_event is not None:
+            self.on_event(event, cache=self.display_name, **fields)
+
+    def _disable(self, reason):
+        self.reason = reason
+        self._retry_at = float('inf')
+        self._emit('disabled', reason=reason)
+
+    def name(self):
+        """Name of the cached content to send with a request, or None to send the prompt inline."""
+        now = time.time()
+        with self._lock:
+            if self._name and now < self._expires - self.refresh_margin:
+                return self._name
+            if now < self._retry_at:
+                return None
+            try:
+                if self._name:
+                    self._refresh()
+                else:
+                    self._find() or self._create()
+            except Exception as e:
+                self._failed(e)
+                return None
+            self.reason = None
+            return self._name
+
+    def _find(self):
+        """Adopt cached content another process created for the same prompt version; requires _lock."""
+        for cached in self.client.caches.list():
+            if cached.display_name == self.display_name and (cached.model or '').endswith(self.model):
+                self._name = cached.name
+                self._expires = _expiry(cached, 0.0)
+                self.counts['reused'] += 1
+                self._emit('reused', name=cached.name)
+                if time.time() >= self._expires - self.refresh_margin:
+                    self._refresh()
+                return True
+        return False
+
+    def _create(self):
+        """Requires _lock."""
+        from google.genai import types
+        cached = self.client.caches.create(model=self.model, config=types.CreateCachedContentConfig(
+            display_name=self.display_name,
+            system_instruction=self.system_prompt,
+            ttl=f'{int(self.ttl_seconds)}s',
+        ))
+        self._name = cached.name
+        self._expires = _expiry(cached, time.time() + self.ttl_seconds)
+        self.counts['created'] += 1
+        self._emit('created', name=cached.name, ttl=self.ttl_seconds)
+
+    def _refresh(self):
+        """Extend the TTL; falls back to creating new cached content when the old one is gone. Requires _lock."""
+        from google.genai import types
+        try:
+            cached = self.client.caches.update(name=self._name, config=types.UpdateCachedContentConfig(
+                ttl=f'{int(self.ttl_seconds)}s'))
+        except Exception as e:
+            self._emit('refresh_failed', name=self._name, error=str(e))
+            self._name = None
+            self._create()
+            return
+        self._expires = _expiry(cached, time.time() + self.ttl_seconds)
+        self.counts['refreshed'] += 1
+        self._emit('refreshed', name=self._name)
+
+    def _failed(self, error):
+        """Requires _lock."""
+        self._name = None
+        self._retry_at = time.time() + self.retry_seconds
+        self.reason = f'{type(error).__name__}: {error}'
+        self.counts['failed'] += 1
+        self._emit('failed', error=str(error), retry_in=self.retry_seconds)
+
+    def invalidate(self, error):
+        """A request naming the cached content was rejected (e.g. it was deleted): send the prompt inline for now."""
+        with self._lock:
+            self._failed(error)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, name=self._name, display_name=self.display_name, reason=self.reason,
+                        expires_in=round(self._expires - time.time()) if self._name else None)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Request/token budgets and retry policy for Gemini calls.
+
+Gemini enforces per-key requests-per-minute and tokens-per-minute quotas and
+answers 429 once they are exceeded. RateLimiter keeps every call from this
+process inside configured budgets by reservation: each call claims a request
+and an estimated token count up front and is told how long to wait, and the
+estimate is settled against the real usage afterwards. Transient failures
+(429, 5xx, timeouts) are retried with exponential backoff and full jitter.
+"""
+
+import random
+import threading
+import time
+
+# HTTP statuses worth retrying: timeout, quota exhausted, and server-side failures
+TRANSIENT_STATUS = (408, 429, 500, 502, 503, 504)
+# Network errors raised by the HTTP client below the SDK
+TRANSIENT_ERRORS = ('ConnectError', 'ConnectTimeout', 'ReadTimeout', 'WriteTimeout', 'PoolTimeout',
+                    'RemoteProtocolError', 'ReadError')
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute; a budget of 0 is unlimited.
+
+    Buckets start full and may go negative: a reservation past the budget
+    returns the wait until the bucket has refilled to cover it.
+    """
+
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self.reservations = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    def _refill(self):
+        """Requires _lock."""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    def reserve(self, tokens=0):
+        """Claim one request and `tokens` tokens; returns the seconds to wait before sending it."""
+        with self._lock:
+            self._refill()
+            wait = 0.0
+            if self.rpm:
+                self._requests -= 1
+                if self._requests < 0:
+                    wait = -self._requests * 60.0 / self.rpm
+            if self.tpm:
+                # A single call larger than the whole budget still has to be allowed through
+                self._tokens -= min(tokens, self.tpm)
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens * 60.0 / self.tpm)
+            self.reservations += 1
+            if wait:
+                self.throttled += 1
+                self.throttled_seconds += wait
+            return wait
+
+    def settle(self, estimated, actual):
+        """Correct a reservation once the real token usage is known."""
+        if not self.tpm or not actual:
+            return
+        with self._lock:
+            self._tokens = min(float(self.tpm), self._tokens + min(estimated, self.tpm) - actual)
+
+    def stats(self):
+        with self._lock:
+            self._refill()
+            return {
+                'rpm': self.rpm,
+                'tpm': self.tpm,
+                'requests_available': round(self._requests, 2) if self.rpm else None,
+                'tokens_available': round(self._tokens) if self.tpm else None,
+                'reservations': self.reservations,
+                'throttled': self.throttled,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+            }
+
+
+def is_transient_error(error):
+    """Whether a failed Gemini call is worth retrying (quota, server and network errors)."""
+    status = getattr(error, 'code', None)
+    if not isinstance(status, int):
+        status = getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        return status in TRANSIENT_STATUS
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERRORS
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def estimate_tokens(text, overhead=0):
+    """Rough token count for budgeting: ~4 characters per token plus a fixed per-call overhead."""
+    return len(text) // 4 + overhead
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Map-reduce analysis of long transcripts.
+
+A whole recorded session sent as one prompt is slow (latency grows with input
+and output length) and risks truncated JSON. split_segments() cuts such a
+transcript at topic and turn boundaries into segments that are analyzed
+independently; merge_segment_findings() unions their list sections without
+duplicates, and aggregation_input() condenses their scores and feedback into
+the compact input of a final call that grades the transcript as a whole.
+"""
+
+import json
+import re
+
+from analysis_cache import normalize_text
+from analysis_sentences import split_sentences
+
+# Boundary strength of a line starting a new block: topic (heading, separator) > turn > paragraph
+_TOPIC = re.compile(r'^[ \t]*(?:#|-{3,}[ \t]*$|\*{3,}[ \t]*$|_{3,}[ \t]*$)')
+# Speaker or question labels ("Examiner:", "Q1:", "Part 2 - Cue card:")
+_TURN = re.compile(r'^[ \t]*(?:examiner|interviewer|candidate|student|question|answer|q|a|part[ \t]*\d)\b'
+                   r'[^:\n]{0,20}[:：]', re.IGNORECASE)
+TOPIC, TURN, PARAGRAPH, SENTENCE = 3, 2, 1, 0
+
+
+def _blocks(text):
+    """(strength of the boundary before it, text) for each paragraph; headings and turns start new blocks."""
+    blocks = []
+    lines = []
+    strength = TOPIC
+    for line in text.splitlines():
+        if not line.strip():
+            if lines:
+                blocks.append((strength, '\n'.join(lines)))
+                lines = []
+                strength = PARAGRAPH
+            continue
+        starts = TOPIC if _TOPIC.match(line) else TURN if _TURN.match(line) else PARAGRAPH
+        if starts > PARAGRAPH:
+            if lines:
+                blocks.append((strength, '\n'.join(lines)))
+                lines = []
+                strength = starts
+            else:
+                strength = max(strength, starts)
+        lines.append(line)
+    if lines:
+        blocks.append((strength, '\n'.join(lines)))
+    return blocks
+
+
+def _wrap(sentence, max_chars):
+    """Unpunctuated speech-to-text output can run on without a sentence end; cut it between words."""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:].lstrip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_segments(text, max_chars):
+    """Cut a transcript into segments of at most about max_chars, preferring topic and turn boundaries.
+
+    A segment closes early at a topic or turn boundary once it is half full, so segments follow
+    the structure of the session; paragraphs longer than max_chars are cut between sentences.
+    """
+    units = []
+    for strength, block in _blocks(text):
+        if len(block) <= max_chars:
+            units.append((strength, block))
+            continue
+        pieces = [piece for sentence in split_sentences(block) for piece in _wrap(sentence, max_chars)]
+        units.extend((strength if index == 0 else SENTENCE, piece) for index, piece in enumerate(pieces))
+
+    segments = []
+    current = []
+    size = 0
+    for strength, unit in units:
+        if current and (size + len(unit) > max_chars or (strength >= TURN and size >= max_chars // 2)):
+            segments.append(current)
+            current = []
+            size = 0
+        separator = ' ' if strength == SENTENCE and current else '\n\n'
+        current.append(separator + unit if current else unit)
+        size += len(unit) + len(separator)
+    if current:
+        segments.append(current)
+    return [''.join(segment) for segment in segments]
+
+
+def _fingerprint(*values):
+    """Case-, whitespace- and edge-punctuation-insensitive identity of a finding."""
+    return tuple(normalize_text(value if isinstance(value, str) else '').lower().strip(' "\'“”.,!?')
+                 for value in values)
+
+
+def _unique(items, key):
+    seen = set()
+    unique = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        fingerprint = key(item)
+        if fingerprint not in seen:
+            seen.add(fingerprint)
+            unique.append(item)
+    return unique
+
+
+def merge_segment_findings(results):
+    """Union of the list sections of per-segment analyses, in segment order, without duplicates.
+
+    Returns grammar_errors, word_choice_issues, vocabulary_assessment (advanced words and
+    suggestions) and the potential patterns of pronunciation_analysis, whose evidence is pooled.
+    """
+    def collect(getter):
+        return [item for result in results for item in (getter(result) or ())]
+
+    vocabulary = [result.get('vocabulary_assessment') or {} for result in results]
+    patterns = {}
+    for pattern in collect(lambda result: (result.get('pronunciation_analysis') or {}).get('potential_patterns')):
+        if not isinstance(pattern, dict):
+            continue
+        merged = patterns.setdefault(_fingerprint(pattern.get('suspected_issue')),
+                                     {'suspected_issue': pattern.get('suspected_issue'), 'evidence': []})
+        for evidence in pattern.get('evidence') or ():
+            if evidence not in merged['evidence']:
+                merged['evidence'].append(evidence)
+
+    advanced = {}
+    for words in vocabulary:
+        for word in words.get('advanced_words_found') or ():
+            advanced.setdefault(_fingerprint(word), word)
+    return {
+        'grammar_errors': _unique(collect(lambda result: result.get('grammar_errors')),
+                                  lambda item: _fingerprint(item.get('original_sentence'), item.get('text'))),
+        'word_choice_issues': _unique(collect(lambda result: result.get('word_choice_issues')),
+                                      lambda item: _fingerprint(item.get('original_sentence'), item.get('text'))),
+        'vocabulary_assessment': {
+            'advanced_words_found': list(advanced.values()),
+            'vocabulary_suggestions': _unique(
+                [item for words in vocabulary for item in words.get('vocabulary_suggestions') or ()],
+                lambda item: _fingerprint(item.get('overused_word'), item.get('original_sentence'))),
+        },
+        'potential_patterns': list(patterns.values()),
+    }
+
+
+def aggregation_input(segments, results, statistics):
+    """Compact JSON input for the aggregation call: per-segment scores and feedback plus whole-text statistics."""
+    summaries = []
+    for number, (segment, result) in enumerate(zip(segments, results), 1):
+        summaries.append({
+            'segment': number,
+            'chars': len(segment),
+            'ielts_band_score': result.get('ielts_band_score'),
+            'overall_feedback': result.get('overall_feedback'),
+            'fluency': (result.get('fluency_markers') or {}).get('analysis'),
+            'pronunciation': (result.get('pronunciation_analysis') or {}).get('analysis'),
+        })
+    return json.dumps({'segments': summaries, 'text_statistics': statistics}, ensure_ascii=False)
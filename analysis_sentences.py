@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sentence-level reuse of analysis findings.
+
+Students usually revise a few sentences of an answer and submit it again.
+Grammar errors, word choice issues and vocabulary suggestions each quote the
+sentence they concern (original_sentence), so they can be filed under a hash
+of that sentence. On a re-submission only the new or edited sentences need
+the model for these sections; the findings of unchanged sentences, including
+"no findings", are reused from the index.
+"""
+
+import re
+
+from analysis_cache import cache_key, normalize_text
+
+# Sentence-level sections, in result order; vocabulary_suggestions lives under vocabulary_assessment
+SENTENCE_SECTIONS = ('grammar_errors', 'word_choice_issues', 'vocabulary_suggestions')
+
+_HEADING = re.compile(r'^[ \t]*#')
+# Candidate sentence ends: terminal punctuation (with closing quotes/brackets) before whitespace or the line end
+_END = re.compile(r'[.!?…]+["\'”’)\]]*(?=\s|$)')
+_LETTER = re.compile(r'[A-Za-z]')
+# Quotes and punctuation ignored when matching a quoted original_sentence to a transcript sentence
+_EDGES = ' "\'“”‘’.,;:!?…-—'
+
+
+def split_sentences(text):
+    """Sentences of a transcript, whitespace-normalized, in order; markdown headings are skipped.
+
+    Ellipses mark hesitation in transcripts ("I... uh... I like"), so they only end a
+    sentence together with '!' or '?'.
+    """
+    sentences = []
+    for line in text.splitlines():
+        if _HEADING.match(line):
+            continue
+        begin = 0
+        for match in _END.finditer(line):
+            mark = match.group()
+            if ('..' in mark or '…' in mark) and '!' not in mark and '?' not in mark:
+                continue
+            sentences.append(line[begin:match.end()])
+            begin = match.end()
+        sentences.append(line[begin:])
+    sentences = (normalize_text(sentence) for sentence in sentences)
+    return [sentence for sentence in sentences if _LETTER.search(sentence)]
+
+
+def sentence_keys(sentences, model, version):
+    return [cache_key(sentence, model, version) for sentence in sentences]
+
+
+def _comparable(sentence):
+    return normalize_text(sentence or '').lower().strip(_EDGES)
+
+
+def findings_of(result):
+    """(section, finding) pairs of the sentence-level sections of an analysis."""
+    vocabulary = result.get('vocabulary_assessment') or {}
+    for section, findings in (('grammar_errors', result.get('grammar_errors')),
+                              ('word_choice_issues', result.get('word_choice_issues')),
+                              ('vocabulary_suggestions', vocabulary.get('vocabulary_suggestions'))):
+        for finding in findings or ():
+            if isinstance(finding, dict):
+                yield section, finding
+
+
+def _locate(finding, sentences, exact):
+    """Index of the sentence a finding refers to, or None."""
+    quoted = _comparable(finding.get('original_sentence'))
+    if quoted in exact:
+        return exact[quoted]
+    comparable = [_comparable(sentence) for sentence in sentences]
+    # The model sometimes quotes part of a sentence, or runs two sentences together
+    if len(quoted) >= 8:
+        for index, sentence in enumerate(comparable):
+            if quoted in sentence or sentence and sentence in quoted:
+                return index
+    # Last resort: the quoted error text or overused word
+    fragment = _comparable(finding.get('text') or finding.get('overused_word'))
+    if fragment:
+        for index, sentence in enumerate(comparable):
+            if fragment in sentence:
+                return index
+    return None
+
+
+def assign_findings(sentences, result):
+    """File the sentence-level findings of an analysis under the sentences they quote.
+
+    Returns (per_sentence, unassigned): per_sentence has one {section: [findings]} dict per
+    sentence (empty lists where the model found nothing), unassigned the (section, finding)
+    pairs that quote no sentence of the transcript.
+    """
+    exact = {}
+    for index, sentence in enumerate(sentences):
+        exact.setdefault(_comparable(sentence), index)
+    per_sentence = [{section: [] for section in SENTENCE_SECTIONS} for _ in sentences]
+    unassigned = []
+    for section, finding in findings_of(result):
+        index = _locate(finding, sentences, exact)
+        if index is None:
+            unassigned.append((section, finding))
+        else:
+            per_sentence[index][section].append(finding)
+    return per_sentence, unassigned
+
+
+def findings_by_key(keys, per_sentence):
+    """{key: findings} for the index; a sentence that occurs more than once keeps the findings of all occurrences.
+
+    assign_findings files a repeated sentence's findings under its first occurrence, so taking
+    the last occurrence's (empty) findings would index the sentence as clean.
+    """
+    by_key = {}
+    for key, findings in zip(keys, per_sentence):
+        merged = by_key.setdefault(key, {section: [] for section in SENTENCE_SECTIONS})
+        for section in SENTENCE_SECTIONS:
+            merged[section].extend(finding for finding in findings.get(section, ()) if finding not in merged[section])
+    return by_key
+
+
+def merge_findings(per_sentence, unassigned=()):
+    """Concatenate per-sentence findings (in transcript order) back into {section: [findings]}."""
+    merged = {section: [] for section in SENTENCE_SECTIONS}
+    for findings in per_sentence:
+        for section in SENTENCE_SECTIONS:
+            merged[section].extend(findings.get(section, ()))
+    for section, finding in unassigned:
+        merged[section].append(finding)
+    return merged
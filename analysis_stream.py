@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental delivery of streamed IELTS analyses.
+
+Gemini streams the structured JSON answer in arbitrary text fragments.
+SectionStream scans them once, tracking string and nesting state, and hands
+back each top-level member of the answer object as soon as its value is
+complete, so a client can render the band scores while the grammar errors
+are still being generated. format_sse() frames those sections as
+server-sent events.
+"""
+
+import json
+
+
+class SectionStream:
+    """Splits a streamed top-level JSON object into its members as they complete."""
+
+    def __init__(self):
+        self.text = ''
+        self.names = []
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._key = None
+        self._after_colon = False
+        self._value_start = None
+
+    def feed(self, fragment):
+        """Append a fragment; returns a list of (name, value) for members completed by it."""
+        self.text += fragment
+        completed = []
+        text = self.text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._key is None:
+                            self._key = json.loads(text[self._string_start:index + 1])
+                        elif self._value_start is not None:
+                            completed.append(self._complete(index + 1))
+                continue
+            if char.isspace():
+                continue
+            if self._depth == 1 and self._after_colon and self._value_start is None:
+                self._value_start = index
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    completed.append(self._complete(index + 1))
+                elif self._depth == 0 and self._value_start is not None:
+                    # Scalar last member, terminated by the closing brace
+                    completed.append(self._complete(index))
+            elif self._depth == 1 and char == ':':
+                self._after_colon = True
+            elif self._depth == 1 and char == ',' and self._value_start is not None:
+                completed.append(self._complete(index))
+        self._pos = len(text)
+        return completed
+
+    def _complete(self, end):
+        name = self._key
+        value = json.loads(self.text[self._value_start:end])
+        self.names.append(name)
+        self._key = None
+        self._after_colon = False
+        self._value_start = None
+        return name, value
+
+    def finish(self):
+        """Parse the whole streamed answer (the authoritative result)."""
+        return json.loads(self.text)
+
+
+def format_sse(event, data, event_id=None):
+    """One server-sent event with a JSON payload."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
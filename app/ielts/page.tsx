@@ -114,6 +114,20 @@ interface IELTSAnalysisResult {
 			evidence: string[];
 		}>;
 	};
+	// 本地统计（服务端逐词计算，不经过 Gemini）
+	text_statistics?: {
+		word_count: number;
+		sentence_count: number;
+		average_sentence_length: number;
+		unique_words: number;
+		type_token_ratio: number;
+		moving_average_ttr: number;
+		hesitation_count: number;
+		connector_count: number;
+		repeated_words: Array<{ word: string; count: number }>;
+		overused_basic_words: Array<{ word: string; count: number }>;
+		immediate_repetitions: Array<{ word: string; count: number }>;
+	};
 	analysis_timestamp?: number;
 	analysis_duration_seconds?: number;
 }
@@ -125,29 +139,69 @@ const IELTSPage: React.FC = () => {
 
 	const [textInput, setTextInput] = useState<string>('');
 	const [isAnalyzing, setIsAnalyzing] = useState<boolean>(false);
-	const [result, setResult] = useState<IELTSAnalysisResult | null>(null);
+	// 流式分析过程中各部分陆续到达，未到达的部分为空
+	const [result, setResult] = useState<Partial<IELTSAnalysisResult> | null>(null);
 	const [error, setError] = useState<string>('');
 	const [, setHistory] = useState<Array<{ text: string; result: IELTSAnalysisResult }>>([]);
 
 	// 雅思口语分析API调用
-	const analyzeIELTSText = async (text: string): Promise<IELTSAnalysisResult> => {
+	const analyzeIELTSText = async (
+		text: string,
+		onSection: (name: string, value: unknown) => void
+	): Promise<IELTSAnalysisResult> => {
 		try {
 			// 创建临时的Markdown文件内容
 			const blob = new Blob([text], { type: 'text/markdown' });
 			const formData = new FormData();
 			formData.append('file', blob, 'speech.md');
 
-			const response = await fetch('http://localhost:5002/ielts-speaking-gemini', {
-				method: 'POST',
-				body: formData
-			});
+			// 提交分析任务：立即返回任务ID，队列已满（429）时按 Retry-After 等待后重试
+			let response: Response;
+			for (let attempt = 0; ; attempt++) {
+				response = await fetch('http://localhost:5002/ielts-speaking-gemini/jobs', {
+					method: 'POST',
+					body: formData
+				});
+				if (response.status !== 429 || attempt >= 5) break;
+				const retryAfter = Number(response.headers.get('Retry-After')) || 5;
+				await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+			}
 
 			if (!response.ok) {
 				throw new Error(`HTTP error! status: ${response.status}`);
 			}
 
-			const result = await response.json();
-			return result;
+			// 通过 SSE 接收任务结果：每完成一个部分（如评分）就推送一次（命中缓存时提交即完成）
+			let job = await response.json();
+			if (job.status === 'pending' || job.status === 'running') {
+				job = await new Promise((resolve, reject) => {
+					const events = new EventSource(`http://localhost:5002${job.status_url}/events`);
+					events.addEventListener('section', (event) => {
+						const { name, value } = JSON.parse((event as MessageEvent).data);
+						onSection(name, value);
+					});
+					events.addEventListener('done', (event) => {
+						events.close();
+						resolve(JSON.parse((event as MessageEvent).data));
+					});
+					events.addEventListener('error', (event) => {
+						const data = (event as MessageEvent).data;
+						if (data) {
+							// 服务端发送的 error 事件：任务失败或已取消
+							events.close();
+							resolve(JSON.parse(data));
+						} else if (events.readyState === EventSource.CLOSED) {
+							reject(new Error('analysis event stream closed'));
+						}
+						// 其他情况为连接中断，EventSource 会带 Last-Event-ID 自动重连并续传
+					});
+				});
+			}
+
+			if (job.status !== 'done') {
+				throw new Error(job.result?.error || `analysis job ${job.status}`);
+			}
+			return job.result;
 		} catch (error) {
 			console.error('IELTS Analysis error:', error);
 			throw new Error('雅思分析服务暂时不可用，请稍后重试');
@@ -211,7 +265,9 @@ const IELTSPage: React.FC = () => {
 		setResult(null);
 
 		try {
-			const analysisResult = await analyzeIELTSText(value);
+			const analysisResult = await analyzeIELTSText(value, (name, section) => {
+				setResult(prev => ({ ...(prev ?? {}), [name]: section }));
+			});
 			setResult(analysisResult);
 			
 			// 添加到历史记录
@@ -247,8 +303,8 @@ const IELTSPage: React.FC = () => {
 	};
 
 	// 获取IELTS总体评分
-	const calculateOverallScore = (result: IELTSAnalysisResult) => {
-		return result.ielts_band_score.overall.score;
+	const calculateOverallScore = (bandScore: IELTSAnalysisResult['ielts_band_score']) => {
+		return bandScore.overall.score;
 	};
 
 	return (
@@ -285,7 +341,7 @@ const IELTSPage: React.FC = () => {
 							</Card>
 						)}
 
-						{isAnalyzing && (
+						{isAnalyzing && !result && (
 							<Card style={{ height: '100%' }}>
 								<Flex justify="center" align="center" style={{ height: '100%' }}>
 									<Space direction="vertical" align="center">
@@ -302,7 +358,48 @@ const IELTSPage: React.FC = () => {
 								<Col span={12}>
 									<div style={{ height: '100%', overflowY: 'auto', paddingRight: 8 }}>
 										<Space direction="vertical" style={{ width: '100%' }} size="large">
+											{/* 文本统计 */}
+											{result.text_statistics && (
+												<Card
+													title={
+														<Space>
+															<FileTextOutlined style={{ color: '#13c2c2' }} />
+															文本统计
+														</Space>
+													}
+													size="small"
+												>
+													<Row gutter={16}>
+														<Col span={6}>
+															<Statistic title="词数" value={result.text_statistics.word_count} />
+														</Col>
+														<Col span={6}>
+															<Statistic title="句数" value={result.text_statistics.sentence_count} />
+														</Col>
+														<Col span={6}>
+															<Statistic title="平均句长" value={result.text_statistics.average_sentence_length} />
+														</Col>
+														<Col span={6}>
+															<Tooltip title="50 词滑动窗口的类符/形符比，越高表示用词越丰富">
+																<Statistic title="词汇多样性" value={result.text_statistics.moving_average_ttr} precision={2} />
+															</Tooltip>
+														</Col>
+													</Row>
+													{result.text_statistics.overused_basic_words.length > 0 && (
+														<div style={{ marginTop: 12 }}>
+															<Text strong>高频基础词: </Text>
+															<Space wrap>
+																{result.text_statistics.overused_basic_words.map((item, index) => (
+																	<Tag key={index} color="orange">{item.word} × {item.count}</Tag>
+																))}
+															</Space>
+														</div>
+													)}
+												</Card>
+											)}
+
 											{/* 总体评分 */}
+											{result.ielts_band_score && (
 											<Card 
 												title={
 													<Space>
@@ -316,9 +413,9 @@ const IELTSPage: React.FC = () => {
 													<Col span={12}>
 														<Statistic
 															title="IELTS总分"
-															value={calculateOverallScore(result)}
+															value={calculateOverallScore(result.ielts_band_score)}
 															suffix="/ 9"
-															valueStyle={{ color: calculateOverallScore(result) >= 7 ? '#3f8600' : calculateOverallScore(result) >= 5.5 ? '#faad14' : '#cf1322' }}
+															valueStyle={{ color: calculateOverallScore(result.ielts_band_score) >= 7 ? '#3f8600' : calculateOverallScore(result.ielts_band_score) >= 5.5 ? '#faad14' : '#cf1322' }}
 														/>
 													</Col>
 													<Col span={12}>
@@ -349,8 +446,10 @@ const IELTSPage: React.FC = () => {
 													</Col>
 												</Row>
 											</Card>
+											)}
 
 											{/* 综合反馈 */}
+											{result.overall_feedback && (
 											<Card 
 												title={
 													<Space>
@@ -439,8 +538,10 @@ const IELTSPage: React.FC = () => {
 													</Panel>
 												</Collapse>
 											</Card>
+											)}
 
 															{/* 词汇评估 */}
+															{result.vocabulary_assessment && (
 															<Card 
 																title={
 																	<Space>
@@ -489,8 +590,10 @@ const IELTSPage: React.FC = () => {
 																			</Panel>
 																</Collapse>
 															</Card>
+															)}
 
 															{/* 流利度分析 */}
+															{result.fluency_markers && (
 															<Card 
 																title={
 																	<Space>
@@ -537,6 +640,7 @@ const IELTSPage: React.FC = () => {
 																	</Col>
 																</Row>
 															</Card>
+															)}
 
 													</Space>
 												</div>
@@ -547,7 +651,7 @@ const IELTSPage: React.FC = () => {
 									<div style={{ height: '100%', overflowY: 'auto', paddingLeft: 8 }}>
 										<Space direction="vertical" style={{ width: '100%' }} size="large">
 											{/* 语法错误 */}
-											{result.grammar_errors.length > 0 && (
+											{result.grammar_errors && result.grammar_errors.length > 0 && (
 												<Card 
 													title={
 														<Space>
@@ -589,7 +693,7 @@ const IELTSPage: React.FC = () => {
 											)}
 
 											{/* 用词问题 */}
-											{result.word_choice_issues.length > 0 && (
+											{result.word_choice_issues && result.word_choice_issues.length > 0 && (
 												<Card 
 													title={
 														<Space>
@@ -618,6 +722,7 @@ const IELTSPage: React.FC = () => {
 																)}
 
 																{/* 发音分析 */}
+																{result.pronunciation_analysis && (
 																<Card 
 																	title={
 																		<Space>
@@ -659,7 +764,7 @@ const IELTSPage: React.FC = () => {
 																		)}
 																	</Space>
 																</Card>
-
+																)}
 
 										</Space>
 									</div>
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式识别的音频预处理阶段
+将客户端音频（s16le / f32le / mulaw）整理为送入 Vosk 的 int16 PCM：
+数值清理、去爆音、去直流偏置与可选的增益归一化，全部为向量化 numpy 运算。
+VoiceActivityDetector 跳过长时间静音的解码，并在尾部静音足够长时自动结束话段。
+"""
+
+from collections import deque
+
+import numpy as np
+
+BYTES_PER_SAMPLE = {'s16le': 2, 'f32le': 4, 'mulaw': 1}
+
+
+def _build_mulaw_table():
+    """构建 G.711 μ-law 到 int16 的 256 项解码表，解码只需一次查表"""
+    codes = ~np.arange(256, dtype=np.uint8)
+    exponent = (codes >> 4) & 0x07
+    mantissa = (codes & 0x0F).astype(np.int32)
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+MULAW_DECODE_TABLE = _build_mulaw_table()
+
+
+class AudioPreprocessor:
+    """按会话配置的预处理阶段
+
+    每个会话持有一个实例：工作缓冲区按最大块长预分配并复用，
+    跨块状态（上一块末尾样本、直流估计）保存在实例中。实例不是线程安全的，
+    调用方需在会话锁内使用。
+
+    Args:
+        declick_threshold: 样本与上一个保留样本之差超过该值（int16 刻度）视为爆音，用该保留样本替换；None 关闭
+        remove_dc: 是否去除直流偏置（按块均值做指数平滑估计）
+        target_rms: 增益归一化的目标 RMS（int16 刻度）；None 关闭
+        max_gain: 增益归一化允许的最大放大倍数
+        dc_smoothing: 直流估计的平滑系数，越接近 1 越平稳
+    """
+
+    def __init__(self, declick_threshold=20000, remove_dc=False, target_rms=None,
+                 max_gain=4.0, dc_smoothing=0.95):
+        self.declick_threshold = declick_threshold
+        self.remove_dc = remove_dc
+        self.target_rms = target_rms
+        self.max_gain = max_gain
+        self.dc_smoothing = dc_smoothing
+
+        self._dc_offset = None
+        self._last_sample = 0.0
+        self._capacity = 0
+        self._work = None      # float32，长度 capacity + 1（首位存放上一块末尾样本）
+        self._diff = None      # float32，相邻样本差
+        self._out = None       # int16 输出缓冲
+
+        self.chunks_processed = 0
+        self.clicks_repaired = 0
+
+    @property
+    def passthrough(self):
+        """未启用任何会改变样本的阶段时，s16le 数据可零拷贝透传"""
+        return not self.remove_dc and self.target_rms is None
+
+    @property
+    def buffer_bytes(self):
+        """预分配工作缓冲区占用的字节数"""
+        if not self._capacity:
+            return 0
+        return self._work.nbytes + self._diff.nbytes + self._out.nbytes
+
+    def _ensure_capacity(self, n):
+        if n <= self._capacity:
+            return
+        capacity = max(n, self._capacity * 2, 1024)
+        self._work = np.empty(capacity + 1, dtype=np.float32)
+        self._diff = np.empty(capacity, dtype=np.float32)
+        self._out = np.empty(capacity, dtype=np.int16)
+        self._capacity = capacity
+
+    def process(self, audio_data, audio_format='s16le'):
+        """处理一块音频，返回 int16 PCM 字节"""
+        self.chunks_processed += 1
+
+        if audio_format == 's16le' and self.passthrough:
+            samples = np.frombuffer(audio_data, dtype=np.int16)
+            # 只读检查一遍相邻差值，确实存在爆音时才复制并修复
+            if self.declick_threshold is None or not self._has_clicks(samples):
+                if len(samples):
+                    self._last_sample = float(samples[-1])
+                return audio_data
+
+        n = len(audio_data) // BYTES_PER_SAMPLE[audio_format]
+        self._ensure_capacity(n)
+        work = self._work[:n + 1]
+        samples = work[1:]
+
+        if audio_format == 'f32le':
+            source = np.frombuffer(audio_data, dtype=np.float32, count=n)
+            # 清理：Inf 被裁剪到 ±1，NaN 置 0，再放大到 int16 刻度
+            np.clip(source, -1.0, 1.0, out=samples)
+            np.nan_to_num(samples, copy=False, nan=0.0)
+            samples *= 32767.0
+        elif audio_format == 'mulaw':
+            np.take(MULAW_DECODE_TABLE, np.frombuffer(audio_data, dtype=np.uint8, count=n), out=self._out[:n])
+            samples[:] = self._out[:n]
+        else:
+            samples[:] = np.frombuffer(audio_data, dtype=np.int16, count=n)
+
+        if self.remove_dc and n:
+            chunk_mean = float(samples.mean())
+            if self._dc_offset is None:
+                self._dc_offset = chunk_mean
+            else:
+                self._dc_offset = self.dc_smoothing * self._dc_offset + (1.0 - self.dc_smoothing) * chunk_mean
+            samples -= self._dc_offset
+
+        if self.target_rms is not None and n:
+            rms = float(np.sqrt(np.dot(samples, samples) / n))
+            if rms > 1.0:
+                samples *= min(self.target_rms / rms, self.max_gain)
+
+        if self.declick_threshold is not None and n:
+            self._declick(work, n)
+
+        if n:
+            self._last_sample = float(samples[-1])
+        out = self._out[:n]
+        np.clip(samples, -32768.0, 32767.0, out=samples)
+        np.copyto(out, samples, casting='unsafe')
+        return out.tobytes()
+
+    def _has_clicks(self, samples):
+        if not len(samples):
+            return False
+        if abs(float(samples[0]) - self._last_sample) > self.declick_threshold:
+            return True
+        n = len(samples)
+        if n < 2:
+            return False
+        self._ensure_capacity(n)
+        # 以 float32 计算差值，避免 int16 溢出且不产生临时数组
+        diff = self._diff[:n - 1]
+        np.subtract(samples[1:], samples[:-1], out=diff, dtype=np.float32)
+        np.abs(diff, out=diff)
+        return bool(diff.max() > self.declick_threshold)
+
+    def _declick(self, work, n):
+        """将与上一个保留样本跳变过大的样本替换为该保留样本（前向填充）
+
+        与逐样本循环的语义一致：阶跃之后持续偏离的样本都与阶跃前最后保留的样本比较，
+        直到信号回到阈值以内才恢复保留。保留段内用预先算好的相邻差值定位下一处跳变，
+        只有被替换的保持段需要扫描，且扫描窗口逐次加倍。
+        """
+        threshold = self.declick_threshold
+        work[0] = self._last_sample
+        diff = self._diff[:n]
+        np.subtract(work[1:], work[:-1], out=diff)
+        np.abs(diff, out=diff)
+        # work 中与前一个原始样本跳变过大的位置；保留段内只有这些位置可能是爆音
+        jumps = np.flatnonzero(diff > threshold) + 1
+        if not len(jumps):
+            return
+
+        end = n + 1
+        kept = 0  # work[kept] 为保留样本，之后的样本尚未处理
+        while True:
+            next_jump = int(np.searchsorted(jumps, kept + 1))
+            if next_jump == len(jumps):
+                break
+            click = int(jumps[next_jump])
+            reference = work[click - 1]
+            # 保持段：找到第一个回到参考值阈值以内的样本
+            start, width, resume = click, 64, end
+            while start < end:
+                stop = min(start + width, end)
+                back = np.flatnonzero(np.abs(work[start:stop] - reference) <= threshold)
+                if len(back):
+                    resume = start + int(back[0])
+                    break
+                start, width = stop, width * 2
+            work[click:resume] = reference
+            self.clicks_repaired += resume - click
+            if resume == end:
+                break
+            kept = resume
+
+    def stats(self):
+        return {
+            'chunks_processed': self.chunks_processed,
+            'clicks_repaired': self.clicks_repaired,
+            'dc_offset': self._dc_offset,
+        }
+
+
+class VoiceActivityDetector:
+    """基于能量与过零率的语音活动检测，按会话持有状态
+
+    以 10ms 为帧计算 RMS 与过零率（向量化），噪声底按静音帧自适应估计。
+    静音超过 padding 后的音频不再送入解码器，而是保留最近 padding 时长作为前导，
+    语音恢复时拼接在前面；话段中出现语音后，尾部静音达到 endpoint 时长即判定话段结束。
+
+    Args:
+        sample_rate: 输入采样率
+        energy_threshold: 语音帧的最低 RMS（int16 刻度）
+        noise_ratio: 语音帧 RMS 需超过噪声底的倍数
+        zcr_threshold: 能量稍低但过零率高于该值的帧（清辅音）也视为语音
+        padding_ms: 语音前后保留送入解码器的静音时长
+        endpoint_ms: 尾部静音达到该时长后自动结束话段；0 或 None 关闭
+        frame_ms: 分析帧长
+    """
+
+    def __init__(self, sample_rate, energy_threshold=200.0, noise_ratio=3.0, zcr_threshold=0.25,
+                 padding_ms=300, endpoint_ms=1000, frame_ms=10):
+        self.sample_rate = sample_rate
+        self.energy_threshold = energy_threshold
+        self.noise_ratio = noise_ratio
+        self.zcr_threshold = zcr_threshold
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
+        self.padding_samples = sample_rate * padding_ms // 1000
+        self.endpoint_samples = sample_rate * endpoint_ms // 1000 if endpoint_ms else None
+
+        self._noise_floor = None
+        # 距上一个语音帧的样本数；初始视为已超过 padding，开头的静音进入前导缓冲
+        self._trailing_silence = self.padding_samples
+        self._has_speech = False
+        self._preroll = deque()
+        self._preroll_samples = 0
+
+        self.samples_seen = 0
+        self.samples_skipped = 0
+        self.endpoints = 0
+
+    def _speech_frames(self, samples):
+        full = len(samples) - len(samples) % self.frame_len
+        if not full:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:full].reshape(-1, self.frame_len).astype(np.float32)
+        rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / self.frame_len)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_len - 1 or 1)
+
+        threshold = self.energy_threshold
+        if self._noise_floor is not None:
+            threshold = max(threshold, self._noise_floor * self.noise_ratio)
+        speech = (rms > threshold) | ((rms > threshold * 0.5) & (zcr > self.zcr_threshold))
+
+        quiet = rms[~speech]
+        if len(quiet):
+            estimate = float(np.median(quiet))
+            if self._noise_floor is None:
+                self._noise_floor = estimate
+            else:
+                self._noise_floor = 0.95 * self._noise_floor + 0.05 * estimate
+        return speech
+
+    def process(self, audio_bytes):
+        """处理一块 int16 音频
+
+        Returns:
+            (feed, endpoint)：feed 为应送入解码器的字节（None 表示跳过解码），
+            endpoint 为 True 表示尾部静音已达到自动结束话段的时长。
+        """
+        samples = np.frombuffer(audio_bytes, dtype=np.int16)
+        n = len(samples)
+        self.samples_seen += n
+        speech = self._speech_frames(samples)
+
+        if speech.any():
+            last_speech = int(np.flatnonzero(speech)[-1])
+            self._trailing_silence = n - (last_speech + 1) * self.frame_len
+            self._has_speech = True
+            if not self._preroll:
+                return audio_bytes, False
+            # 语音恢复：拼接前导静音，使解码器看到完整的起始音
+            self._preroll.append(audio_bytes)
+            feed = b''.join(self._preroll)
+            self.samples_skipped -= self._preroll_samples
+            self._preroll.clear()
+            self._preroll_samples = 0
+            return feed, False
+
+        previous_silence = self._trailing_silence
+        self._trailing_silence += n
+        endpoint = bool(
+            self._has_speech and self.endpoint_samples and self._trailing_silence >= self.endpoint_samples
+        )
+        if endpoint:
+            self._has_speech = False
+            self.endpoints += 1
+
+        if previous_silence < self.padding_samples:
+            # 语音之后的静音尾巴仍送入解码器
+            return audio_bytes, endpoint
+
+        self._preroll.append(audio_bytes)
+        self._preroll_samples += n
+        self.samples_skipped += n
+        while len(self._preroll) > 1 and self._preroll_samples - len(self._preroll[0]) // 2 >= self.padding_samples:
+            self._preroll_samples -= len(self._preroll.popleft()) // 2
+        return None, endpoint
+
+    def reset_utterance(self):
+        """解码器已在端点处输出 final，重新等待下一段语音"""
+        self._has_speech = False
+
+    def stats(self):
+        return {
+            'seconds_seen': round(self.samples_seen / self.sample_rate, 2),
+            'seconds_skipped': round(self.samples_skipped / self.sample_rate, 2),
+            'endpoints': self.endpoints,
+            'noise_floor': round(self._noise_floor, 1) if self._noise_floor is not None else None,
+        }
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量分析吞吐量测试（本地模拟 Gemini 后端）
+
+在本进程内启动一个模拟 Gemini REST API 的 HTTP 服务（generateContent 与
+streamGenerateContent），可配置响应延迟、随机 503 比例以及模拟的每分钟请求配额（超出返回 429）。
+分析服务以 GEMINI_BASE_URL 指向该模拟后端启动（关闭结果缓存），然后向
+/ielts-speaking-gemini/batch 提交一批转写文本，逐行读取 NDJSON 结果，统计：
+  - 总耗时、吞吐量（条/秒）、首条结果到达时间、各条结果到达时间的 p50/p95
+  - 成功/失败条数，服务端重试次数与等待预算的秒数（取自 /metrics）
+  - 模拟后端收到的请求数、注入的 503 数与配额拒绝（429）数
+结果写入 JSON 文件以便跨提交对比。不需要 Gemini API key，也不产生费用。
+
+用法:
+    python3 benchmarks/analysis_batch_throughput.py
+    python3 benchmarks/analysis_batch_throughput.py --items 100 --concurrency 16 --rpm 300 \
+        --latency-ms 2000 --error-rate 0.1 --mock-rpm 240
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 模拟后端返回的分析结果（符合 IELTS_ANALYSIS_SCHEMA）
+MOCK_ANALYSIS = {
+    'ielts_band_score': {
+        key: {'score': 6.0, 'rationale': '模拟结果'}
+        for key in ('fluency_and_coherence', 'lexical_resource', 'grammatical_range_and_accuracy',
+                    'pronunciation', 'overall')
+    },
+    'overall_feedback': {
+        'strengths': [{'point': '模拟优势', 'example': 'I come from a very beautiful city.'}],
+        'areas_for_improvement': [{'point': '模拟待改进', 'example': 'it is very modern and convenient'}],
+        'key_recommendations': [{'point': '模拟建议', 'example': 'lots of shopping malls'}],
+    },
+    'fluency_markers': {'analysis': '模拟', 'hesitation_markers': [{'marker': 'well', 'count': 1}],
+                        'connectors_used': ['however']},
+    'vocabulary_assessment': {'advanced_words_found': ['developed'], 'vocabulary_suggestions': []},
+    'grammar_errors': [],
+    'word_choice_issues': [],
+    'pronunciation_analysis': {'analysis': '模拟', 'potential_patterns': []},
+}
+
+
+class MockGemini:
+    """模拟后端的配置与计数"""
+
+    def __init__(self, latency, error_rate, rpm):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.counts = {'requests': 0, 'ok': 0, 'injected_errors': 0, 'quota_rejections': 0}
+
+    def admit(self):
+        """返回 HTTP 状态：200，注入的 503，或超出模拟配额的 429"""
+        now = time.monotonic()
+        with self.lock:
+            self.counts['requests'] += 1
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.rpm and len(self.recent) >= self.rpm:
+                self.counts['quota_rejections'] += 1
+                return 429
+            self.recent.append(now)
+            if random.random() < self.error_rate:
+                self.counts['injected_errors'] += 1
+                return 503
+            self.counts['ok'] += 1
+            return 200
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            text = ''.join(part.get('text', '') for content in request.get('contents', [])
+                           for part in content.get('parts', []))
+            status = mock.admit()
+            time.sleep(mock.latency * random.uniform(0.5, 1.5))
+            if status != 200:
+                kind = 'RESOURCE_EXHAUSTED' if status == 429 else 'UNAVAILABLE'
+                self._json(status, {'error': {'code': status, 'message': f'mock {kind}', 'status': kind}})
+                return
+
+            answer = json.dumps(MOCK_ANALYSIS, ensure_ascii=False)
+            usage = {'promptTokenCount': len(text) // 4 + 1500, 'candidatesTokenCount': len(answer) // 3}
+            usage['totalTokenCount'] = usage['promptTokenCount'] + usage['candidatesTokenCount']
+            if ':streamGenerateContent' not in self.path:
+                self._json(200, {
+                    'candidates': [{'content': {'role': 'model', 'parts': [{'text': answer}]},
+                                    'finishReason': 'STOP', 'index': 0}],
+                    'usageMetadata': usage,
+                })
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            pieces = [answer[i:i + 200] for i in range(0, len(answer), 200)]
+            for index, piece in enumerate(pieces):
+                chunk = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': piece}]}, 'index': 0}]}
+                if index == len(pieces) - 1:
+                    chunk['candidates'][0]['finishReason'] = 'STOP'
+                    chunk['usageMetadata'] = usage
+                data = f'data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n'.encode('utf-8')
+                self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+                self.wfile.flush()
+                time.sleep(0.02)
+            self.wfile.write(b'0\r\n\r\n')
+
+    return Handler
+
+
+def probe(port, path, timeout=2):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    except (OSError, ValueError):
+        return None, None
+    finally:
+        conn.close()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_transcripts(path, count):
+    """每条文本加上编号，避免内容完全相同"""
+    with open(path, encoding='utf-8') as f:
+        base = f.read()
+    return [{'id': f'student-{i:03d}', 'text': f'{base}\n\n(Student {i})'} for i in range(count)]
+
+
+def run_batch(port, items, timeout):
+    """提交批量请求，返回 (各条结果到达时间, 结果行, 汇总行, 总耗时)"""
+    body = json.dumps({'items': items}, ensure_ascii=False).encode('utf-8')
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    start = time.perf_counter()
+    conn.request('POST', '/ielts-speaking-gemini/batch', body=body,
+                 headers={'Content-Type': 'application/json', 'Cache-Control': 'no-cache'})
+    response = conn.getresponse()
+    if response.status != 200:
+        raise RuntimeError(f'batch request failed: {response.status} {response.read()[:200]!r}')
+    arrivals, lines, summary = [], [], None
+    while True:
+        line = response.readline()
+        if not line:
+            break
+        record = json.loads(line)
+        if 'summary' in record:
+            summary = record['summary']
+        else:
+            arrivals.append(time.perf_counter() - start)
+            lines.append(record)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return arrivals, lines, summary, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量分析吞吐量测试（模拟 Gemini 后端）')
+    parser.add_argument('--items', type=int, default=60, help='批量中的转写文本数')
+    parser.add_argument('--file', default=os.path.join(ROOT, 'sample_ielts_text.md'), help='转写文本样例')
+    parser.add_argument('--concurrency', type=int, default=8, help='ANALYSIS_BATCH_CONCURRENCY')
+    parser.add_argument('--rpm', type=int, default=240, help='服务端每分钟请求预算 ANALYSIS_GEMINI_RPM（0 不限）')
+    parser.add_argument('--tpm', type=int, default=4000000, help='服务端每分钟 token 预算 ANALYSIS_GEMINI_TPM（0 不限）')
+    parser.add_argument('--latency-ms', type=float, default=1500, help='模拟后端平均响应延迟')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='模拟后端随机返回 503 的比例')
+    parser.add_argument('--mock-rpm', type=int, default=0, help='模拟后端的每分钟配额，超出返回 429（0 不限）')
+    parser.add_argument('--port', type=int, default=5114, help='分析服务端口')
+    parser.add_argument('--asgi', action='store_true', help='以 ASGI 模式启动分析服务')
+    parser.add_argument('--output', help='结果 JSON 路径，缺省为 benchmarks/results/analysis-batch-<commit>-<时间>.json')
+    args = parser.parse_args()
+
+    mock = MockGemini(args.latency_ms / 1000.0, args.error_rate, args.mock_rpm)
+    backend = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(mock))
+    backend.daemon_threads = True
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+
+    env = dict(os.environ,
+               GEMINI_API_KEY='mock-key',
+               GEMINI_BASE_URL=f'http://127.0.0.1:{backend.server_address[1]}',
+               ANALYSIS_CACHE='0',
+               ANALYSIS_BATCH_CONCURRENCY=str(args.concurrency),
+               ANALYSIS_BATCH_MAX_ITEMS=str(max(args.items, 1)),
+               ANALYSIS_GEMINI_RPM=str(args.rpm),
+               ANALYSIS_GEMINI_TPM=str(args.tpm),
+               LOG_LEVEL='WARNING')
+    command = [sys.executable, os.path.join(ROOT, 'english_analysis_service.py'), '--port', str(args.port)]
+    if args.asgi:
+        command.append('--asgi')
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    try:
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            status, _ = probe(args.port, '/readyz')
+            if status == 200:
+                break
+            if status == 500 or server.poll() is not None:
+                raise RuntimeError('analysis service failed to start')
+            time.sleep(0.1)
+        else:
+            raise RuntimeError('analysis service not ready within 120s')
+
+        items = load_transcripts(args.file, args.items)
+        arrivals, lines, summary, elapsed = run_batch(args.port, items, timeout=600)
+        _, service_metrics = probe(args.port, '/metrics?format=json')
+    finally:
+        try:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=10)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+        backend.shutdown()
+
+    counters = (service_metrics or {}).get('counters', {})
+    report = {
+        'benchmark': 'analysis_batch',
+        'commit': git_commit(),
+        'timestamp': int(time.time()),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count()},
+        'config': {key: getattr(args, key) for key in ('items', 'concurrency', 'rpm', 'tpm', 'latency_ms',
+                                                       'error_rate', 'mock_rpm', 'asgi')},
+        'results': {
+            'seconds': round(elapsed, 3),
+            'items_per_second': round(len(lines) / elapsed, 3) if elapsed else None,
+            'first_item_seconds': round(arrivals[0], 3) if arrivals else None,
+            'item_arrival_p50_seconds': percentile(arrivals, 50),
+            'item_arrival_p95_seconds': percentile(arrivals, 95),
+            'succeeded': sum(1 for line in lines if line['status'] == 200),
+            'failed': sum(1 for line in lines if line['status'] != 200),
+            'summary': summary,
+            'gemini_retries': sum(counters.get('analysis_gemini_retries_total', {}).values()),
+            'gemini_throttled_seconds': round(
+                sum(counters.get('analysis_gemini_throttled_seconds_total', {}).values()), 3),
+        },
+        'mock_backend': mock.counts,
+    }
+
+    output = args.output
+    if not output:
+        results_dir = os.path.join(ROOT, 'benchmarks', 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"analysis-batch-{report['commit'] or 'unknown'}-{report['timestamp']}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({'results': report['results'], 'mock_backend': report['mock_backend']}, indent=2,
+                     ensure_ascii=False))
+    print(f'结果已写入 {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析服务基准测试套件（离线后端，不消耗 Gemini 配额）
+
+每个场景单独启动一个分析服务进程，以 ANALYSIS_BACKEND=synthetic（按 schema 生成结果）或
+replay（回放 ANALYSIS_BACKEND=record 录制的真实响应）运行，并按 --latency / --errors
+注入延迟分布与 503/429 等错误。场景：
+  - cache:  先逐条提交少量不同文本预热缓存，再并发提交这些文本（全部命中结果缓存）
+  - sync:   Flask 模式，并发提交互不相同的文本（跳过缓存）
+  - async:  ASGI 模式（--asgi），同上，Gemini 调用在事件循环上 await
+  - batch:  一次 /ielts-speaking-gemini/batch 请求提交全部文本，按 NDJSON 到达时间统计
+  - jobs:   并发提交到 /ielts-speaking-gemini/jobs 并长轮询到完成
+统计每个场景的吞吐量、延迟 p50/p95/p99、成功/失败数、服务端重试次数，以及服务进程的
+内存（就绪时 RSS 与运行中峰值 RSS，读取 /proc，仅 Linux）。结果写入 JSON 文件以便跨提交对比。
+
+用法:
+    python3 benchmarks/analysis_service_bench.py
+    python3 benchmarks/analysis_service_bench.py --scenarios sync,async --requests 400 --concurrency 64 \
+        --latency lognormal:2:0.5 --errors 503:0.05,429:0.02
+    # 先用真实 API 录制，再离线回放
+    ANALYSIS_BACKEND=record python3 english_analysis_service.py
+    python3 benchmarks/analysis_service_bench.py --backend replay --latency recorded
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ('cache', 'sync', 'async', 'batch', 'jobs')
+
+
+def probe(port, path, timeout=2):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    except (OSError, ValueError):
+        return None, None
+    finally:
+        conn.close()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def rss_mb(pid, field):
+    """/proc/<pid>/status 中的 VmRSS（当前）或 VmHWM（峰值），单位 MB；非 Linux 返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def multipart(filename, text):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        'Content-Type: text/markdown\r\n\r\n'
+    ).encode('utf-8') + text.encode('utf-8') + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def post(port, path, body, headers, timeout=300):
+    """返回 (HTTP 状态, 解析后的 JSON, 耗时秒)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    start = time.perf_counter()
+    try:
+        conn.request('POST', path, body=body, headers=headers)
+        response = conn.getresponse()
+        payload = response.read()
+        return response.status, json.loads(payload or b'null'), time.perf_counter() - start
+    except (OSError, ValueError):
+        return None, None, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def load_transcripts(path, count):
+    """每条文本加上编号，避免内容完全相同"""
+    with open(path, encoding='utf-8') as f:
+        base = f.read()
+    return [f'{base}\n\n(Student {i})' for i in range(count)]
+
+
+def start_service(args, scenario):
+    env = dict(os.environ,
+               ANALYSIS_BACKEND=args.backend,
+               ANALYSIS_BACKEND_DIR=args.recordings,
+               ANALYSIS_BACKEND_LATENCY=args.latency,
+               ANALYSIS_BACKEND_ERRORS=args.errors,
+               ANALYSIS_GEMINI_RPM=str(args.rpm),
+               ANALYSIS_GEMINI_TPM='0',
+               # 结果缓存只放在内存中；逐句复用会让后续文本走增量路径，基准中关闭
+               ANALYSIS_CACHE_PATH='',
+               ANALYSIS_INCREMENTAL='0',
+               ANALYSIS_BATCH_CONCURRENCY=str(args.concurrency),
+               ANALYSIS_BATCH_MAX_ITEMS=str(max(args.requests, 1)),
+               ANALYSIS_JOB_WORKERS=str(args.concurrency),
+               ANALYSIS_JOB_QUEUE=str(max(args.requests, 1)),
+               LOG_LEVEL='WARNING')
+    command = [sys.executable, os.path.join(ROOT, 'english_analysis_service.py'), '--port', str(args.port)]
+    if scenario == 'async':
+        command.append('--asgi')
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        status, _ = probe(args.port, '/readyz')
+        if status == 200:
+            return server
+        if status == 500 or server.poll() is not None:
+            break
+        time.sleep(0.1)
+    stop_service(server)
+    raise RuntimeError(f'analysis service failed to start for scenario {scenario}')
+
+
+def stop_service(server):
+    try:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=10)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+
+
+def submit_all(args, texts, path, headers=None):
+    """并发上传每条文本，返回 [(状态, 结果, 耗时)]"""
+    def upload(indexed):
+        index, text = indexed
+        body, upload_headers = multipart(f'student-{index:04d}.md', text)
+        return post(args.port, path, body, dict(upload_headers, **(headers or {})))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        return list(executor.map(upload, enumerate(texts)))
+
+
+def wait_job(port, payload, timeout=600):
+    """长轮询一个任务直到结束，返回 (任务的 HTTP 结果状态, 结果)"""
+    deadline = time.time() + timeout
+    while payload and payload.get('result') is None and time.time() < deadline:
+        _, payload = probe(port, f"{payload['status_url']}?wait=30", timeout=40)
+    if not payload or payload.get('result') is None:
+        return None, payload
+    return payload.get('result_status'), payload['result']
+
+
+def run_scenario(args, scenario, texts):
+    """返回 (各请求延迟, 成功数, 失败数, 额外信息)"""
+    no_cache = {'Cache-Control': 'no-cache'}
+    extra = {}
+    if scenario == 'cache':
+        warm = texts[:args.distinct]
+        submit_all(args, warm, '/ielts-speaking-gemini')
+        texts = [warm[index % len(warm)] for index in range(len(texts))]
+        responses = submit_all(args, texts, '/ielts-speaking-gemini')
+        extra['cache_hits'] = sum(1 for _, payload, _ in responses
+                                  if isinstance(payload, dict) and (payload.get('cache') or {}).get('hit'))
+    elif scenario in ('sync', 'async'):
+        responses = submit_all(args, texts, '/ielts-speaking-gemini', no_cache)
+    elif scenario == 'jobs':
+        def job(indexed):
+            index, text = indexed
+            body, headers = multipart(f'student-{index:04d}.md', text)
+            start = time.perf_counter()
+            status, payload, _ = post(args.port, '/ielts-speaking-gemini/jobs', body, dict(headers, **no_cache))
+            if status == 202:
+                status, payload = wait_job(args.port, payload)
+            return status, payload, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            responses = list(executor.map(job, enumerate(texts)))
+    else:
+        body = json.dumps({'items': texts}, ensure_ascii=False).encode('utf-8')
+        conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=600)
+        start = time.perf_counter()
+        conn.request('POST', '/ielts-speaking-gemini/batch', body=body,
+                     headers=dict(no_cache, **{'Content-Type': 'application/json'}))
+        response = conn.getresponse()
+        responses = []
+        for line in iter(response.readline, b''):
+            record = json.loads(line)
+            if 'summary' in record:
+                extra['summary'] = record['summary']
+            else:
+                responses.append((record['status'], record.get('result'), time.perf_counter() - start))
+        conn.close()
+    latencies = [elapsed for _, _, elapsed in responses]
+    succeeded = sum(1 for status, _, _ in responses if status == 200)
+    return latencies, succeeded, len(responses) - succeeded, extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析服务基准测试（离线后端）')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔：' + ', '.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='每个场景提交的文本数')
+    parser.add_argument('--concurrency', type=int, default=32, help='并发客户端数（也用作批量并发与任务 worker 数）')
+    parser.add_argument('--distinct', type=int, default=8, help='cache 场景中不同文本的数量')
+    parser.add_argument('--file', default=os.path.join(ROOT, 'sample_ielts_text.md'), help='转写文本样例')
+    parser.add_argument('--backend', default='synthetic', choices=('synthetic', 'replay'), help='离线后端')
+    parser.add_argument('--recordings', default=os.path.join(ROOT, '.analysis_recordings'),
+                        help='replay 后端读取的录制目录')
+    parser.add_argument('--latency', default='lognormal:1.5:0.4',
+                        help='后端延迟分布：fixed:S, uniform:A:B, lognormal:中位数:sigma, recorded[:倍数]')
+    parser.add_argument('--errors', default='503:0.02', help='注入错误，如 503:0.02,429:0.01（空字符串不注入）')
+    parser.add_argument('--rpm', type=int, default=0, help='服务端每分钟请求预算 ANALYSIS_GEMINI_RPM（0 不限）')
+    parser.add_argument('--port', type=int, default=5115, help='分析服务端口')
+    parser.add_argument('--output', help='结果 JSON 路径，缺省为 benchmarks/results/analysis-service-<commit>-<时间>.json')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'未知场景: {", ".join(sorted(unknown))}')
+    texts = load_transcripts(args.file, args.requests)
+
+    results = {}
+    for scenario in scenarios:
+        server = start_service(args, scenario)
+        try:
+            rss_ready = rss_mb(server.pid, 'VmRSS')
+            start = time.perf_counter()
+            latencies, succeeded, failed, extra = run_scenario(args, scenario, texts)
+            elapsed = time.perf_counter() - start
+            rss_peak = rss_mb(server.pid, 'VmHWM')
+            _, service_metrics = probe(args.port, '/metrics?format=json')
+        finally:
+            stop_service(server)
+        counters = (service_metrics or {}).get('counters', {})
+        results[scenario] = dict({
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 3) if elapsed else None,
+            'latency_p50_seconds': percentile(latencies, 50),
+            'latency_p95_seconds': percentile(latencies, 95),
+            'latency_p99_seconds': percentile(latencies, 99),
+            'succeeded': succeeded,
+            'failed': failed,
+            'gemini_retries': sum(counters.get('analysis_gemini_retries_total', {}).values()),
+            'rss_ready_mb': rss_ready,
+            'rss_peak_mb': rss_peak,
+        }, **extra)
+        print(f'{scenario}: {json.dumps(results[scenario], ensure_ascii=False)}')
+
+    report = {
+        'benchmark': 'analysis_service',
+        'commit': git_commit(),
+        'timestamp': int(time.time()),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count()},
+        'config': {key: getattr(args, key) for key in ('requests', 'concurrency', 'distinct', 'backend', 'latency',
+                                                       'errors', 'rpm')},
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        results_dir = os.path.join(ROOT, 'benchmarks', 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir,
+                              f"analysis-service-{report['commit'] or 'unknown'}-{report['timestamp']}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'结果已写入 {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+混合流量下的尾延迟负载测试
+
+同时运行三类客户端，模拟前端的真实流量：
+  - 健康检查轮询（global-layout.tsx / live/page.tsx 每 5 秒一次，可调快以加压）
+  - 流式识别会话：按实时节奏发送 100ms 的 s16le 音频块
+  - IELTS 分析请求：循环上传 markdown 文件（可选）
+
+分别对 Flask 开发服务器模式与 --asgi 模式运行，比较各类请求的 p50/p95/p99。
+
+用法:
+    python3 benchmarks/mixed_traffic_load.py --duration 60 --stream-sessions 8 \
+        --analysis-url http://localhost:5002 --analysis-file sample_ielts_text.md --output asgi.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import threading
+import time
+import uuid
+from array import array
+from urllib.parse import urlparse
+
+
+class LatencyLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, kind, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(kind, []).append(seconds)
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self):
+        result = {}
+        for kind, values in self.samples.items():
+            ordered = sorted(values)
+
+            def pct(p):
+                return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+            result[kind] = {
+                'requests': len(ordered),
+                'errors': self.errors.get(kind, 0),
+                'p50_ms': pct(50),
+                'p95_ms': pct(95),
+                'p99_ms': pct(99),
+                'max_ms': round(ordered[-1] * 1000, 2),
+            }
+        return result
+
+
+def connect(base_url, timeout=60):
+    parsed = urlparse(base_url)
+    return http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+
+
+def timed_request(conn, method, path, body=None, headers=None):
+    t0 = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    response.read()
+    return time.perf_counter() - t0, response.status < 500
+
+
+def health_poller(base_url, interval, stop, log, kind):
+    conn = connect(base_url, timeout=10)
+    while not stop.is_set():
+        try:
+            elapsed, ok = timed_request(conn, 'GET', '/health')
+        except OSError:
+            conn = connect(base_url, timeout=10)
+            elapsed, ok = 10.0, False
+        log.record(kind, elapsed, ok)
+        stop.wait(interval)
+
+
+def stream_session(base_url, chunk, chunk_seconds, stop, log):
+    conn = connect(base_url)
+    while not stop.is_set():
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            'X-Session-Id': uuid.uuid4().hex,
+            'X-Audio-Format': 's16le',
+            'X-Sample-Rate': '16000',
+        }
+        # 每个话段约 10 秒，按实时节奏发送
+        for _ in range(int(10 / chunk_seconds)):
+            if stop.is_set():
+                break
+            started = time.perf_counter()
+            try:
+                elapsed, ok = timed_request(conn, 'POST', '/recognize_stream', chunk, headers)
+            except OSError:
+                conn = connect(base_url)
+                elapsed, ok = 60.0, False
+            log.record('recognize_stream', elapsed, ok)
+            stop.wait(max(0.0, chunk_seconds - (time.perf_counter() - started)))
+        try:
+            elapsed, ok = timed_request(conn, 'POST', '/recognize_stream', b'',
+                                        dict(headers, **{'X-End-Of-Utterance': '1'}))
+            log.record('recognize_stream_final', elapsed, ok)
+        except OSError:
+            conn = connect(base_url)
+
+
+def analysis_client(base_url, filename, content, stop, log):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        'Content-Type: text/markdown\r\n\r\n'
+    ).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    conn = connect(base_url, timeout=120)
+    while not stop.is_set():
+        try:
+            elapsed, ok = timed_request(conn, 'POST', '/ielts-speaking-gemini', body, headers)
+        except OSError:
+            conn = connect(base_url, timeout=120)
+            elapsed, ok = 120.0, False
+        log.record('ielts_analysis', elapsed, ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='混合流量尾延迟负载测试')
+    parser.add_argument('--vosk-url', default='http://localhost:5001')
+    parser.add_argument('--analysis-url', help='分析服务地址；不提供则只测试 Vosk 服务')
+    parser.add_argument('--analysis-file', default='sample_ielts_text.md')
+    parser.add_argument('--analysis-clients', type=int, default=4)
+    parser.add_argument('--stream-sessions', type=int, default=8)
+    parser.add_argument('--health-pollers', type=int, default=4)
+    parser.add_argument('--health-interval', type=float, default=0.5)
+    parser.add_argument('--duration', type=float, default=60.0)
+    parser.add_argument('--output', help='结果 JSON 文件路径')
+    args = parser.parse_args()
+
+    chunk_seconds = 0.1
+    chunk = array('h', (
+        int(8000 * math.sin(2 * math.pi * 220 * i / 16000)) for i in range(int(16000 * chunk_seconds))
+    )).tobytes()
+
+    log = LatencyLog()
+    stop = threading.Event()
+    threads = []
+    for _ in range(args.health_pollers):
+        threads.append(threading.Thread(target=health_poller,
+                                        args=(args.vosk_url, args.health_interval, stop, log, 'vosk_health')))
+    for _ in range(args.stream_sessions):
+        threads.append(threading.Thread(target=stream_session, args=(args.vosk_url, chunk, chunk_seconds, stop, log)))
+    if args.analysis_url:
+        with open(args.analysis_file, 'rb') as f:
+            content = f.read()
+        filename = args.analysis_file.rsplit('/', 1)[-1]
+        for _ in range(args.health_pollers):
+            threads.append(threading.Thread(target=health_poller,
+                                            args=(args.analysis_url, args.health_interval, stop, log, 'analysis_health')))
+        for _ in range(args.analysis_clients):
+            threads.append(threading.Thread(target=analysis_client,
+                                            args=(args.analysis_url, filename, content, stop, log)))
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=130)
+
+    report = {
+        'duration_seconds': args.duration,
+        'stream_sessions': args.stream_sessions,
+        'health_pollers': args.health_pollers,
+        'analysis_clients': args.analysis_clients if args.analysis_url else 0,
+        'latency': log.summary(),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
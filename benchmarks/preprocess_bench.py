@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频预处理单块耗时微基准：旧的 recognize_audio_stream 转换路径 vs AudioPreprocessor
+
+用法:
+    python3 benchmarks/preprocess_bench.py --repeat 2000
+
+旧路径按原实现复刻了全部数组遍历（日志用的 min/max、isnan/isinf、clip、缩放、
+np.diff 跳变检查与逐样本去爆音循环），只去掉了 print 本身的 I/O。
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_preprocessing import AudioPreprocessor  # noqa: E402
+
+
+def legacy_convert(audio_data):
+    """基线版本 recognize_audio_stream 中的 Float32 -> int16 转换与去爆音"""
+    float_data = np.frombuffer(audio_data, dtype=np.float32)
+    log = f"[{float_data.min():.3f}, {float_data.max():.3f}]"
+    if np.any(np.isnan(float_data)) or np.any(np.isinf(float_data)):
+        float_data = np.nan_to_num(float_data, nan=0.0, posinf=1.0, neginf=-1.0)
+    float_data = np.clip(float_data, -1.0, 1.0)
+    data_range = float_data.max() - float_data.min()
+    int16_data = (float_data * 32767).astype(np.int16)
+    log += f"[{int16_data.min()}, {int16_data.max()}] {data_range}"
+    audio_bytes = int16_data.tobytes()
+    audio_samples = np.frombuffer(audio_bytes, dtype=np.int16).copy()
+    if len(audio_samples) > 1:
+        diff = np.abs(np.diff(audio_samples.astype(np.float32)))
+        max_diff = np.max(diff)
+        if max_diff > 20000:
+            for i in range(1, len(audio_samples)):
+                if abs(int(audio_samples[i]) - int(audio_samples[i-1])) > 20000:
+                    audio_samples[i] = audio_samples[i-1]
+            audio_bytes = audio_samples.tobytes()
+    return audio_bytes
+
+
+def make_chunk(samples, clicks, rng):
+    t = np.arange(samples, dtype=np.float32) / 16000
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.02 * rng.standard_normal(samples).astype(np.float32)
+    if clicks:
+        positions = rng.choice(samples, size=max(1, samples // 1000), replace=False)
+        signal[positions] = np.where(signal[positions] > 0, -1.0, 1.0)
+    return signal.astype(np.float32).tobytes()
+
+
+def bench(func, repeat):
+    timer = timeit.Timer(func)
+    number = max(1, repeat // 10)
+    best = min(timer.repeat(repeat=10, number=number)) / number
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='音频预处理微基准')
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    for chunk_ms in (20, 100, 1000):
+        samples = 16000 * chunk_ms // 1000
+        for clicks in (False, True):
+            chunk = make_chunk(samples, clicks, rng)
+            f32_pre = AudioPreprocessor()
+            s16_pre = AudioPreprocessor()
+            s16_chunk = (np.frombuffer(chunk, dtype=np.float32) * 32767).astype(np.int16).tobytes()
+            results.append({
+                'chunk_ms': chunk_ms,
+                'clicks': clicks,
+                'legacy_f32_us': bench(lambda: legacy_convert(chunk), args.repeat),
+                'preprocessor_f32_us': bench(lambda: f32_pre.process(chunk, 'f32le'), args.repeat),
+                'preprocessor_s16_us': bench(lambda: s16_pre.process(s16_chunk, 's16le'), args.repeat),
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
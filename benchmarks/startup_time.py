@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务冷启动时间测试
+
+对 Vosk 服务与英语分析服务分别测量（每项重复 --repeat 次取中位数）：
+  - 导入耗时：新解释器中导入服务模块的墙钟时间，以及 `python -X importtime` 统计的
+    耗时最多的顶层依赖包（累计秒数）
+  - 加载耗时：Vosk 默认模型加载、识别器池预热；Gemini SDK 导入与客户端创建
+    （取自服务 /readyz 报告的各启动步骤耗时）
+  - 端到端：从启动进程到 /livez 可用（端口已绑定）、到 /readyz 就绪的时间
+结果写入 JSON 文件以便跨提交对比。
+
+用法:
+    python3 benchmarks/startup_time.py
+    python3 benchmarks/startup_time.py --service vosk --repeat 5 --workers 2
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVICES = {
+    'vosk': {'module': 'vosk_service', 'script': 'vosk_service.py', 'port': 5112},
+    'analysis': {'module': 'english_analysis_service', 'script': 'english_analysis_service.py', 'port': 5113},
+}
+
+
+def probe(port, path, timeout=2):
+    """返回 (状态码, JSON)；无法连接时返回 (None, None)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read()
+        try:
+            return response.status, json.loads(body)
+        except ValueError:
+            return response.status, None
+    except OSError:
+        return None, None
+    finally:
+        conn.close()
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 4) if values else None
+
+
+def measure_import(module):
+    """新解释器中导入服务模块的墙钟时间（秒）"""
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT, stderr=subprocess.DEVNULL, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def import_breakdown(module, top=10):
+    """`-X importtime` 中耗时最多的顶层包：{包名: 累计秒数}"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = (field.strip() for field in line[len('import time:'):].split('|'))
+        if not cumulative.isdigit() or name == module:
+            continue
+        # 包只在首次导入时计时，按顶层包名取最大的累计值即为导入该包的总耗时
+        root = name.split('.')[0]
+        packages[root] = max(packages.get(root, 0), int(cumulative))
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {name: round(us / 1e6, 4) for name, us in ranked}
+
+
+def measure_cold_start(service, args, timeout=180.0):
+    """启动服务进程，测量到 /livez 与 /readyz 的时间，返回结果与 /readyz 的启动步骤"""
+    spec = SERVICES[service]
+    port = spec['port']
+    command = [sys.executable, os.path.join(ROOT, spec['script']), '--port', str(port)]
+    if service == 'vosk':
+        command += ['--workers', str(args.workers)]
+    if args.asgi:
+        command.append('--asgi')
+
+    start = time.perf_counter()
+    # 独立进程组：单进程 Flask 模式下 debug 重载器会再启动一个服务子进程，结束时一并终止
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              start_new_session=True)
+    live = ready = None
+    readiness = None
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline and server.poll() is None:
+            if live is None:
+                status, _ = probe(port, '/livez', timeout=0.5)
+                if status is not None:
+                    live = time.perf_counter() - start
+            if live is not None:
+                status, readiness = probe(port, '/readyz', timeout=2)
+                if status == 200:
+                    ready = time.perf_counter() - start
+                    break
+                if status == 500:
+                    break
+            time.sleep(0.01)
+    finally:
+        try:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=10)
+        except ProcessLookupError:
+            pass
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+
+    steps = {step['name']: step['seconds'] for step in (readiness or {}).get('steps', [])}
+    return {
+        'time_to_live': live,
+        'time_to_ready': ready,
+        'startup_error': (readiness or {}).get('error'),
+        'steps': steps,
+    }
+
+
+def run_service(service, args):
+    module = SERVICES[service]['module']
+    imports = [measure_import(module) for _ in range(args.repeat)]
+    cold_starts = [measure_cold_start(service, args) for _ in range(args.repeat)]
+    step_names = sorted({name for run in cold_starts for name in run['steps']})
+    return {
+        'import_seconds': median(imports),
+        'import_breakdown_seconds': import_breakdown(module),
+        'load_steps_seconds': {name: median([run['steps'].get(name) for run in cold_starts]) for name in step_names},
+        'time_to_live_seconds': median([run['time_to_live'] for run in cold_starts]),
+        'time_to_ready_seconds': median([run['time_to_ready'] for run in cold_starts]),
+        'errors': sorted({run['startup_error'] for run in cold_starts if run['startup_error']}),
+        'runs': cold_starts,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务冷启动时间测试')
+    parser.add_argument('--service', choices=['all', *SERVICES], default='all', help='测试的服务')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测量的重复次数（取中位数）')
+    parser.add_argument('--workers', type=int, default=0, help='Vosk 服务的解码进程数（多进程模式同步加载模型）')
+    parser.add_argument('--asgi', action='store_true', help='以 ASGI 模式启动服务')
+    parser.add_argument('--output', help='结果 JSON 路径，缺省为 benchmarks/results/startup-<commit>-<时间>.json')
+    args = parser.parse_args()
+
+    services = list(SERVICES) if args.service == 'all' else [args.service]
+    report = {
+        'benchmark': 'startup',
+        'commit': git_commit(),
+        'timestamp': int(time.time()),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count()},
+        'config': {'repeat': args.repeat, 'workers': args.workers, 'asgi': args.asgi},
+        'services': {service: run_service(service, args) for service in services},
+    }
+
+    output = args.output
+    if not output:
+        results_dir = os.path.join(ROOT, 'benchmarks', 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"startup-{report['commit'] or 'unknown'}-{report['timestamp']}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    summary = {
+        service: {key: result[key] for key in ('import_seconds', 'load_steps_seconds', 'time_to_live_seconds',
+                                               'time_to_ready_seconds', 'errors')}
+        for service, result in report['services'].items()
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    print(f'结果已写入 {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/recognize_stream 并发负载测试
+
+以 N 个模拟会话回放 WAV 文件：每个会话按浏览器 AudioWorklet 的节奏发送 s16le 音频块
+（默认 2048 样本一块，按实时速度节流），结束时发送 X-End-Of-Utterance。
+统计单块延迟 p50/p95/p99、首个 partial 的到达时间、结束话段到 final 的时间、
+服务端 CPU 实时率（CPU 秒 / 音频秒）与峰值 RSS，结果写入 JSON 文件以便跨提交对比。
+
+默认启动一个使用内置 vosk-model-small-en-us-0.15 模型的服务实例（--url 可改为压测已运行的服务，
+此时 CPU 与 RSS 需通过 --server-pid 指定进程才能采集）。
+
+用法:
+    python3 benchmarks/stream_load_test.py --wav answer1.wav answer2.wav --sessions 8
+    python3 benchmarks/stream_load_test.py --sessions 32 --speed 0 --workers 4
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import wave
+from array import array
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def load_wav(path):
+    """读取单声道 16 位 WAV，返回 (pcm, 采样率)；采样率原样上报给服务"""
+    with wave.open(path, 'rb') as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise SystemExit(f'{path}: 需要单声道、16位 WAV 文件')
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+
+def synthetic_pcm(seconds, sample_rate=16000):
+    """未提供 WAV 时生成调幅正弦波（只能测吞吐，不会产生有意义的识别文本）"""
+    return array('h', (
+        int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate)
+            * (0.5 + 0.5 * math.sin(2 * math.pi * 3 * i / sample_rate)))
+        for i in range(int(seconds * sample_rate))
+    )).tobytes(), sample_rate
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def latency_summary(seconds):
+    return {
+        'count': len(seconds),
+        'p50_ms': round(percentile(seconds, 0.50) * 1000, 2) if seconds else None,
+        'p95_ms': round(percentile(seconds, 0.95) * 1000, 2) if seconds else None,
+        'p99_ms': round(percentile(seconds, 0.99) * 1000, 2) if seconds else None,
+        'max_ms': round(max(seconds) * 1000, 2) if seconds else None,
+    }
+
+
+def process_tree(pid):
+    """pid 及其所有子进程（多进程解码模式下包含解码进程）"""
+    pids = [pid]
+    index = 0
+    while index < len(pids):
+        current = pids[index]
+        index += 1
+        try:
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def read_usage(pid):
+    """返回进程树的 (CPU 秒, RSS 字节)，读取 /proc（仅 Linux）"""
+    cpu_ticks = 0
+    rss_pages = 0
+    for p in process_tree(pid):
+        try:
+            with open(f'/proc/{p}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        # utime/stime 为第 14/15 个字段，rss 为第 24 个（去掉 pid 与 comm 后下标减 2）
+        cpu_ticks += int(fields[11]) + int(fields[12])
+        rss_pages += int(fields[21])
+    return cpu_ticks / CLK_TCK, rss_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class UsageSampler:
+    """后台采样服务进程树的峰值 RSS"""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            _, rss = read_usage(self.pid)
+            self.peak_rss = max(self.peak_rss, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def fetch_json(host, port, path, timeout=10):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read()
+        return json.loads(body) if response.status == 200 else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def wait_ready(host, port, timeout=180.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        # /readyz 在模型加载且识别器池预热完成前返回 503（fetch_json 得到 None）
+        if fetch_json(host, port, '/readyz', timeout=2):
+            return
+        time.sleep(0.5)
+    raise RuntimeError('服务未在超时时间内就绪')
+
+
+def run_session(host, port, pcm, sample_rate, chunk_samples, speed, start_delay, record):
+    """回放一个会话；speed 为回放倍速，0 表示不节流"""
+    time.sleep(start_delay)
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    headers = {
+        'Content-Type': 'application/octet-stream',
+        'X-Session-Id': uuid.uuid4().hex,
+        'X-Audio-Format': 's16le',
+        'X-Sample-Rate': str(sample_rate),
+    }
+    chunk_bytes = chunk_samples * 2
+    latencies = []
+    errors = 0
+    first_partial = None
+    session_start = time.perf_counter()
+    for offset in range(0, len(pcm), chunk_bytes):
+        if speed:
+            # 按音频时间戳节流，模拟麦克风实时采集
+            due = session_start + offset / 2 / sample_rate / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        conn.request('POST', '/recognize_stream', body=pcm[offset:offset + chunk_bytes], headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        t1 = time.perf_counter()
+        latencies.append(t1 - t0)
+        if response.status != 200:
+            errors += 1
+            continue
+        if first_partial is None:
+            try:
+                if json.loads(body).get('text'):
+                    first_partial = t1 - session_start
+            except ValueError:
+                pass
+
+    t0 = time.perf_counter()
+    conn.request('POST', '/recognize_stream', body=b'', headers=dict(headers, **{'X-End-Of-Utterance': '1'}))
+    response = conn.getresponse()
+    final_body = response.read()
+    final_latency = time.perf_counter() - t0
+    conn.close()
+    try:
+        final_text = json.loads(final_body).get('text', '')
+    except ValueError:
+        final_text = ''
+    record({
+        'chunk_latencies': latencies,
+        'errors': errors + (response.status != 200),
+        'first_partial': first_partial,
+        'final_latency': final_latency,
+        'final_text': final_text,
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/recognize_stream 并发负载测试')
+    parser.add_argument('--wav', nargs='*', default=[], help='单声道 16 位 WAV 文件，各会话轮流使用')
+    parser.add_argument('--seconds', type=float, default=20.0, help='未提供 WAV 时合成音频的时长')
+    parser.add_argument('--sessions', type=int, default=8, help='并发会话数')
+    parser.add_argument('--chunk-samples', type=int, default=2048, help='每块样本数（浏览器 AudioWorklet 为 2048）')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速，1 为实时，0 为不节流')
+    parser.add_argument('--ramp', type=float, default=2.0, help='会话在该秒数内均匀启动')
+    parser.add_argument('--url', help='压测已运行的服务（如 http://127.0.0.1:5001），缺省时启动新实例')
+    parser.add_argument('--server-pid', type=int, help='配合 --url 采集 CPU 与 RSS 的服务进程ID')
+    parser.add_argument('--workers', type=int, default=0, help='启动新实例时的解码进程数')
+    parser.add_argument('--port', type=int, default=5111, help='启动新实例时的监听端口')
+    parser.add_argument('--output', help='结果 JSON 路径，缺省为 benchmarks/results/stream_load-<commit>-<时间>.json')
+    args = parser.parse_args()
+
+    clips = [load_wav(path) for path in args.wav] or [synthetic_pcm(args.seconds)]
+
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+        server_pid = args.server_pid
+    else:
+        host, port = '127.0.0.1', args.port
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, 'vosk_service.py'), '--workers', str(args.workers),
+             '--port', str(port)],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        server_pid = server.pid
+
+    results = []
+    lock = threading.Lock()
+
+    def record(result):
+        with lock:
+            results.append(result)
+
+    try:
+        wait_ready(host, port)
+        metrics_before = fetch_json(host, port, '/metrics?format=json')
+        cpu_before = read_usage(server_pid)[0] if server_pid else None
+        threads = []
+        for index in range(args.sessions):
+            pcm, rate = clips[index % len(clips)]
+            delay = args.ramp * index / args.sessions if args.sessions else 0
+            threads.append(threading.Thread(
+                target=run_session,
+                args=(host, port, pcm, rate, args.chunk_samples, args.speed, delay, record),
+            ))
+        with UsageSampler(server_pid) if server_pid else contextlib.nullcontext() as sampler:
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        wall = time.perf_counter() - start
+        cpu_after = read_usage(server_pid)[0] if server_pid else None
+        metrics_after = fetch_json(host, port, '/metrics?format=json')
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    audio_seconds = sum(len(clips[i % len(clips)][0]) / 2 / clips[i % len(clips)][1] for i in range(args.sessions))
+    chunk_latencies = [latency for r in results for latency in r['chunk_latencies']]
+    first_partials = [r['first_partial'] for r in results if r['first_partial'] is not None]
+    report = {
+        'benchmark': 'stream_load',
+        'commit': git_commit(),
+        'timestamp': int(time.time()),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count()},
+        'config': {
+            'sessions': args.sessions,
+            'chunk_samples': args.chunk_samples,
+            'speed': args.speed,
+            'ramp_seconds': args.ramp,
+            'workers': None if args.url else args.workers,
+            'wav': args.wav or None,
+        },
+        'wall_seconds': round(wall, 3),
+        'audio_seconds': round(audio_seconds, 3),
+        'errors': sum(r['errors'] for r in results),
+        'chunk_latency': latency_summary(chunk_latencies),
+        'time_to_first_partial': latency_summary(first_partials),
+        'sessions_without_partial': len(results) - len(first_partials),
+        'final_latency': latency_summary([r['final_latency'] for r in results]),
+        'empty_finals': sum(1 for r in results if not r['final_text']),
+        'cpu_seconds': round(cpu_after - cpu_before, 3) if cpu_before is not None else None,
+        'cpu_realtime_factor': round((cpu_after - cpu_before) / audio_seconds, 4) if cpu_before is not None else None,
+        'peak_rss_mb': round(sampler.peak_rss / 1024 / 1024, 1) if sampler else None,
+        'server_metrics': {'before': metrics_before, 'after': metrics_after},
+    }
+
+    output = args.output
+    if not output:
+        results_dir = os.path.join(ROOT, 'benchmarks', 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"stream_load-{report['commit'] or 'unknown'}-{report['timestamp']}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    summary = {key: report[key] for key in ('chunk_latency', 'time_to_first_partial', 'final_latency',
+                                            'cpu_realtime_factor', 'peak_rss_mb', 'errors')}
+    print(json.dumps(summary, indent=2))
+    print(f'结果已写入 {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比 /recognize_stream（每块一次 HTTP POST）与 /recognize_ws（WebSocket 长连接）的延迟
+
+用法:
+    python3 vosk_service.py            # 先启动服务
+    python3 benchmarks/stream_transport_latency.py --wav answer.wav --runs 5
+
+未指定 --wav 时使用合成音频。输出为 JSON，包含每种传输方式的单块延迟分位数、
+整段音频的排空时间（发送全部音频块直到收到 final）以及结束话段到 final 的延迟。
+"""
+
+import argparse
+import http.client
+import json
+import math
+import statistics
+import threading
+import time
+import uuid
+import wave
+from array import array
+from urllib.parse import urlparse
+
+from simple_websocket import Client, ConnectionClosed
+
+
+def load_float32_audio(wav_path, seconds):
+    """读取 16kHz 单声道 16 位 WAV 并转换为 Float32 字节；未提供时生成合成音频"""
+    if wav_path:
+        with wave.open(wav_path, 'rb') as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
+                raise SystemExit('需要单声道、16位、16kHz 的 WAV 文件')
+            pcm = array('h', wf.readframes(wf.getnframes()))
+        return array('f', (s / 32768.0 for s in pcm)).tobytes()
+
+    samples = array('f', (
+        0.3 * math.sin(2 * math.pi * 220 * (i / 16000)) * (0.5 + 0.5 * math.sin(2 * math.pi * 3 * (i / 16000)))
+        for i in range(int(seconds * 16000))
+    ))
+    return samples.tobytes()
+
+
+def split_chunks(audio, chunk_ms):
+    step = int(16000 * chunk_ms / 1000) * 4
+    return [audio[i:i + step] for i in range(0, len(audio), step)]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_http(base_url, chunks):
+    """逐块 POST（与前端 fetch 一样复用 keep-alive 连接），记录每个请求的往返时间"""
+    parsed = urlparse(base_url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    session_id = uuid.uuid4().hex
+    chunk_latencies = []
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        t0 = time.perf_counter()
+        conn.request('POST', '/recognize_stream', body=chunk, headers={
+            'Content-Type': 'application/octet-stream',
+            'X-Session-Id': session_id,
+        })
+        conn.getresponse().read()
+        chunk_latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    conn.request('POST', '/recognize_stream', body=b'', headers={
+        'Content-Type': 'application/octet-stream',
+        'X-Session-Id': session_id,
+        'X-End-Of-Utterance': '1',
+    })
+    json.loads(conn.getresponse().read())
+    end = time.perf_counter()
+    conn.close()
+
+    return {
+        'chunk_latencies': chunk_latencies,
+        'drain_seconds': end - start,
+        'final_latency_seconds': end - t0,
+    }
+
+
+def run_websocket(base_url, chunks):
+    """通过一条 WebSocket 连续发送全部音频块，最后发送 end 控制消息等待 final"""
+    ws_url = base_url.replace('http', 'ws', 1).rstrip('/') + '/recognize_ws'
+    ws = Client.connect(ws_url) if hasattr(Client, 'connect') else Client(ws_url)
+    ready = json.loads(ws.receive())
+    if ready.get('type') != 'ready':
+        raise RuntimeError(f'WebSocket 握手失败: {ready}')
+
+    final_received = threading.Event()
+    pushed = []
+
+    def reader():
+        try:
+            while not final_received.is_set():
+                message = json.loads(ws.receive())
+                pushed.append(message)
+                if message.get('type') == 'final' and end_sent.is_set():
+                    final_received.set()
+        except ConnectionClosed:
+            final_received.set()
+
+    end_sent = threading.Event()
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        ws.send(chunk)
+    t0 = time.perf_counter()
+    end_sent.set()
+    ws.send(json.dumps({'type': 'end'}))
+    final_received.wait(timeout=30)
+    end = time.perf_counter()
+    ws.close()
+
+    return {
+        'drain_seconds': end - start,
+        'final_latency_seconds': end - t0,
+        'messages_pushed': len(pushed),
+    }
+
+
+def summarize(runs, chunk_count):
+    drains = [r['drain_seconds'] for r in runs]
+    finals = [r['final_latency_seconds'] for r in runs]
+    summary = {
+        'drain_seconds_median': statistics.median(drains),
+        'per_chunk_amortized_ms': statistics.median(drains) / chunk_count * 1000,
+        'final_latency_ms_median': statistics.median(finals) * 1000,
+    }
+    latencies = [x for r in runs for x in r.get('chunk_latencies', [])]
+    if latencies:
+        summary.update({
+            'chunk_latency_ms_p50': percentile(latencies, 50) * 1000,
+            'chunk_latency_ms_p95': percentile(latencies, 95) * 1000,
+            'chunk_latency_ms_p99': percentile(latencies, 99) * 1000,
+        })
+    if 'messages_pushed' in runs[0]:
+        summary['messages_pushed_median'] = statistics.median(r['messages_pushed'] for r in runs)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vosk 流式传输延迟对比')
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--wav', help='16kHz 单声道 16 位 WAV 文件')
+    parser.add_argument('--seconds', type=float, default=10.0, help='合成音频时长')
+    parser.add_argument('--chunk-ms', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = split_chunks(load_float32_audio(args.wav, args.seconds), args.chunk_ms)
+    http_runs = [run_http(args.url, chunks) for _ in range(args.runs)]
+    ws_runs = [run_websocket(args.url, chunks) for _ in range(args.runs)]
+
+    print(json.dumps({
+        'chunks': len(chunks),
+        'chunk_ms': args.chunk_ms,
+        'http_post': summarize(http_runs, len(chunks)),
+        'websocket': summarize(ws_runs, len(chunks)),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
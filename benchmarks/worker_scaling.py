@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程解码吞吐随核数扩展的基准
+
+依次以 --workers 1, 2, 4 ...（不超过 CPU 核数）启动 vosk_service.py，
+用 N 个并发会话不加节流地推送 s16le 音频块，统计每秒解码的音频秒数（实时倍数）与单块延迟。
+
+用法:
+    python3 benchmarks/worker_scaling.py --sessions 16 --seconds 20 --wav answer.wav
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import wave
+from array import array
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_pcm16(wav_path, seconds):
+    """读取 16kHz 单声道 16 位 WAV；未提供时生成合成音频"""
+    if wav_path:
+        with wave.open(wav_path, 'rb') as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
+                raise SystemExit('需要单声道、16位、16kHz 的 WAV 文件')
+            return wf.readframes(wf.getnframes())
+    return array('h', (
+        int(8000 * math.sin(2 * math.pi * 220 * i / 16000) * (0.5 + 0.5 * math.sin(2 * math.pi * 3 * i / 16000)))
+        for i in range(int(seconds * 16000))
+    )).tobytes()
+
+
+def wait_ready(port, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if json.loads(conn.getresponse().read()).get('model_loaded'):
+                return
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('服务未在超时时间内就绪')
+
+
+def run_session(port, pcm, chunk_bytes, latencies, lock):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    session_id = uuid.uuid4().hex
+    headers = {
+        'Content-Type': 'application/octet-stream',
+        'X-Session-Id': session_id,
+        'X-Audio-Format': 's16le',
+        'X-Sample-Rate': '16000',
+    }
+    local = []
+    for offset in range(0, len(pcm), chunk_bytes):
+        t0 = time.perf_counter()
+        conn.request('POST', '/recognize_stream', body=pcm[offset:offset + chunk_bytes], headers=headers)
+        conn.getresponse().read()
+        local.append(time.perf_counter() - t0)
+    conn.request('POST', '/recognize_stream', body=b'', headers=dict(headers, **{'X-End-Of-Utterance': '1'}))
+    conn.getresponse().read()
+    conn.close()
+    with lock:
+        latencies.extend(local)
+
+
+def bench_workers(workers, port, pcm, sessions, chunk_ms):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'vosk_service.py'), '--workers', str(workers), '--port', str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        latencies = []
+        lock = threading.Lock()
+        chunk_bytes = 16000 * 2 * chunk_ms // 1000
+        threads = [
+            threading.Thread(target=run_session, args=(port, pcm, chunk_bytes, latencies, lock))
+            for _ in range(sessions)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    audio_seconds = sessions * len(pcm) / 32000
+    latencies.sort()
+    return {
+        'workers': workers,
+        'sessions': sessions,
+        'wall_seconds': round(elapsed, 3),
+        'audio_seconds': audio_seconds,
+        'realtime_factor': round(audio_seconds / elapsed, 2),
+        'chunk_latency_ms_p50': round(statistics.median(latencies) * 1000, 2),
+        'chunk_latency_ms_p95': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vosk 多进程解码扩展性基准')
+    parser.add_argument('--wav', help='16kHz 单声道 16 位 WAV 文件')
+    parser.add_argument('--seconds', type=float, default=20.0, help='合成音频时长')
+    parser.add_argument('--sessions', type=int, default=16, help='并发会话数')
+    parser.add_argument('--chunk-ms', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='*', help='要测试的解码进程数，默认 1,2,4...核数')
+    parser.add_argument('--port', type=int, default=5101)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or [n for n in (1, 2, 4, 8, 16, 32) if n <= cores]
+    pcm = load_pcm16(args.wav, args.seconds)
+    results = [bench_workers(n, args.port, pcm, args.sessions, args.chunk_ms) for n in worker_counts]
+    print(json.dumps({'cpu_count': cores, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -55,20 +55,41 @@ const GlobalLayout: React.FC<{
 		checkEnglishAnalysisStatus();
 	}, []);
 
-	// 检查Vosk服务状态
-	const checkVoskStatus = async () => {
+	// 查询服务就绪状态：/readyz 返回 503 表示仍在加载（启动中），无法连接表示未运行
+	const checkReadiness = async (port: number): Promise<'stopped' | 'starting' | 'running' | 'error'> => {
 		try {
-			const response = await fetch('http://localhost:5001/health');
+			const response = await fetch(`http://localhost:${port}/readyz`);
 			if (response.ok) {
-				setVoskStatus('running');
-			} else {
-				setVoskStatus('stopped');
+				return 'running';
 			}
+			return response.status === 503 ? 'starting' : 'error';
 		} catch {
-			setVoskStatus('stopped');
+			return 'stopped';
 		}
 	};
 
+	// 启动后每秒轮询一次，直到就绪、失败或超时（进程刚启动尚未监听端口时仍视为启动中）
+	const waitUntilReady = async (check: (starting: boolean) => Promise<string>, timeoutMs = 120000) => {
+		const deadline = Date.now() + timeoutMs;
+		while (Date.now() < deadline) {
+			const status = await check(true);
+			if (status === 'running' || status === 'error') {
+				return;
+			}
+			await new Promise((resolve) => setTimeout(resolve, 1000));
+		}
+	};
+
+	// 检查Vosk服务状态
+	const checkVoskStatus = async (starting = false) => {
+		let status = await checkReadiness(5001);
+		if (starting && status === 'stopped') {
+			status = 'starting';
+		}
+		setVoskStatus(status);
+		return status;
+	};
+
 	// 启动Vosk服务
 	const startVoskService = async () => {
 		setVoskStatus('starting');
@@ -80,10 +101,8 @@ const GlobalLayout: React.FC<{
 			if (data.success) {
 				setVoskProcess(data.processId?.toString() || 'unknown');
 				message.success('Vosk服务启动成功');
-				// 等待服务启动后检查状态
-				setTimeout(() => {
-					checkVoskStatus();
-				}, 3000);
+				// 服务立即监听端口、在后台加载，轮询就绪检查直到加载完成
+				waitUntilReady(checkVoskStatus);
 			} else {
 				setVoskStatus('error');
 				message.error('启动Vosk服务失败: ' + (data.error || data.details || '未知错误'));
@@ -118,17 +137,13 @@ const GlobalLayout: React.FC<{
 	};
 
 	// 检查English Analysis服务状态
-	const checkEnglishAnalysisStatus = async () => {
-		try {
-			const response = await fetch('http://localhost:5002/health');
-			if (response.ok) {
-				setEnglishAnalysisStatus('running');
-			} else {
-				setEnglishAnalysisStatus('stopped');
-			}
-		} catch {
-			setEnglishAnalysisStatus('stopped');
+	const checkEnglishAnalysisStatus = async (starting = false) => {
+		let status = await checkReadiness(5002);
+		if (starting && status === 'stopped') {
+			status = 'starting';
 		}
+		setEnglishAnalysisStatus(status);
+		return status;
 	};
 
 	// 启动English Analysis服务
@@ -142,10 +157,8 @@ const GlobalLayout: React.FC<{
 			if (data.success) {
 				setEnglishAnalysisProcess(data.processId?.toString() || 'unknown');
 				message.success('English Analysis服务启动成功');
-				// 等待服务启动后检查状态
-				setTimeout(() => {
-					checkEnglishAnalysisStatus();
-				}, 3000);
+				// 服务立即监听端口、在后台加载，轮询就绪检查直到加载完成
+				waitUntilReady(checkEnglishAnalysisStatus);
 			} else {
 				setEnglishAnalysisStatus('error');
 				message.error('启动English Analysis服务失败: ' + (data.error || data.details || '未知错误'));
@@ -9,29 +9,142 @@ and returns a structured JSON response based on a comprehensive IELTS evaluation
 import os
 import json
 import time
-from functools import wraps
+import asyncio
+import logging
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from google import genai
-from google.genai import types
 from dotenv import load_dotenv
 
+from analysis_backends import RecordingClient, offline_client
+from analysis_batch import BatchRequestError, items_from_json, items_from_zip, run_batch
+from analysis_cache import AnalysisCache, cache_key, prompt_version
+from analysis_jobs import AnalysisJobQueue, QueueFull
+from analysis_prompt_cache import PromptCache
+from analysis_ratelimit import RateLimiter, backoff_delay, estimate_tokens, is_transient_error
+from analysis_segments import aggregation_input, merge_segment_findings, split_segments
+from analysis_sentences import assign_findings, findings_by_key, merge_findings, sentence_keys, split_sentences
+from analysis_stream import SectionStream, format_sse
+from analysis_text_stats import text_statistics
+from service_metrics import MetricsRegistry, configure_logging, log_event, render_prometheus, summarize
+from service_startup import StartupTracker
+
 # --- Initial Setup ---
 load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# --- Observability ---
+logger = configure_logging('english_analysis_service')
+metrics = MetricsRegistry('analysis_')
+metrics.counter('requests_total', 'Analysis requests by endpoint and status code')
+metrics.counter('gemini_errors_total', 'Failed Gemini calls by error kind')
+metrics.counter('gemini_retries_total', 'Gemini calls retried after a transient failure')
+metrics.counter('gemini_throttled_seconds_total', 'Seconds Gemini calls waited for the request/token budget')
+metrics.counter('gemini_tokens_total', 'Gemini token usage by kind (prompt, output, cached, total)')
+metrics.histogram('gemini_seconds', 'Gemini generate_content latency')
+metrics.histogram('gemini_request_tokens', 'Tokens per Gemini call by kind (prompt, cached, output)',
+                  buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000))
+metrics.counter('prompt_cache_events_total', 'Cached system prompt lifecycle (created, reused, refreshed, failed)')
+metrics.histogram('text_stats_seconds', 'Local transcript statistics pass')
+metrics.histogram('gemini_first_section_seconds', 'Time from a streamed Gemini request to its first complete section')
+metrics.counter('cache_requests_total', 'Analysis cache lookups by result (memory, disk, miss, refresh)')
+metrics.counter('sentence_index_total', 'Sentence-level findings lookups by result (hit, miss)')
+metrics.counter('analysis_mode_total', 'Gemini analyses by mode (full, incremental, segmented)')
+metrics.counter('jobs_total', 'Analysis job submissions by outcome (queued, cached, rejected, unavailable)')
+
+# --- Startup ---
+# The google.genai SDK takes a noticeable share of cold start to import, so the server
+# binds first and init_gemini() imports it and builds the client on a background thread.
+startup = StartupTracker('english_analysis_service')
+genai = None
+types = None
+client = None
+
 # --- Configure Gemini API (new SDK) ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 if not GEMINI_API_KEY:
     print("Error: GEMINI_API_KEY or GOOGLE_API_KEY not found. Please check your .env file.")
-    client = None
-else:
-    client = genai.Client(api_key=GEMINI_API_KEY)
 
 # --- Constants ---
 GEMINI_MODEL = 'gemini-2.5-flash-lite'  # Using the specified model
+# Alternative API endpoint (e.g. a local mock backend for benchmarks)
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', '')
+
+# --- Analysis backend ---
+# 'gemini' calls the API; 'record' also saves every response under ANALYSIS_BACKEND_DIR. 'replay' serves
+# saved responses (unknown requests get synthetic ones) and 'synthetic' generates schema-valid responses;
+# both run offline, delayed by ANALYSIS_BACKEND_LATENCY and failing at ANALYSIS_BACKEND_ERRORS rates.
+ANALYSIS_BACKEND = os.getenv('ANALYSIS_BACKEND', 'gemini')
+ANALYSIS_BACKEND_DIR = os.getenv('ANALYSIS_BACKEND_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                      '.analysis_recordings'))
+# e.g. 'fixed:1.5', 'uniform:0.5:3', 'lognormal:1.5:0.4', 'recorded:0.5'; empty = the backend's default
+ANALYSIS_BACKEND_LATENCY = os.getenv('ANALYSIS_BACKEND_LATENCY', '')
+# e.g. '503:0.02,429:0.01' (HTTP status:rate)
+ANALYSIS_BACKEND_ERRORS = os.getenv('ANALYSIS_BACKEND_ERRORS', '')
+
+# --- Gemini budgets and retries ---
+# Every Gemini call reserves one request and an estimated token count against these per-minute
+# budgets (0 = unlimited) and waits when they are spent, instead of running into 429s.
+GEMINI_RPM = int(os.getenv('ANALYSIS_GEMINI_RPM', '60'))
+GEMINI_TPM = int(os.getenv('ANALYSIS_GEMINI_TPM', '1000000'))
+# Attempts per call, including the first; transient errors back off exponentially with jitter
+GEMINI_MAX_ATTEMPTS = int(os.getenv('ANALYSIS_GEMINI_MAX_ATTEMPTS', '4'))
+GEMINI_BACKOFF_BASE = float(os.getenv('ANALYSIS_GEMINI_BACKOFF_BASE', '1.0'))
+GEMINI_BACKOFF_MAX = float(os.getenv('ANALYSIS_GEMINI_BACKOFF_MAX', '30'))
+
+# --- Prompt caching ---
+# System prompts are registered once as Gemini cached content, named after the prompt version so all
+# processes share it, instead of being resent with every call; the TTL is extended before it runs out.
+ANALYSIS_PROMPT_CACHE = os.getenv('ANALYSIS_PROMPT_CACHE', '1').lower() in ('1', 'true', 'yes')
+ANALYSIS_PROMPT_CACHE_TTL_MINUTES = float(os.getenv('ANALYSIS_PROMPT_CACHE_TTL_MINUTES', '60'))
+
+# --- Result cache ---
+# Identical transcripts (re-submissions, history re-analysis, grader sample runs) are served
+# from a memory LRU backed by SQLite. ANALYSIS_CACHE_PATH='' keeps the cache in memory only.
+ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE', '1').lower() in ('1', 'true', 'yes')
+ANALYSIS_CACHE_PATH = os.getenv('ANALYSIS_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    '.analysis_cache.sqlite3'))
+ANALYSIS_CACHE_MEMORY_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MEMORY_ENTRIES', '256'))
+ANALYSIS_CACHE_MAX_MB = float(os.getenv('ANALYSIS_CACHE_MAX_MB', '64'))
+ANALYSIS_CACHE_TTL_HOURS = float(os.getenv('ANALYSIS_CACHE_TTL_HOURS', '168'))
+
+# --- Incremental re-analysis ---
+# Sentence-level findings (grammar, word choice, vocabulary suggestions) are also indexed by sentence.
+# When at least ANALYSIS_INCREMENTAL_MIN_REUSE of a transcript's sentences are already indexed, only
+# the others go to Gemini for those sections, next to a smaller call for the holistic sections.
+ANALYSIS_INCREMENTAL = os.getenv('ANALYSIS_INCREMENTAL', '1').lower() in ('1', 'true', 'yes')
+ANALYSIS_INCREMENTAL_MIN_REUSE = float(os.getenv('ANALYSIS_INCREMENTAL_MIN_REUSE', '0.5'))
+
+# --- Long transcripts ---
+# Transcripts longer than ANALYSIS_LONG_TEXT_CHARS (0 = never) are split at topic and turn boundaries
+# into segments of about ANALYSIS_SEGMENT_CHARS, analyzed ANALYSIS_SEGMENT_CONCURRENCY at a time,
+# and graded as a whole by a compact aggregation call over the segment results.
+ANALYSIS_LONG_TEXT_CHARS = int(os.getenv('ANALYSIS_LONG_TEXT_CHARS', '12000'))
+ANALYSIS_SEGMENT_CHARS = int(os.getenv('ANALYSIS_SEGMENT_CHARS', '6000'))
+ANALYSIS_SEGMENT_CONCURRENCY = int(os.getenv('ANALYSIS_SEGMENT_CONCURRENCY', '4'))
+
+# --- Analysis jobs ---
+# POST /ielts-speaking-gemini/jobs returns a job id at once; ANALYSIS_JOB_WORKERS threads make
+# the Gemini calls and at most ANALYSIS_JOB_QUEUE jobs wait, beyond which submissions get 429.
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', '4'))
+ANALYSIS_JOB_QUEUE = int(os.getenv('ANALYSIS_JOB_QUEUE', '64'))
+ANALYSIS_JOB_TTL_SECONDS = float(os.getenv('ANALYSIS_JOB_TTL_SECONDS', '600'))
+# Upper bound for the ?wait= long poll on a job
+ANALYSIS_JOB_MAX_WAIT = 60.0
+# Comment line sent on an idle job event stream so proxies keep the connection open
+ANALYSIS_EVENTS_KEEPALIVE = 15.0
+
+# --- Batch analysis ---
+ANALYSIS_BATCH_CONCURRENCY = int(os.getenv('ANALYSIS_BATCH_CONCURRENCY', '8'))
+ANALYSIS_BATCH_MAX_ITEMS = int(os.getenv('ANALYSIS_BATCH_MAX_ITEMS', '200'))
+# Limit on the extracted size of an uploaded zip of transcripts
+ANALYSIS_BATCH_MAX_MB = float(os.getenv('ANALYSIS_BATCH_MAX_MB', '20'))
 
 # --- System Prompt for Gemini ---
 # This is the core instruction that tells Gemini how to behave and what to output.
@@ -42,7 +155,7 @@ SYSTEM_PROMPT = """
 严格遵守下面提供的JSON结构，不要输出JSON对象之外的任何内容。
 
 在分析时，请注意文本由语音转录而来，可能包含STT（语音转文字）的错误（例如，拼写错误、不合逻辑的短语）。你的分析需要考虑到这些潜在问题：
-- **停顿/重复**: 像 'um', 'uh' 或重复的单词应被视为流利度问题，并记录在'fluency_markers'中，而不是词汇错误。
+- **停顿/重复**: 像 'um', 'uh' 或重复的单词应被视为流利度问题，并在'fluency_markers'中评价，而不是词汇错误。
 - **发音推断**: 如果转录的某个词看起来像是另一个词的可能发音错误（例如，文本中是'ship'，但语境暗示应该是'sheep'），这应作为'pronunciation_analysis'中推断潜在发音模式的依据。
 
 你的分析必须覆盖以下雅思标准：
@@ -55,9 +168,8 @@ SYSTEM_PROMPT = """
     - 列出任何正确使用的高级或习语词汇。
     - 识别过度使用的基础词汇，并**提供使用高级词汇对原句进行改写的建议**。
 6.  **流利度标记 (Fluency Markers)**:
-    - 识别并统计犹豫标记（如 'um', 'uh', 'like'）。
-    - 列出使用的连接词。
-    - **对语速、节奏和自我修正等进行综合分析**。
+    - **对犹豫、语速、节奏、连接词的运用和自我修正等进行综合分析**。
+    - 犹豫标记的统计和连接词列表由系统另行计算，不要输出。
 7.  **发音分析 (Pronunciation Analysis)**:
     - 基于文本提供一个总体评价，并承认其局限性。
     - **根据STT的可能错误，推断潜在的发音模式问题**（例如，混淆了哪些音）。
@@ -111,14 +223,7 @@ SYSTEM_PROMPT = """
     ]
   },
   "fluency_markers": {
-    "analysis": "string (in Chinese, commenting on rhythm, pace, self-correction)",
-    "hesitation_markers": [
-      {
-        "marker": "string",
-        "count": "integer"
-      }
-    ],
-    "connectors_used": ["string"]
+    "analysis": "string (in Chinese, commenting on rhythm, pace, self-correction)"
   },
   "pronunciation_analysis": {
     "analysis": "string (in Chinese, overall assessment based on text)",
@@ -133,8 +238,19 @@ SYSTEM_PROMPT = """
 """
 
 # Structured output schema for the new SDK (simplified but aligned with the required JSON)
+# Fields computed locally (analysis_text_stats) are left out so Gemini does not spend output tokens on them.
 IELTS_ANALYSIS_SCHEMA = {
     "type": "OBJECT",
+    # Generation order: the short band scores come first so streamed analyses show them early
+    "propertyOrdering": [
+        "ielts_band_score",
+        "overall_feedback",
+        "fluency_markers",
+        "vocabulary_assessment",
+        "grammar_errors",
+        "word_choice_issues",
+        "pronunciation_analysis",
+    ],
     "properties": {
         "overall_feedback": {
             "type": "OBJECT",
@@ -238,21 +354,11 @@ IELTS_ANALYSIS_SCHEMA = {
                 },
             },
         },
+        # hesitation_markers and connectors_used are computed locally (analysis_text_stats)
         "fluency_markers": {
             "type": "OBJECT",
             "properties": {
                 "analysis": {"type": "STRING"},
-                "hesitation_markers": {
-                    "type": "ARRAY",
-                    "items": {
-                        "type": "OBJECT",
-                        "properties": {
-                            "marker": {"type": "STRING"},
-                            "count": {"type": "INTEGER"},
-                        },
-                    },
-                },
-                "connectors_used": {"type": "ARRAY", "items": {"type": "STRING"}},
             },
         },
         "pronunciation_analysis": {
@@ -274,6 +380,103 @@ IELTS_ANALYSIS_SCHEMA = {
     },
 }
 
+# --- Incremental re-analysis prompts ---
+# Both calls keep the full system prompt, so scoring criteria and language rules stay identical to a full
+# analysis; the appended instruction and a narrower schema restrict what Gemini generates.
+HOLISTIC_PROMPT = SYSTEM_PROMPT + """
+本次请求只需要整体评估：ielts_band_score、overall_feedback、fluency_markers、pronunciation_analysis，以及 vocabulary_assessment 中的 advanced_words_found。
+逐句的 grammar_errors、word_choice_issues 和 vocabulary_suggestions 已单独分析，不要输出。
+"""
+
+SENTENCE_PROMPT = SYSTEM_PROMPT + """
+本次请求只做逐句分析：只针对"待分析句子"中列出的句子，输出 grammar_errors、word_choice_issues，以及 vocabulary_assessment 中的 vocabulary_suggestions。
+完整转写仅用于理解上下文，不要报告未列出句子中的问题；没有问题时返回空数组。每条结果的 original_sentence 必须逐字引用所列的句子。
+"""
+
+# User content of a sentence-level call
+SENTENCE_REQUEST = """完整转写（仅作上下文）：
+{text}
+
+待分析句子：
+{sentences}
+"""
+
+
+def schema_subset(names, **overrides):
+    """A response schema with only the given top-level sections of IELTS_ANALYSIS_SCHEMA (in its order)."""
+    names = [name for name in IELTS_ANALYSIS_SCHEMA['propertyOrdering'] if name in names]
+    return {
+        "type": "OBJECT",
+        "propertyOrdering": names,
+        "properties": {name: overrides.get(name, IELTS_ANALYSIS_SCHEMA['properties'][name]) for name in names},
+    }
+
+
+_VOCABULARY = IELTS_ANALYSIS_SCHEMA['properties']['vocabulary_assessment']['properties']
+HOLISTIC_SCHEMA = schema_subset(
+    ('ielts_band_score', 'overall_feedback', 'fluency_markers', 'vocabulary_assessment', 'pronunciation_analysis'),
+    vocabulary_assessment={"type": "OBJECT",
+                           "properties": {"advanced_words_found": _VOCABULARY['advanced_words_found']}},
+)
+SENTENCE_SCHEMA = schema_subset(
+    ('grammar_errors', 'word_choice_issues', 'vocabulary_assessment'),
+    vocabulary_assessment={"type": "OBJECT",
+                           "properties": {"vocabulary_suggestions": _VOCABULARY['vocabulary_suggestions']}},
+)
+
+# --- Aggregation of segment analyses (long transcripts) ---
+# Input is the per-segment scores and feedback, not the transcript, so this prompt stays short.
+AGGREGATE_PROMPT = """
+你是专业的雅思口语考官。一段较长的英语口语转写被分成若干片段分别评估，输入的JSON给出了每个片段的分数与理由、综合反馈、流利度和发音评价（chars 为片段长度），以及全文的统计数据（text_statistics）。
+请据此对整段口语给出一个综合评估：
+1. ielts_band_score：流利度与连贯性、词汇资源、语法范围与准确性、发音四个维度的分数（0-9），参考各片段分数并按片段长度加权，同时考虑全文的整体表现；总分为四项平均后按雅思规则取到最近的0.5分。每个分数都要有中文理由。
+2. overall_feedback：合并各片段的优势、待改进领域和关键建议，去掉重复内容，保留最有代表性的要点，每个要点保留片段中引用的英文例子。
+3. fluency_markers.analysis 与 pronunciation_analysis.analysis：对全文的总体评价。
+所有分析和理由使用中文，引用的英文原文保持英文。只输出JSON对象。
+"""
+
+AGGREGATE_SCHEMA = schema_subset(
+    ('ielts_band_score', 'overall_feedback', 'fluency_markers', 'pronunciation_analysis'),
+    pronunciation_analysis={"type": "OBJECT", "properties": {"analysis": {"type": "STRING"}}},
+)
+
+# Narrower calls next to the full analysis: name -> (system prompt, response schema)
+ANALYSIS_VARIANTS = {
+    'holistic': (HOLISTIC_PROMPT, HOLISTIC_SCHEMA),
+    'sentences': (SENTENCE_PROMPT, SENTENCE_SCHEMA),
+    'aggregate': (AGGREGATE_PROMPT, AGGREGATE_SCHEMA),
+}
+
+# Sections of a full result in delivery order: the local statistics, then Gemini's sections
+RESULT_SECTIONS = ['text_statistics', *IELTS_ANALYSIS_SCHEMA['propertyOrdering']]
+
+
+class UploadError(Exception):
+    """Invalid markdown upload, carrying the HTTP status to return."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def check_markdown_filename(filename):
+    """Validate the uploaded file name, raising UploadError if it is missing or not .md."""
+    if filename == '':
+        raise UploadError('No file selected for uploading', 400)
+    if not filename.lower().endswith('.md'):
+        raise UploadError('Invalid file type. Please upload a .md file', 415)
+
+
+def decode_markdown(content_bytes):
+    """Decode uploaded markdown as plain text (the raw markdown is sent to the model)."""
+    try:
+        text = content_bytes.decode('utf-8')
+    except Exception as e:
+        raise UploadError(f'Failed to read or parse file: {str(e)}', 500)
+    if not text.strip():
+        raise UploadError('Markdown file is empty or contains no text', 400)
+    return text
+
 
 def require_markdown_file(f):
     """Decorator to validate that a markdown file is uploaded."""
@@ -282,20 +485,16 @@ def require_markdown_file(f):
         if 'file' not in request.files:
             return jsonify({'error': 'No file part in the request'}), 400
         file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected for uploading'}), 400
-        if not file.filename.lower().endswith('.md'):
-            return jsonify({'error': 'Invalid file type. Please upload a .md file'}), 415
-
         try:
-            # Read markdown content as plain text (send raw markdown to the model)
-            content_bytes = file.read()
-            text = content_bytes.decode('utf-8')
-            if not text.strip():
-                return jsonify({'error': 'Markdown file is empty or contains no text'}), 400
-            return f(text, *args, **kwargs)
-        except Exception as e:
-            return jsonify({'error': f'Failed to read or parse file: {str(e)}'}), 500
+            check_markdown_filename(file.filename)
+            try:
+                content_bytes = file.read()
+            except Exception as e:
+                raise UploadError(f'Failed to read or parse file: {str(e)}', 500)
+            text = decode_markdown(content_bytes)
+        except UploadError as e:
+            return jsonify({'error': str(e)}), e.status
+        return f(text, *args, **kwargs)
 
     return decorated_function
 
@@ -303,70 +502,805 @@ def require_markdown_file(f):
 class GeminiIELTSAnalyzer:
     """Analyzer that uses the Gemini API for IELTS speaking evaluation (new SDK)."""
 
-    def __init__(self, client: genai.Client, model_name: str, system_prompt: str):
+    def __init__(self, client: 'genai.Client', model_name: str, system_prompt: str, variants=None,
+                 prompt_cache_keys=None):
         self.client = client
         self.model_name = model_name
-        # Configure generation to produce JSON according to schema
-        self.generation_config = types.GenerateContentConfig(
-            system_instruction=[system_prompt],
-            response_mime_type="application/json",
-            response_schema=IELTS_ANALYSIS_SCHEMA,
-        )
-
-    def analyze_speaking_text(self, text: str):
+        # (system prompt, schema) by variant: None is the full analysis, the others are narrower
+        # pairs, e.g. for incremental re-analysis
+        self.variants = {None: (system_prompt, IELTS_ANALYSIS_SCHEMA), **(variants or {})}
+        # Provider-side cached system prompts by variant, keyed by prompt version
+        self.prompt_caches = {}
+        if prompt_cache_keys:
+            self.prompt_caches = {
+                variant: PromptCache(client, model_name, prompt, prompt_cache_keys[variant],
+                                     ttl_seconds=ANALYSIS_PROMPT_CACHE_TTL_MINUTES * 60, on_event=prompt_cache_event)
+                for variant, (prompt, _) in self.variants.items()
+            }
+        self._configs = {}
+
+    def _generation_config(self, variant=None):
+        """Config to produce JSON according to the variant's schema, built once per (variant, cached prompt).
+
+        Names the cached system prompt when there is one, otherwise sends the prompt inline.
+        """
+        prompt_cache = self.prompt_caches.get(variant)
+        cached_content = prompt_cache.name() if prompt_cache is not None else None
+        config = self._configs.get((variant, cached_content))
+        if config is None:
+            system_prompt, schema = self.variants[variant]
+            prompt = {'cached_content': cached_content} if cached_content else {'system_instruction': [system_prompt]}
+            config = self._configs[(variant, cached_content)] = types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=schema,
+                **prompt,
+            )
+        return config
+
+    def prepare_prompt_caches(self):
+        """Create (or adopt) the cached system prompts ahead of the first requests."""
+        for prompt_cache in self.prompt_caches.values():
+            prompt_cache.name()
+
+    def _prompt_cache_rejected(self, variant, config, error):
+        """Whether a call failed because its cached prompt was rejected (e.g. deleted); the prompt then goes inline."""
+        prompt_cache = self.prompt_caches.get(variant)
+        if prompt_cache is None or not getattr(config, 'cached_content', None):
+            return False
+        if getattr(error, 'code', None) not in (400, 403, 404):
+            return False
+        prompt_cache.invalidate(error)
+        return True
+
+    def analyze_speaking_text(self, text: str, variant=None):
         """
         Sends the user's text to Gemini and gets a structured analysis.
 
         Args:
             text: The spoken text from the user.
+            variant: Name of a prompt/schema variant; None for the full analysis.
 
         Returns:
             A dictionary with the structured analysis or an error dictionary.
         """
-        if not GEMINI_API_KEY or not self.client:
+        if not self.client:
             return {'error': 'Gemini API key is not configured on the server.'}
 
-        print(f"Sending request to Gemini for analysis...")
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=text,
-                config=self.generation_config,
-            )
+        log_event(logger, logging.INFO, 'gemini_request', model=self.model_name, chars=len(text),
+                  variant=variant or 'full')
+        start = time.perf_counter()
+        estimate = estimate_tokens(text, GEMINI_TOKEN_OVERHEAD)
+        for attempt in itertools.count():
+            config = self._generation_config(variant)
+            self._throttle(estimate)
+            try:
+                response = self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=text,
+                    config=config,
+                )
+                break
+            except Exception as e:
+                if self._prompt_cache_rejected(variant, config, e):
+                    continue
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    return self._call_failed(e, start)
+                time.sleep(delay)
+        return self._call_succeeded(response, start, estimate=estimate)
+
+    async def analyze_speaking_text_async(self, text: str):
+        """Async variant of analyze_speaking_text, awaiting the SDK's native async client."""
+        if not self.client:
+            return {'error': 'Gemini API key is not configured on the server.'}
 
-            # Prefer parsed structured output when schema is provided
-            if hasattr(response, 'parsed') and response.parsed is not None:
-                print("Received structured (parsed) response from Gemini.")
-                return response.parsed
+        log_event(logger, logging.INFO, 'gemini_request', model=self.model_name, chars=len(text), mode='async')
+        start = time.perf_counter()
+        estimate = estimate_tokens(text, GEMINI_TOKEN_OVERHEAD)
+        for attempt in itertools.count():
+            # Creating or refreshing the cached prompt is a blocking API call
+            config = await asyncio.to_thread(self._generation_config)
+            wait = gemini_budget.reserve(estimate)
+            if wait:
+                metrics.inc('gemini_throttled_seconds_total', wait)
+                await asyncio.sleep(wait)
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=text,
+                    config=config,
+                )
+                break
+            except Exception as e:
+                if self._prompt_cache_rejected(None, config, e):
+                    continue
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    return self._call_failed(e, start)
+                await asyncio.sleep(delay)
+        return self._call_succeeded(response, start, estimate=estimate)
 
-            # Fallback to parsing text as JSON
-            response_text = response.text
-            print("Received response from Gemini (text). Parsing JSON...")
-            result_json = json.loads(response_text)
-            return result_json
+    def stream_speaking_text(self, text: str, on_section, variant=None):
+        """
+        Streaming variant of analyze_speaking_text.
+
+        Calls on_section(name, value) for each top-level section of the schema as soon
+        as Gemini has finished generating it, then returns the full analysis (or an
+        error dictionary) like analyze_speaking_text. A failed stream is only retried
+        while no section has been delivered yet.
+        """
+        if not self.client:
+            return {'error': 'Gemini API key is not configured on the server.'}
 
+        log_event(logger, logging.INFO, 'gemini_request', model=self.model_name, chars=len(text), mode='stream',
+                  variant=variant or 'full')
+        start = time.perf_counter()
+        estimate = estimate_tokens(text, GEMINI_TOKEN_OVERHEAD)
+        for attempt in itertools.count():
+            config = self._generation_config(variant)
+            self._throttle(estimate)
+            sections = SectionStream()
+            chunk = None
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=text,
+                    config=config,
+                ):
+                    for name, value in sections.feed(chunk.text or ''):
+                        if len(sections.names) == 1:
+                            metrics.observe('gemini_first_section_seconds', time.perf_counter() - start)
+                            log_event(logger, logging.INFO, 'gemini_first_section', section=name,
+                                      elapsed=round(time.perf_counter() - start, 3))
+                        on_section(name, value)
+                break
+            except Exception as e:
+                if not sections.names and self._prompt_cache_rejected(variant, config, e):
+                    continue
+                delay = None if sections.names else self._retry_delay(e, attempt)
+                if delay is None:
+                    return self._call_failed(e, start)
+                time.sleep(delay)
+        # The last chunk carries the usage metadata for the whole call
+        return self._call_succeeded(chunk, start, parse=sections.finish, estimate=estimate)
+
+    @staticmethod
+    def _throttle(estimate):
+        """Block until the shared request/token budget allows another call."""
+        wait = gemini_budget.reserve(estimate)
+        if wait:
+            metrics.inc('gemini_throttled_seconds_total', wait)
+            log_event(logger, logging.DEBUG, 'gemini_throttled', wait=round(wait, 3))
+            time.sleep(wait)
+
+    @staticmethod
+    def _retry_delay(error, attempt):
+        """Backoff before retrying a failed call, or None when it is not transient or attempts are used up."""
+        if attempt + 1 >= GEMINI_MAX_ATTEMPTS or not is_transient_error(error):
+            return None
+        delay = backoff_delay(attempt, GEMINI_BACKOFF_BASE, GEMINI_BACKOFF_MAX)
+        metrics.inc('gemini_retries_total', kind=type(error).__name__)
+        log_event(logger, logging.WARNING, 'gemini_retry', attempt=attempt + 1, delay=round(delay, 2),
+                  error=str(error))
+        return delay
+
+    def _call_succeeded(self, response, start, parse=None, estimate=None):
+        """Record latency and token usage, then parse the response (or the streamed text, via parse).
+
+        The call's token counts are attached to the analysis as 'usage'.
+        """
+        elapsed = time.perf_counter() - start
+        metrics.observe('gemini_seconds', elapsed, outcome='ok')
+        usage = getattr(response, 'usage_metadata', None)
+        tokens = {}
+        if usage is not None:
+            for kind, field in (('prompt', 'prompt_token_count'), ('output', 'candidates_token_count'),
+                                ('cached', 'cached_content_token_count'), ('total', 'total_token_count')):
+                count = getattr(usage, field, None) or 0
+                tokens[f'{kind}_tokens'] = count
+                if count:
+                    metrics.inc('gemini_tokens_total', count, kind=kind)
+                if kind != 'total':
+                    metrics.observe('gemini_request_tokens', count, kind=kind)
+            if estimate is not None:
+                gemini_budget.settle(estimate, getattr(usage, 'total_token_count', None))
+        log_event(logger, logging.INFO, 'gemini_response', elapsed=round(elapsed, 3), **tokens)
+        try:
+            result = parse() if parse else self._parse_response(response)
         except Exception as e:
-            print(f"An error occurred while calling the Gemini API: {e}")
+            metrics.inc('gemini_errors_total', kind='parse')
+            log_event(logger, logging.ERROR, 'gemini_parse_failed', error=str(e))
             return {'error': f'Failed to get a valid analysis from Gemini API. Details: {str(e)}'}
+        if isinstance(result, dict) and tokens:
+            result['usage'] = dict(tokens, calls=1)
+        return result
+
+    @staticmethod
+    def _call_failed(error, start):
+        metrics.observe('gemini_seconds', time.perf_counter() - start, outcome='error')
+        metrics.inc('gemini_errors_total', kind=type(error).__name__)
+        log_event(logger, logging.ERROR, 'gemini_error', error=str(error))
+        return {'error': f'Failed to get a valid analysis from Gemini API. Details: {str(error)}'}
+
+    @staticmethod
+    def _parse_response(response):
+        # Prefer parsed structured output when schema is provided
+        if hasattr(response, 'parsed') and response.parsed is not None:
+            log_event(logger, logging.DEBUG, 'gemini_parsed', source='structured')
+            return response.parsed
+
+        # Fallback to parsing text as JSON
+        response_text = response.text
+        log_event(logger, logging.DEBUG, 'gemini_parsed', source='text')
+        return json.loads(response_text)
+
+
+def prompt_cache_event(event, **fields):
+    """Metrics and logs for the cached system prompts (PromptCache on_event)."""
+    metrics.inc('prompt_cache_events_total', event=event)
+    level = logging.WARNING if event in ('failed', 'refresh_failed') else logging.INFO
+    log_event(logger, level, f'prompt_cache_{event}', **fields)
+
+
+def add_usage(result, *others):
+    """Sum the token usage of the other calls behind a composite analysis into result['usage']."""
+    usage = dict(result.get('usage') or {})
+    for other in others:
+        for name, count in (other.get('usage') or {}).items():
+            usage[name] = usage.get(name, 0) + count
+    if usage:
+        result['usage'] = usage
+    return result
 
 
 # --- Global Analyzer Instance ---
-if client:
-    gemini_analyzer = GeminiIELTSAnalyzer(client, GEMINI_MODEL, SYSTEM_PROMPT)
+gemini_analyzer = None
+
+# Budget estimate per call on top of the transcript: the system prompt (mostly Chinese, about
+# two characters per token) plus a typical structured answer; settled against real usage.
+GEMINI_TOKEN_OVERHEAD = len(SYSTEM_PROMPT) // 2 + 3000
+gemini_budget = RateLimiter(rpm=GEMINI_RPM, tpm=GEMINI_TPM)
+
+# Bumps automatically whenever the prompt or the response schema changes
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, IELTS_ANALYSIS_SCHEMA)
+# Cached system prompts are named after the version of their prompt, so a changed prompt gets a new cache
+PROMPT_CACHE_KEYS = {None: PROMPT_VERSION,
+                     **{name: prompt_version(*variant) for name, variant in ANALYSIS_VARIANTS.items()}}
+# Indexed sentence findings come from full and sentence-level calls, so both shape them
+SENTENCE_VERSION = prompt_version(SYSTEM_PROMPT, IELTS_ANALYSIS_SCHEMA, SENTENCE_PROMPT, SENTENCE_SCHEMA,
+                                  SENTENCE_REQUEST)
+
+if ANALYSIS_CACHE_ENABLED:
+    analysis_cache = AnalysisCache(
+        ANALYSIS_CACHE_PATH or None,
+        memory_entries=ANALYSIS_CACHE_MEMORY_ENTRIES,
+        max_bytes=int(ANALYSIS_CACHE_MAX_MB * 1024 * 1024),
+        ttl_seconds=ANALYSIS_CACHE_TTL_HOURS * 3600,
+    )
+else:
+    analysis_cache = None
+
+if ANALYSIS_CACHE_ENABLED and ANALYSIS_INCREMENTAL:
+    # Same file as the result cache; a transcript has many sentences, so the memory tier holds more entries
+    sentence_index = AnalysisCache(
+        ANALYSIS_CACHE_PATH or None,
+        memory_entries=ANALYSIS_CACHE_MEMORY_ENTRIES * 20,
+        max_bytes=int(ANALYSIS_CACHE_MAX_MB * 1024 * 1024),
+        ttl_seconds=ANALYSIS_CACHE_TTL_HOURS * 3600,
+        table='sentence_findings',
+    )
 else:
-    gemini_analyzer = None
+    sentence_index = None
+
+# Gemini calls made alongside a request's main call (the sentence-level half of an incremental analysis)
+gemini_side_calls = ThreadPoolExecutor(max_workers=ANALYSIS_JOB_WORKERS + ANALYSIS_BATCH_CONCURRENCY,
+                                       thread_name_prefix='gemini-side')
+
+
+def lookup_analysis(text, refresh=False):
+    """Return (key, cached result or None, cache info) for a transcript."""
+    key = cache_key(text, GEMINI_MODEL, PROMPT_VERSION)
+    if analysis_cache is None:
+        return key, None, None
+    if refresh:
+        metrics.inc('cache_requests_total', result='refresh')
+        return key, None, {'hit': False, 'key': key}
+    cached = analysis_cache.get(key)
+    if cached is None:
+        metrics.inc('cache_requests_total', result='miss')
+        return key, None, {'hit': False, 'key': key}
+    result, info = cached
+    metrics.inc('cache_requests_total', result=info['tier'])
+    log_event(logger, logging.INFO, 'analysis_cache_hit', key=key[:12], tier=info['tier'])
+    return key, result, dict(info, hit=True, key=key)
+
+
+def store_analysis(key, result):
+    """Cache a successful analysis (before timing metadata is attached)."""
+    if analysis_cache is not None and 'error' not in result:
+        analysis_cache.put(key, result, GEMINI_MODEL)
+
+
+def wants_refresh(args, headers):
+    """?refresh=1 or Cache-Control: no-cache skips the cache lookup (the fresh result is still stored)."""
+    return args.get('refresh') in ('1', 'true') or 'no-cache' in headers.get('Cache-Control', '')
+
+
+def local_statistics(text):
+    """Deterministic transcript statistics, computed here instead of generated by Gemini."""
+    with metrics.timer('text_stats_seconds'):
+        return text_statistics(text)
+
+
+def merge_statistics(result, stats):
+    """Fill the locally computed fluency fields into a Gemini result and attach the other statistics."""
+    if 'error' in result:
+        return result
+    fluency = result.get('fluency_markers')
+    if not isinstance(fluency, dict):
+        fluency = result['fluency_markers'] = {}
+    fluency['hesitation_markers'] = stats['hesitation_markers']
+    fluency['connectors_used'] = stats['connectors_used']
+    result['text_statistics'] = {name: value for name, value in stats.items()
+                                 if name not in ('hesitation_markers', 'connectors_used')}
+    return result
+
+
+def plan_sentences(text, reuse=True):
+    """Split a transcript into sentences and look up their indexed findings.
+
+    Returns None when the sentence index is off, otherwise (sentences, keys, known), where
+    known maps the keys of already analyzed sentences to their findings (nothing is looked
+    up when reuse is False).
+    """
+    if sentence_index is None:
+        return None
+    sentences = split_sentences(text)
+    keys = sentence_keys(sentences, GEMINI_MODEL, SENTENCE_VERSION)
+    known = {}
+    if reuse:
+        for key in dict.fromkeys(keys):
+            cached = sentence_index.get(key)
+            metrics.inc('sentence_index_total', result='miss' if cached is None else 'hit')
+            if cached is not None:
+                known[key] = cached[0]
+    return sentences, keys, known
+
+
+def worth_reusing(plan):
+    """Whether enough of a transcript's sentences are indexed for an incremental analysis."""
+    if plan is None or not plan[2]:
+        return False
+    _, keys, known = plan
+    return len(known) >= len(set(keys)) * ANALYSIS_INCREMENTAL_MIN_REUSE
+
+
+def index_sentences(sentences, keys, result):
+    """File the sentence-level findings of a successful analysis under each sentence's key."""
+    if sentence_index is None or 'error' in result:
+        return
+    per_sentence, unassigned = assign_findings(sentences, result)
+    for key, findings in findings_by_key(keys, per_sentence).items():
+        sentence_index.put(key, findings, GEMINI_MODEL)
+    if unassigned:
+        log_event(logger, logging.DEBUG, 'sentence_findings_unassigned', count=len(unassigned))
+
+
+def analyze_incremental(text, plan, on_section=None):
+    """Re-analysis that reuses indexed sentence findings.
+
+    A sentence-level call covers only the new or edited sentences while the holistic call
+    (scores, feedback, fluency, pronunciation, advanced words) runs on the whole transcript;
+    the indexed and fresh findings are merged back in transcript order. With on_section the
+    holistic sections stream, and the sentence-level ones follow once both calls are done.
+    """
+    sentences, keys, known = plan
+    missing = {}
+    for sentence, key in zip(sentences, keys):
+        if key not in known:
+            missing.setdefault(key, sentence)
+    metrics.inc('analysis_mode_total', mode='incremental')
+    log_event(logger, logging.INFO, 'analysis_incremental', sentences=len(set(keys)), reused=len(known),
+              analyzed=len(missing))
+
+    pending = None
+    if missing:
+        listing = '\n'.join(f'{number}. {sentence}' for number, sentence in enumerate(missing.values(), 1))
+        pending = gemini_side_calls.submit(gemini_analyzer.analyze_speaking_text,
+                                           SENTENCE_REQUEST.format(text=text, sentences=listing), 'sentences')
+    if on_section is None:
+        result = gemini_analyzer.analyze_speaking_text(text, 'holistic')
+    else:
+        def publish(name, value):
+            # advanced_words_found alone; vocabulary_assessment is sent complete with the suggestions
+            if name != 'vocabulary_assessment':
+                on_section(name, value)
+
+        result = gemini_analyzer.stream_speaking_text(text, publish, 'holistic')
+    found = pending.result() if pending is not None else {}
+    if 'error' in result or 'error' in found:
+        return result if 'error' in result else found
+
+    findings = dict(known)
+    if missing:
+        per_sentence, unassigned = assign_findings(list(missing.values()), found)
+        for key, sentence_findings in zip(missing, per_sentence):
+            sentence_index.put(key, sentence_findings, GEMINI_MODEL)
+            findings[key] = sentence_findings
+    else:
+        unassigned = []
+    merged = merge_findings([findings[key] for key in dict.fromkeys(keys)], unassigned)
+
+    vocabulary = result.get('vocabulary_assessment') or {}
+    result['vocabulary_assessment'] = {
+        'advanced_words_found': vocabulary.get('advanced_words_found') or [],
+        'vocabulary_suggestions': merged['vocabulary_suggestions'],
+    }
+    result['grammar_errors'] = merged['grammar_errors']
+    result['word_choice_issues'] = merged['word_choice_issues']
+    result['incremental'] = {'sentences': len(set(keys)), 'reused': len(known), 'analyzed': len(missing)}
+    add_usage(result, found)
+    if on_section is not None:
+        for name in ('vocabulary_assessment', 'grammar_errors', 'word_choice_issues'):
+            on_section(name, result[name])
+    return result
+
+
+def is_long(text):
+    """Whether a transcript takes the map-reduce path instead of a single Gemini call."""
+    return bool(ANALYSIS_LONG_TEXT_CHARS) and len(text) > ANALYSIS_LONG_TEXT_CHARS
+
+
+def analyze_segmented(text, stats, on_section=None):
+    """Map-reduce analysis of a long transcript.
+
+    Segments are analyzed in full, ANALYSIS_SEGMENT_CONCURRENCY at a time; their list sections
+    are merged without duplicates, and an aggregation call over the segment scores and feedback
+    produces the band scores, overall feedback and the fluency and pronunciation comments.
+    With on_section the merged list sections are published before the aggregation call.
+    """
+    segments = split_segments(text, ANALYSIS_SEGMENT_CHARS)
+    metrics.inc('analysis_mode_total', mode='segmented')
+    log_event(logger, logging.INFO, 'analysis_segmented', chars=len(text), segments=len(segments),
+              concurrency=ANALYSIS_SEGMENT_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=max(1, min(ANALYSIS_SEGMENT_CONCURRENCY, len(segments))),
+                            thread_name_prefix='analysis-segment') as executor:
+        results = list(executor.map(gemini_analyzer.analyze_speaking_text, segments))
+    for result in results:
+        if 'error' in result:
+            return result
+
+    merged = merge_segment_findings(results)
+    patterns = merged.pop('potential_patterns')
+    if on_section is not None:
+        for name in ('vocabulary_assessment', 'grammar_errors', 'word_choice_issues'):
+            on_section(name, merged[name])
+
+    statistics = merge_statistics({}, stats)['text_statistics']
+    result = gemini_analyzer.analyze_speaking_text(aggregation_input(segments, results, statistics), 'aggregate')
+    if 'error' in result:
+        return result
+    pronunciation = result.get('pronunciation_analysis') or {}
+    result['pronunciation_analysis'] = {'analysis': pronunciation.get('analysis', ''), 'potential_patterns': patterns}
+    result.update(merged)
+    result['segments'] = {'count': len(segments), 'chars': [len(segment) for segment in segments]}
+    add_usage(result, *results)
+    if on_section is not None:
+        for name in ('ielts_band_score', 'overall_feedback', 'fluency_markers', 'pronunciation_analysis'):
+            on_section(name, result[name])
+    return result
+
+
+def analyze_uncached(text, key, on_section=None, reuse=True):
+    """Call Gemini for a cache miss (streaming when on_section is given) and store a successful result.
+
+    Long transcripts go through map-reduce; shorter re-submissions whose sentences are mostly
+    indexed already are analyzed incrementally (reuse=False, a refresh, never is).
+    """
+    log_event(logger, logging.INFO, 'analysis_request', chars=len(text))
+    stats = local_statistics(text)
+    publish = None
+    if on_section is not None:
+        # The local statistics are ready before Gemini answers, so they stream first
+        on_section('text_statistics', merge_statistics({}, stats)['text_statistics'])
+
+        def publish(name, value):
+            if name == 'fluency_markers':
+                value = merge_statistics({name: value}, stats)[name]
+            on_section(name, value)
+
+    plan = plan_sentences(text, reuse)
+    # Long transcripts always go through map-reduce: an incremental analysis would still send
+    # the whole text to the holistic and sentence-level calls
+    if not is_long(text) and worth_reusing(plan):
+        result = analyze_incremental(text, plan, publish)
+    else:
+        if is_long(text):
+            result = analyze_segmented(text, stats, publish)
+        else:
+            metrics.inc('analysis_mode_total', mode='full')
+            if publish is None:
+                result = gemini_analyzer.analyze_speaking_text(text)
+            else:
+                result = gemini_analyzer.stream_speaking_text(text, publish)
+        if plan is not None:
+            index_sentences(plan[0], plan[1], result)
+    result = merge_statistics(result, stats)
+    store_analysis(key, result)
+    return result
+
+
+def analyze_text(text, refresh=False, endpoint='ielts-speaking-gemini'):
+    """Synchronous analysis of one transcript (cache first); returns (payload, status)."""
+    start_time = time.time()
+    key, result, cache_info = lookup_analysis(text, refresh)
+    if result is None:
+        if not gemini_analyzer:
+            return analyzer_unavailable()
+        result = analyze_uncached(text, key, reuse=not refresh)
+    return finish_analysis(result, start_time, time.time(), cache_info, endpoint=endpoint)
+
+
+def run_analysis_job(text, options, publish):
+    """Job runner: the cache was already checked at submission, so go straight to Gemini.
+
+    Sections are published as they stream in, for GET /ielts-speaking-gemini/jobs/<id>/events.
+    """
+    if not gemini_analyzer:
+        return analyzer_unavailable()
+    start_time = time.time()
+    result = analyze_uncached(text, options['key'], on_section=publish, reuse=not options['refresh'])
+    return finish_analysis(result, start_time, time.time(), options['cache_info'], endpoint='jobs')
+
+
+analysis_jobs = AnalysisJobQueue(
+    run_analysis_job,
+    workers=ANALYSIS_JOB_WORKERS,
+    max_pending=ANALYSIS_JOB_QUEUE,
+    result_ttl=ANALYSIS_JOB_TTL_SECONDS,
+)
+metrics.gauge('jobs_pending', 'Analysis jobs waiting for a worker', lambda: analysis_jobs.stats()['pending'])
+metrics.gauge('jobs_running', 'Analysis jobs currently calling Gemini', lambda: analysis_jobs.stats()['running'])
+
+
+def job_payload(job, position):
+    """Job status for the jobs API; includes the analysis (and its HTTP status) once finished."""
+    payload = dict(job.describe(), position=position, status_url=f'/ielts-speaking-gemini/jobs/{job.job_id}')
+    if position:
+        payload['estimated_wait_seconds'] = analysis_jobs.estimated_wait(job)
+    if job.result is not None:
+        payload['result'] = job.result
+        payload['result_status'] = job.http_status
+    return payload
+
+
+def submit_analysis_job(text, refresh=False):
+    """Queue a transcript for analysis; returns (payload, status, headers).
+
+    Cache hits finish immediately (200); queued jobs return 202 with their queue
+    position; a full queue returns 429 with Retry-After.
+    """
+    key, result, cache_info = lookup_analysis(text, refresh)
+    if result is not None:
+        now = time.time()
+        payload, status = finish_analysis(result, now, now, cache_info, endpoint='jobs')
+        job = analysis_jobs.add_finished(text, payload, status)
+        metrics.inc('jobs_total', outcome='cached')
+        return job_payload(job, None), 200, {}
+    if not gemini_analyzer:
+        metrics.inc('jobs_total', outcome='unavailable')
+        payload, status = analyzer_unavailable()
+        return payload, status, {}
+    try:
+        job = analysis_jobs.submit(text, key=key, cache_info=cache_info, refresh=refresh)
+    except QueueFull as e:
+        metrics.inc('jobs_total', outcome='rejected')
+        log_event(logger, logging.WARNING, 'analysis_job_rejected', retry_after=e.retry_after)
+        return {
+            'error': 'Analysis queue is full, retry later',
+            'retry_after_seconds': e.retry_after,
+            'queue': analysis_jobs.stats(),
+        }, 429, {'Retry-After': str(e.retry_after)}
+    metrics.inc('jobs_total', outcome='queued')
+    _, position = analysis_jobs.get(job.job_id)
+    log_event(logger, logging.INFO, 'analysis_job_queued', job=job.job_id, chars=len(text), position=position)
+    payload = job_payload(job, position)
+    return payload, 202, {'Location': payload['status_url']}
+
+
+def job_events(job_id, after=0):
+    """Server-sent events for a job.
+
+    'status' reports queue position changes, 'section' carries each top-level section
+    of the analysis as soon as it is complete (the event id is the section count, so
+    a reconnecting EventSource resumes via Last-Event-ID), and the stream ends with
+    'done' (the full job payload) or 'error'.
+    """
+    sent = after
+    last_state = None
+    while True:
+        found = analysis_jobs.follow(job_id, sent, timeout=ANALYSIS_EVENTS_KEEPALIVE)
+        if found is None:
+            yield format_sse('error', {'error': 'Unknown or expired job'})
+            return
+        job, position, sections = found
+        for name, value in sections:
+            sent += 1
+            yield format_sse('section', {'name': name, 'value': value}, event_id=sent)
+        if job.done:
+            if job.status == 'done':
+                # Cache hits and non-streamed results: send whatever was not streamed
+                streamed = {name for name, _ in job.sections}
+                for name in RESULT_SECTIONS:
+                    if name in job.result and name not in streamed:
+                        sent += 1
+                        yield format_sse('section', {'name': name, 'value': job.result[name]}, event_id=sent)
+                yield format_sse('done', job_payload(job, None))
+            else:
+                yield format_sse('error', job_payload(job, None))
+            return
+        state = (job.status, position)
+        if state != last_state:
+            last_state = state
+            yield format_sse('status', {'status': job.status, 'position': position})
+        elif not sections:
+            yield ': keepalive\n\n'
+
+
+def read_batch_items():
+    """Transcripts of a batch request: a JSON body, or a zip of .md files (raw body or multipart 'file')."""
+    max_bytes = int(ANALYSIS_BATCH_MAX_MB * 1024 * 1024)
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            raise BatchRequestError('Invalid JSON body')
+        return items_from_json(payload, ANALYSIS_BATCH_MAX_ITEMS)
+    if 'file' in request.files:
+        return items_from_zip(request.files['file'].read(), ANALYSIS_BATCH_MAX_ITEMS, max_bytes)
+    if request.mimetype in ('application/zip', 'application/x-zip-compressed', 'application/octet-stream'):
+        return items_from_zip(request.get_data(), ANALYSIS_BATCH_MAX_ITEMS, max_bytes)
+    raise BatchRequestError('Send JSON {"items": [...]} or a zip of .md files', 415)
+
+
+def batch_lines(items, refresh):
+    """NDJSON stream of a batch: one line per transcript in completion order, then a summary line."""
+    start = time.perf_counter()
+    counts = {'succeeded': 0, 'failed': 0, 'cached': 0}
+    log_event(logger, logging.INFO, 'analysis_batch', items=len(items), concurrency=ANALYSIS_BATCH_CONCURRENCY)
+    analyze = partial(analyze_text, refresh=refresh, endpoint='batch')
+    for item, payload, status in run_batch(items, analyze, ANALYSIS_BATCH_CONCURRENCY):
+        counts['succeeded' if status == 200 else 'failed'] += 1
+        if (payload.get('cache') or {}).get('hit'):
+            counts['cached'] += 1
+        line = {'index': item['index'], 'id': item['id'], 'status': status}
+        line['result' if status == 200 else 'error'] = payload if status == 200 else payload.get('error')
+        yield json.dumps(line, ensure_ascii=False) + '\n'
+    summary = dict(counts, items=len(items), seconds=round(time.perf_counter() - start, 3))
+    log_event(logger, logging.INFO, 'analysis_batch_done', **summary)
+    yield json.dumps({'summary': summary}, ensure_ascii=False) + '\n'
+
+
+def parse_job_wait(args):
+    """?wait=<seconds> long-polls a job, capped at ANALYSIS_JOB_MAX_WAIT."""
+    try:
+        return min(max(float(args.get('wait', 0)), 0.0), ANALYSIS_JOB_MAX_WAIT)
+    except ValueError:
+        return 0.0
+
+
+def import_gemini_sdk():
+    """Import the Gemini SDK (the slowest part of startup)."""
+    global genai, types
+    from google import genai
+    from google.genai import types
+
+
+def init_gemini():
+    """Build the Gemini client and analyzer; without an API key the service stays up unconfigured.
+
+    The offline backends (replay, synthetic) need no key.
+    """
+    global client, gemini_analyzer
+    if ANALYSIS_BACKEND in ('replay', 'synthetic'):
+        client = offline_client(ANALYSIS_BACKEND, ANALYSIS_BACKEND_DIR, ANALYSIS_BACKEND_LATENCY,
+                                ANALYSIS_BACKEND_ERRORS)
+    elif ANALYSIS_BACKEND not in ('gemini', 'record'):
+        raise ValueError(f'Unknown ANALYSIS_BACKEND {ANALYSIS_BACKEND!r}')
+    elif not GEMINI_API_KEY:
+        return
+    else:
+        http_options = {'base_url': GEMINI_BASE_URL} if GEMINI_BASE_URL else None
+        client = genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
+        if ANALYSIS_BACKEND == 'record':
+            client = RecordingClient(client, ANALYSIS_BACKEND_DIR)
+    gemini_analyzer = GeminiIELTSAnalyzer(client, GEMINI_MODEL, SYSTEM_PROMPT, variants=ANALYSIS_VARIANTS,
+                                          prompt_cache_keys=PROMPT_CACHE_KEYS if ANALYSIS_PROMPT_CACHE else None)
+    if gemini_analyzer.prompt_caches:
+        threading.Thread(target=gemini_analyzer.prepare_prompt_caches, name='prompt-cache', daemon=True).start()
+
+
+STARTUP_STEPS = [('gemini_sdk', import_gemini_sdk), ('gemini_client', init_gemini)]
+
+
+def health_payload():
+    prompt_caches = None
+    if gemini_analyzer:
+        prompt_caches = {variant or 'full': prompt_cache.stats()
+                         for variant, prompt_cache in gemini_analyzer.prompt_caches.items()}
+    return {
+        'status': 'healthy',
+        'service': 'Gemini IELTS Speaking Analysis Service',
+        'model_used': GEMINI_MODEL,
+        'gemini_api_configured': 'Yes' if GEMINI_API_KEY else 'No',
+        'backend': ANALYSIS_BACKEND,
+        'backend_stats': client.stats() if hasattr(client, 'stats') else None,
+        'prompt_caches': prompt_caches,
+        'ready': startup.ready,
+        'startup': startup.describe(),
+        'jobs': analysis_jobs.stats(),
+        'gemini_budget': gemini_budget.stats(),
+    }
+
+
+def liveness_payload():
+    """Alive as soon as the server answers; 503 once startup failed so a supervisor restarts it."""
+    return {
+        'alive': not startup.failed,
+        'pid': os.getpid(),
+        'uptime_seconds': startup.describe()['uptime_seconds'],
+    }, 503 if startup.failed else 200
+
+
+def analyzer_unavailable():
+    """Error payload and status when no analyzer is available (503 while the SDK is still loading)."""
+    if startup.ready or startup.failed:
+        return {'error': 'Gemini analyzer not initialized', 'startup': startup.describe()}, 500
+    return {'error': 'Gemini analyzer is still starting, retry shortly', 'startup': startup.describe()}, 503
+
+
+def finish_analysis(result, start_time, end_time, cache_info=None, endpoint='ielts-speaking-gemini'):
+    """Attach timing and cache metadata to an analysis result and pick the response status."""
+    if 'error' in result:
+        metrics.inc('requests_total', endpoint=endpoint, status=502)
+        return result, 502  # Bad Gateway, as we failed to get a proper upstream response
+
+    metrics.inc('requests_total', endpoint=endpoint, status=200)
+
+    result['analysis_duration_seconds'] = round(end_time - start_time, 2)
+    result['analysis_timestamp'] = int(time.time() * 1000)
+    if cache_info is not None:
+        result['cache'] = cache_info
+    return result, 200
 
 
 # --- API Endpoints ---
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'Gemini IELTS Speaking Analysis Service',
-        'model_used': GEMINI_MODEL,
-        'gemini_api_configured': 'Yes' if GEMINI_API_KEY else 'No'
-    })
+    return jsonify(health_payload())
+
+
+@app.route('/livez', methods=['GET'])
+def liveness_check():
+    """Liveness: answers as soon as the port is bound, without waiting for the SDK."""
+    payload, status = liveness_payload()
+    return jsonify(payload), status
+
+
+@app.route('/readyz', methods=['GET'])
+def readiness_check():
+    """Readiness: 503 with per-step progress until the SDK is imported and the client built."""
+    payload, status = startup.probe()
+    return jsonify(payload), status
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text metrics; ?format=json returns a quantile summary."""
+    snapshot = metrics.snapshot()
+    if request.args.get('format') == 'json':
+        return jsonify(summarize(snapshot))
+    return Response(render_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/ielts-speaking-gemini', methods=['POST'])
@@ -375,34 +1309,213 @@ def analyze_ielts_speaking_with_gemini(text: str):
     """
     The main endpoint to analyze IELTS speaking from an uploaded markdown file.
     """
+    payload, status = analyze_text(text, wants_refresh(request.args, request.headers))
+    return jsonify(payload), status
+
+
+@app.route('/ielts-speaking-gemini/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze many transcripts in one request (JSON items or a zip of .md files).
+    Results stream back as newline-delimited JSON in the order they finish.
+    """
+    try:
+        items = read_batch_items()
+    except BatchRequestError as e:
+        return jsonify({'error': str(e)}), e.status
     if not gemini_analyzer:
-        return jsonify({'error': 'Gemini analyzer not initialized'}), 500
+        payload, status = analyzer_unavailable()
+        return jsonify(payload), status
+    return Response(batch_lines(items, wants_refresh(request.args, request.headers)),
+                    mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
 
-    print(f"Analyzing text with {len(text)} characters.")
 
-    start_time = time.time()
-    result = gemini_analyzer.analyze_speaking_text(text)
-    end_time = time.time()
+@app.route('/ielts-speaking-gemini/jobs', methods=['POST'])
+@require_markdown_file
+def submit_analysis(text: str):
+    """Queue an analysis and return its job id right away (202), or the cached result (200)."""
+    payload, status, headers = submit_analysis_job(text, wants_refresh(request.args, request.headers))
+    return jsonify(payload), status, headers
 
-    if 'error' in result:
-        return jsonify(result), 502  # Bad Gateway, as we failed to get a proper upstream response
 
-    result['analysis_duration_seconds'] = round(end_time - start_time, 2)
-    result['analysis_timestamp'] = int(time.time() * 1000)
+@app.route('/ielts-speaking-gemini/jobs', methods=['GET'])
+def analysis_jobs_stats():
+    """Job queue state: workers, pending/running counts and outcome counters."""
+    return jsonify(analysis_jobs.stats())
+
+
+@app.route('/ielts-speaking-gemini/jobs/<job_id>', methods=['GET'])
+def analysis_job_status(job_id):
+    """Job status with queue position; the result once finished. ?wait=<seconds> long-polls."""
+    found = analysis_jobs.get(job_id, parse_job_wait(request.args))
+    if found is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job_payload(*found))
+
+
+@app.route('/ielts-speaking-gemini/jobs/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id):
+    """Stream a job's analysis section by section as server-sent events."""
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        after = 0
+    return Response(job_events(job_id, after), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/ielts-speaking-gemini/jobs/<job_id>', methods=['DELETE'])
+def cancel_analysis_job(job_id):
+    """Cancel a job; a Gemini call already in flight finishes, but its result is dropped."""
+    job = analysis_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    log_event(logger, logging.INFO, 'analysis_job_cancelled', job=job_id, status=job.status)
+    return jsonify(job_payload(job, None))
+
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """Analysis cache statistics."""
+    if analysis_cache is None:
+        return jsonify({'enabled': False})
+    payload = dict(analysis_cache.stats(), enabled=True, prompt_version=PROMPT_VERSION)
+    if sentence_index is not None:
+        payload['sentences'] = dict(sentence_index.stats(), version=SENTENCE_VERSION,
+                                    min_reuse=ANALYSIS_INCREMENTAL_MIN_REUSE)
+    return jsonify(payload)
+
+
+@app.route('/cache', methods=['DELETE'])
+@app.route('/cache/<key>', methods=['DELETE'])
+def cache_invalidate(key=None):
+    """Invalidate one cached analysis by key (as returned in 'cache.key'), or all of them
+    (together with the indexed sentence findings)."""
+    if analysis_cache is None:
+        return jsonify({'enabled': False, 'removed': 0})
+    removed = analysis_cache.invalidate(key)
+    log_event(logger, logging.INFO, 'analysis_cache_invalidated', key=key or '*', removed=removed)
+    if key is not None and not removed:
+        return jsonify({'error': 'No cached analysis with this key', 'removed': 0}), 404
+    if key is None and sentence_index is not None:
+        return jsonify({'removed': removed, 'sentences_removed': sentence_index.invalidate()})
+    return jsonify({'removed': removed})
+
+
+def create_asgi_app():
+    """
+    ASGI serving mode (--asgi).
+
+    Health checks are answered on the event loop and the Gemini call is awaited
+    natively, so slow analyses no longer hold a worker thread each. Any other
+    route (including the jobs API) is served by the Flask app mounted underneath,
+    with unchanged contracts.
+    """
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.concurrency import run_in_threadpool
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.responses import JSONResponse
+    from starlette.routing import Mount, Route
+
+    async def health(request):
+        return JSONResponse(health_payload())
+
+    async def livez(request):
+        payload, status = liveness_payload()
+        return JSONResponse(payload, status_code=status)
+
+    async def readyz(request):
+        payload, status = startup.probe()
+        return JSONResponse(payload, status_code=status)
+
+    async def analyze(request):
+        form = await request.form()
+        if 'file' not in form:
+            return JSONResponse({'error': 'No file part in the request'}, status_code=400)
+        upload = form['file']
+        try:
+            check_markdown_filename(upload.filename or '')
+            try:
+                content_bytes = await upload.read()
+            except Exception as e:
+                raise UploadError(f'Failed to read or parse file: {str(e)}', 500)
+            text = decode_markdown(content_bytes)
+        except UploadError as e:
+            return JSONResponse({'error': str(e)}, status_code=e.status)
+
+        start_time = time.time()
+        refresh = wants_refresh(request.query_params, request.headers)
+        key, result, cache_info = await run_in_threadpool(lookup_analysis, text, refresh)
+        if result is None:
+            if not gemini_analyzer:
+                payload, status = analyzer_unavailable()
+                return JSONResponse(payload, status_code=status)
+
+            plan = None if is_long(text) else await run_in_threadpool(plan_sentences, text, not refresh)
+            if is_long(text) or worth_reusing(plan):
+                # Several concurrent calls plus index writes: run the synchronous path off the event loop
+                result = await run_in_threadpool(analyze_uncached, text, key, None, not refresh)
+            else:
+                log_event(logger, logging.INFO, 'analysis_request', chars=len(text))
+                metrics.inc('analysis_mode_total', mode='full')
+                stats = local_statistics(text)
+                result = await gemini_analyzer.analyze_speaking_text_async(text)
+                if plan is not None:
+                    await run_in_threadpool(index_sentences, plan[0], plan[1], result)
+                result = merge_statistics(result, stats)
+                await run_in_threadpool(store_analysis, key, result)
+        end_time = time.time()
+
+        payload, status = finish_analysis(result, start_time, end_time, cache_info)
+        return JSONResponse(payload, status_code=status)
 
-    return jsonify(result)
+    return Starlette(
+        routes=[
+            Route('/health', health, methods=['GET']),
+            Route('/livez', livez, methods=['GET']),
+            Route('/readyz', readyz, methods=['GET']),
+            Route('/ielts-speaking-gemini', analyze, methods=['POST']),
+            Mount('/', app=WSGIMiddleware(app)),
+        ],
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        ],
+    )
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gemini IELTS Speaking Analysis Service')
+    parser.add_argument('--asgi', action='store_true', default=os.getenv('ANALYSIS_ASGI', '0') == '1',
+                        help='Serve with the ASGI (uvicorn) server instead of the Flask dev server')
+    parser.add_argument('--port', type=int, default=5002, help='Port to listen on')
+    args = parser.parse_args()
+
     print("Initializing Gemini IELTS Analysis Service...")
     if not GEMINI_API_KEY:
         print("Warning: Server is starting, but Gemini API key is MISSING.")
     else:
         print("Gemini API key loaded.")
 
-    print(f"\nStarting Flask server on http://localhost:5002")
+    print(f"\nStarting Flask server on http://localhost:{args.port}")
     print("Available Endpoints:")
     print("  GET  /health")
+    print("  GET  /livez  (liveness, available immediately)")
+    print("  GET  /readyz (readiness, 503 with progress until the Gemini SDK is loaded)")
+    print("  GET  /metrics")
+    print("  GET  /cache, DELETE /cache[/<key>] (analysis result cache)")
     print("  POST /ielts-speaking-gemini (Upload a .md file with key 'file')")
+    print("  POST /ielts-speaking-gemini/jobs (same upload; returns a job id, 429 when the queue is full)")
+    print("  GET  /ielts-speaking-gemini/jobs/<id>[?wait=<seconds>], DELETE to cancel")
+    print("  GET  /ielts-speaking-gemini/jobs/<id>/events (SSE, one event per completed section)")
+    print("  POST /ielts-speaking-gemini/batch (JSON items or a zip of .md files; NDJSON results)")
+
+    startup.run(STARTUP_STEPS)
+    analysis_jobs.start()
 
-    app.run(host='0.0.0.0', port=5002, debug=False)
+    if args.asgi:
+        import uvicorn
+        uvicorn.run(create_asgi_app(), host='0.0.0.0', port=args.port)
+    else:
+        app.run(host='0.0.0.0', port=args.port, debug=False)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lightweight metrics and structured logging shared by the Vosk and analysis services.
+
+Metrics are kept in-process (counters, fixed-bucket histograms and callback
+gauges) and exposed as Prometheus text or JSON. Snapshots are plain dicts, so
+decoder worker processes can send theirs to the front process to be merged.
+
+Log events go through log_event(), which checks the level before building
+anything, so per-chunk debug events cost one comparison when disabled.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond chunk work to multi-second Gemini calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Real-time factor buckets (processing time / audio time)
+RTF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+
+def _label_key(labels):
+    if not labels:
+        return ''
+    return ','.join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters, histograms and gauges for one process.
+
+    Args:
+        prefix: prepended to every metric name (e.g. 'vosk_')
+    """
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._help = {}
+        self._buckets = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def counter(self, name, help_text):
+        """Declare a counter so it is exported (as 0) before its first increment."""
+        name = self.prefix + name
+        with self._lock:
+            self._help[name] = help_text
+            self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        name = self.prefix + name
+        with self._lock:
+            self._help[name] = help_text
+            self._buckets[name] = tuple(buckets)
+            self._histograms.setdefault(name, {})
+
+    def gauge(self, name, help_text, fn):
+        """Register a gauge whose value is read from fn() at snapshot time."""
+        name = self.prefix + name
+        with self._lock:
+            self._help[name] = help_text
+            self._gauges[name] = fn
+
+    def inc(self, name, value=1, **labels):
+        name = self.prefix + name
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        name = self.prefix + name
+        key = _label_key(labels)
+        with self._lock:
+            buckets = self._buckets.setdefault(name, LATENCY_BUCKETS)
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = {'counts': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+            index = 0
+            while index < len(buckets) and value > buckets[index]:
+                index += 1
+            state['counts'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the wall time of the enclosed block into histogram `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Plain-dict copy of all metrics (picklable, mergeable with merge_snapshots)."""
+        with self._lock:
+            snapshot = {
+                'help': dict(self._help),
+                'counters': {name: dict(series) for name, series in self._counters.items()},
+                'histograms': {
+                    name: {
+                        'buckets': list(self._buckets[name]),
+                        'series': {
+                            key: {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']}
+                            for key, s in series.items()
+                        },
+                    }
+                    for name, series in self._histograms.items()
+                },
+            }
+            gauges = list(self._gauges.items())
+        snapshot['gauges'] = {}
+        for name, fn in gauges:
+            try:
+                snapshot['gauges'][name] = float(fn())
+            except Exception:
+                continue
+        return snapshot
+
+
+def merge_snapshots(snapshots):
+    """Sum snapshots from several processes (counters, histograms and gauges add up)."""
+    merged = {'help': {}, 'counters': {}, 'histograms': {}, 'gauges': {}}
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        merged['help'].update(snapshot['help'])
+        for name, series in snapshot['counters'].items():
+            target = merged['counters'].setdefault(name, {})
+            for key, value in series.items():
+                target[key] = target.get(key, 0) + value
+        for name, histogram in snapshot['histograms'].items():
+            target = merged['histograms'].setdefault(name, {'buckets': histogram['buckets'], 'series': {}})
+            for key, state in histogram['series'].items():
+                existing = target['series'].get(key)
+                if existing is None:
+                    target['series'][key] = {'counts': list(state['counts']), 'sum': state['sum'],
+                                             'count': state['count']}
+                else:
+                    existing['counts'] = [a + b for a, b in zip(existing['counts'], state['counts'])]
+                    existing['sum'] += state['sum']
+                    existing['count'] += state['count']
+        for name, value in snapshot['gauges'].items():
+            merged['gauges'][name] = merged['gauges'].get(name, 0.0) + value
+    return merged
+
+
+def _quantile(buckets, counts, total, q):
+    """Estimate a quantile from bucket counts (upper bound of the bucket containing it)."""
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return float('inf')
+
+
+def summarize(snapshot):
+    """JSON-friendly view: histograms reduced to count/mean/p50/p95/p99."""
+    histograms = {}
+    for name, histogram in snapshot['histograms'].items():
+        histograms[name] = {}
+        for key, state in histogram['series'].items():
+            count = state['count']
+            histograms[name][key or 'all'] = {
+                'count': count,
+                'mean': round(state['sum'] / count, 6) if count else None,
+                'p50': _quantile(histogram['buckets'], state['counts'], count, 0.50),
+                'p95': _quantile(histogram['buckets'], state['counts'], count, 0.95),
+                'p99': _quantile(histogram['buckets'], state['counts'], count, 0.99),
+            }
+    return {
+        'counters': {
+            name: {key or 'all': value for key, value in series.items()}
+            for name, series in snapshot['counters'].items()
+        },
+        'histograms': histograms,
+        'gauges': snapshot['gauges'],
+    }
+
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    help_texts = snapshot['help']
+
+    def header(name, kind):
+        if name in help_texts:
+            lines.append(f'# HELP {name} {help_texts[name]}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name, series in sorted(snapshot['counters'].items()):
+        header(name, 'counter')
+        if not series:
+            lines.append(f'{name} 0')
+        for key, value in sorted(series.items()):
+            lines.append(f'{name}{{{key}}} {value}' if key else f'{name} {value}')
+
+    for name, histogram in sorted(snapshot['histograms'].items()):
+        header(name, 'histogram')
+        for key, state in sorted(histogram['series'].items()):
+            prefix = f'{key},' if key else ''
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'], state['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {state["count"]}')
+            labels = f'{{{key}}}' if key else ''
+            lines.append(f'{name}_sum{labels} {state["sum"]}')
+            lines.append(f'{name}_count{labels} {state["count"]}')
+
+    for name, value in sorted(snapshot['gauges'].items()):
+        header(name, 'gauge')
+        lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class _StructuredFormatter(logging.Formatter):
+    """Formats log_event() records as JSON lines or `event key=value` text."""
+
+    def __init__(self, as_json):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        if self.as_json:
+            entry = {
+                'ts': round(record.created, 3),
+                'level': record.levelname.lower(),
+                'logger': record.name,
+                'event': record.getMessage(),
+            }
+            entry.update(fields)
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            if record.stack_info:
+                entry['stack'] = self.formatStack(record.stack_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        text = f'{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}'
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        # logger.exception() and stack_info=True keep their traceback, as with the default formatter
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        if record.stack_info:
+            text += '\n' + self.formatStack(record.stack_info)
+        return text
+
+
+def configure_logging(name):
+    """Logger for a service, configured from LOG_LEVEL (default INFO) and LOG_FORMAT (text|json)."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(_StructuredFormatter(os.getenv('LOG_FORMAT', 'text').lower() == 'json'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    return logger
+
+
+def log_event(logger, level, event, **fields):
+    """Emit a structured event; returns immediately when the level is disabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
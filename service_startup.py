@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Background startup with separate liveness and readiness, shared by the Vosk and analysis services.
+
+Both services bind their port first and run slow initialization (SDK imports,
+model loading) as named steps on a background thread. /livez answers as soon as
+the process serves HTTP; /readyz returns 503 with per-step progress until every
+step has finished, and 500 once a step has failed.
+"""
+
+import threading
+import time
+
+
+class StartupTracker:
+    """Runs startup steps in order and reports their progress.
+
+    A step is a (name, fn) pair; it fails when fn raises or returns False, and
+    later steps are skipped.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._steps = []
+        self._done = threading.Event()
+        self.error = None
+        self.ready_seconds = None
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def run(self, steps, background=True):
+        """Run the steps on a daemon thread (or inline); returns the thread, or readiness when inline."""
+        with self._lock:
+            self._steps = [{'name': name, 'status': 'pending', 'seconds': None} for name, _ in steps]
+        if not background:
+            self._run(steps)
+            return self.ready
+        thread = threading.Thread(target=self._run, args=(steps,), name=f'{self.service}-startup', daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, steps):
+        for state, (name, fn) in zip(self._steps, steps):
+            with self._lock:
+                state['status'] = 'running'
+            start = time.perf_counter()
+            try:
+                ok = fn() is not False
+                error = None if ok else f'{name} failed'
+            except Exception as e:
+                ok = False
+                error = f'{name} failed: {e}'
+            with self._lock:
+                state['seconds'] = round(time.perf_counter() - start, 3)
+                state['status'] = 'done' if ok else 'failed'
+                if not ok:
+                    self.error = error
+                    break
+        if self.error is None:
+            self.ready_seconds = round(time.perf_counter() - self._started, 3)
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until startup finished (successfully or not); returns readiness."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def describe(self):
+        with self._lock:
+            steps = [dict(step) for step in self._steps]
+        finished = sum(step['status'] == 'done' for step in steps)
+        running = next((step['name'] for step in steps if step['status'] == 'running'), None)
+        if self.error is not None:
+            phase = 'failed'
+        elif self._done.is_set():
+            phase = 'ready'
+        else:
+            phase = running or 'starting'
+        return {
+            'ready': self.ready,
+            'phase': phase,
+            'progress': round(finished / len(steps), 3) if steps else 0.0,
+            'uptime_seconds': round(time.perf_counter() - self._started, 3),
+            'ready_seconds': self.ready_seconds,
+            'error': self.error,
+            'steps': steps,
+        }
+
+    def probe(self):
+        """(payload, status) for /readyz: 200 when ready, 503 while starting, 500 after a failure."""
+        payload = self.describe()
+        payload['service'] = self.service
+        if self.ready:
+            return payload, 200
+        return payload, 500 if self.failed else 503
@@ -0,0 +1,98 @@
+import io
+import threading
+import zipfile
+
+import pytest
+
+from analysis_batch import BatchRequestError, items_from_json, items_from_zip, run_batch
+
+
+def analyze(text):
+    if text == 'boom':
+        raise RuntimeError('model down')
+    return {'text': text}, 200
+
+
+def test_empty_item_fails_alone_and_the_rest_are_analyzed():
+    items = items_from_json({'items': ['first', {'id': 'blank', 'text': '  \n'}, 'second']}, max_items=10)
+
+    results = {item['id']: (payload, status) for item, payload, status in run_batch(items, analyze, 2)}
+
+    assert results['blank'][1] == 400
+    assert 'empty' in results['blank'][0]['error']
+    assert results['0'] == ({'text': 'first'}, 200)
+    assert results['2'] == ({'text': 'second'}, 200)
+
+
+def test_only_empty_items_still_stream_a_line_each():
+    items = items_from_json({'items': ['', ' ']}, max_items=10)
+
+    assert [status for _, _, status in run_batch(items, analyze, 4)] == [400, 400]
+
+
+def test_analysis_exception_becomes_a_500_line():
+    items = items_from_json({'items': ['boom', 'fine']}, max_items=10)
+
+    statuses = {item['text']: status for item, _, status in run_batch(items, analyze, 2)}
+
+    assert statuses == {'boom': 500, 'fine': 200}
+
+
+def test_request_level_errors():
+    with pytest.raises(BatchRequestError) as missing:
+        items_from_json({'texts': []}, max_items=10)
+    assert missing.value.status == 400
+    with pytest.raises(BatchRequestError) as empty:
+        items_from_json({'items': []}, max_items=10)
+    assert empty.value.status == 400
+    with pytest.raises(BatchRequestError) as too_many:
+        items_from_json({'items': ['a', 'b', 'c']}, max_items=2)
+    assert too_many.value.status == 413
+    with pytest.raises(BatchRequestError):
+        items_from_json({'items': [42]}, max_items=10)
+
+
+def zip_of(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    return buffer.getvalue()
+
+
+def test_zip_keeps_markdown_files_in_order():
+    data = zip_of({'a.md': 'one', 'notes.txt': 'skip', '__MACOSX/._a.md': 'x', 'dir/b.md': 'two'})
+
+    items = items_from_zip(data, max_items=10, max_bytes=1000)
+
+    assert [(item['id'], item['text']) for item in items] == [('a.md', 'one'), ('dir/b.md', 'two')]
+
+
+def test_zip_size_and_encoding_limits():
+    with pytest.raises(BatchRequestError) as large:
+        items_from_zip(zip_of({'a.md': 'x' * 100}), max_items=10, max_bytes=50)
+    assert large.value.status == 413
+    with pytest.raises(BatchRequestError):
+        items_from_zip(zip_of({'a.md': b'\xff\xfe'}), max_items=10, max_bytes=1000)
+    with pytest.raises(BatchRequestError):
+        items_from_zip(b'not a zip', max_items=10, max_bytes=1000)
+
+
+def test_closing_early_cancels_items_not_started():
+    started = []
+    release = threading.Event()
+
+    def slow(text):
+        started.append(text)
+        if text != '0':
+            release.wait(5)
+        return {}, 200
+
+    items = items_from_json({'items': [str(n) for n in range(20)]}, max_items=20)
+    batch = run_batch(items, slow, 2)
+    next(batch)
+    batch.close()
+    release.set()
+
+    # Two workers: the finished item, the one still running and at most one started after it
+    assert len(started) <= 3
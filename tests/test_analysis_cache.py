@@ -0,0 +1,130 @@
+import json
+import sqlite3
+
+import pytest
+
+import analysis_cache
+from analysis_cache import AnalysisCache, cache_key, normalize_text, prompt_version
+
+RESULT = {'overall_band': 6.5, 'grammar_errors': []}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(analysis_cache, 'time', clock)
+    return clock
+
+
+def test_key_ignores_whitespace_but_not_case_model_or_version():
+    key = cache_key('I  like\n tea. ', 'flash', 'v1')
+
+    assert normalize_text(' I  like\n tea. ') == 'I like tea.'
+    assert cache_key('I like tea.', 'flash', 'v1') == key
+    assert cache_key('i like tea.', 'flash', 'v1') != key
+    assert cache_key('I like tea.', 'pro', 'v1') != key
+    assert cache_key('I like tea.', 'flash', 'v2') != key
+    assert prompt_version('prompt', {'schema': 1}) != prompt_version('prompt', {'schema': 2})
+
+
+def test_memory_only_cache_round_trip(clock):
+    cache = AnalysisCache()
+    cache.put('k', RESULT)
+    clock.now += 5
+
+    assert cache.get('k') == (RESULT, {'tier': 'memory', 'age_seconds': 5.0})
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['misses'], stats['disk_entries']) == (1, 1, None)
+
+
+def test_memory_tier_is_bounded_lru(clock):
+    cache = AnalysisCache(memory_entries=2)
+    cache.put('a', RESULT)
+    cache.put('b', RESULT)
+    cache.get('a')
+    cache.put('c', RESULT)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['memory_entries'] == 2
+
+
+def test_disk_tier_survives_a_restart(tmp_path, clock):
+    path = str(tmp_path / 'cache' / 'analysis.sqlite3')
+    AnalysisCache(path).put('k', RESULT, model='flash')
+
+    cache = AnalysisCache(path)
+    result, info = cache.get('k')
+
+    assert result == RESULT
+    assert info['tier'] == 'disk'
+    # A disk hit is promoted to memory
+    assert cache.get('k')[1]['tier'] == 'memory'
+    assert (cache.disk_hits, cache.memory_hits) == (1, 1)
+
+
+def test_expired_entries_are_misses_in_both_tiers(tmp_path, clock):
+    path = str(tmp_path / 'analysis.sqlite3')
+    cache = AnalysisCache(path, ttl_seconds=60)
+    cache.put('k', RESULT)
+    clock.now += 61
+
+    assert cache.get('k') is None
+    assert cache.stats()['disk_entries'] == 0
+    assert AnalysisCache(path, ttl_seconds=60).get('k') is None
+
+
+def test_disk_tier_evicts_least_recently_accessed_over_max_bytes(tmp_path, clock):
+    size = len(json.dumps(RESULT))
+    cache = AnalysisCache(str(tmp_path / 'analysis.sqlite3'), memory_entries=1, max_bytes=size * 2)
+    cache.put('a', RESULT)
+    clock.now += 1
+    cache.put('b', RESULT)
+    clock.now += 1
+    # Read 'a' from disk so 'b' becomes the least recently accessed
+    assert cache.get('a')[1]['tier'] == 'disk'
+    clock.now += 1
+
+    cache.put('c', RESULT)
+
+    stats = cache.stats()
+    assert stats['disk_entries'] == 2
+    assert stats['disk_bytes'] <= size * 2
+    assert stats['evictions'] == 1
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+
+def test_invalidate_one_or_all(tmp_path, clock):
+    cache = AnalysisCache(str(tmp_path / 'analysis.sqlite3'))
+    for key in 'abc':
+        cache.put(key, RESULT)
+
+    assert cache.invalidate('a') == 1
+    assert cache.invalidate('a') == 0
+    assert cache.get('a') is None
+    assert cache.invalidate() == 2
+    assert cache.get('b') is None
+    assert cache.stats()['memory_entries'] == 0
+
+
+def test_caches_can_share_a_file_through_separate_tables(tmp_path, clock):
+    path = str(tmp_path / 'analysis.sqlite3')
+    results = AnalysisCache(path)
+    sentences = AnalysisCache(path, table='sentence_cache')
+    results.put('k', RESULT)
+
+    assert sentences.get('k') is None
+    assert sentences.invalidate() == 0
+    assert results.get('k') is not None
+    tables = {row[0] for row in sqlite3.connect(path).execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {'analysis_cache', 'sentence_cache'}
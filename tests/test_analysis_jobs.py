@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+from analysis_jobs import AnalysisJobQueue, QueueFull
+
+RESULT = {'overall_band': 6.5}
+
+
+class BlockingRunner:
+    """Runner whose calls wait until released, so tests control what is running."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def __call__(self, text, options, publish):
+        publish('started', text)
+        self.started.release()
+        self.release.wait(5.0)
+        if text == 'error':
+            return {'error': 'bad transcript'}, 400
+        if text == 'crash':
+            raise RuntimeError('gemini down')
+        return RESULT, 200
+
+
+def started(runner, count=1):
+    return all(runner.started.acquire(timeout=5.0) for _ in range(count))
+
+
+def test_full_queue_raises_with_retry_after():
+    queue = AnalysisJobQueue(BlockingRunner(), workers=2, max_pending=2)
+    queue._avg_seconds = 10.0
+    queue.submit('a')
+    queue.submit('b')
+
+    with pytest.raises(QueueFull) as error:
+        queue.submit('c')
+
+    # Two jobs ahead across two workers: one round of the average run time, then its own turn
+    assert error.value.retry_after == 20
+    assert queue.stats()['rejected'] == 1
+    assert queue.stats()['pending'] == 2
+
+
+def test_retry_after_defaults_without_history():
+    queue = AnalysisJobQueue(BlockingRunner(), workers=1, max_pending=1)
+    queue.submit('a')
+
+    with pytest.raises(QueueFull) as error:
+        queue.submit('b')
+    assert error.value.retry_after == 10
+
+
+def test_pending_positions_and_estimated_wait():
+    runner = BlockingRunner()
+    queue = AnalysisJobQueue(runner, workers=1)
+    running = queue.submit('a')
+    queue.start()
+    assert started(runner)
+    second = queue.submit('b')
+    third = queue.submit('c')
+
+    assert queue.get(running.job_id)[1] == 0
+    assert queue.get(second.job_id)[1] == 1
+    assert queue.get(third.job_id)[1] == 2
+    assert queue.estimated_wait(second) == 5
+    assert queue.estimated_wait(third) == 10
+    runner.release.set()
+
+
+def test_jobs_finish_with_the_runner_result():
+    runner = BlockingRunner()
+    runner.release.set()
+    queue = AnalysisJobQueue(runner, workers=2)
+    queue.start()
+    ok, error, crash = queue.submit('fine'), queue.submit('error'), queue.submit('crash')
+
+    assert queue.get(ok.job_id, wait=5.0)[0].result == RESULT
+    assert queue.get(error.job_id, wait=5.0)[0].http_status == 400
+    job, position = queue.get(crash.job_id, wait=5.0)
+    assert (job.status, job.http_status, position) == ('failed', 500, None)
+    assert 'gemini down' in job.result['error']
+    assert job.text is None
+    stats = queue.stats()
+    assert (stats['completed'], stats['failed']) == (1, 2)
+
+
+def test_cancel_pending_job_frees_its_slot():
+    queue = AnalysisJobQueue(BlockingRunner(), max_pending=1)
+    job = queue.submit('a')
+
+    assert queue.cancel(job.job_id).status == 'cancelled'
+    assert queue.submit('b') is not None
+    assert queue.cancel('missing') is None
+    assert queue.stats()['cancelled'] == 1
+
+
+def test_cancelled_running_job_discards_its_result():
+    runner = BlockingRunner()
+    queue = AnalysisJobQueue(runner, workers=1)
+    queue.start()
+    job = queue.submit('a')
+    assert started(runner)
+
+    queue.cancel(job.job_id)
+    runner.release.set()
+    follower = queue.submit('b')
+    queue.get(follower.job_id, wait=5.0)
+
+    assert job.status == 'cancelled'
+    assert job.result is None
+    assert queue.stats()['completed'] == 1
+
+
+def test_cancelling_a_finished_job_keeps_it():
+    queue = AnalysisJobQueue(BlockingRunner())
+    job = queue.add_finished('cached', RESULT)
+
+    assert queue.cancel(job.job_id).status == 'done'
+    assert queue.stats()['cancelled'] == 0
+
+
+def test_follow_returns_sections_as_they_are_published():
+    runner = BlockingRunner()
+    queue = AnalysisJobQueue(runner, workers=1)
+    queue.start()
+    job = queue.submit('a')
+    assert started(runner)
+
+    _, position, sections = queue.follow(job.job_id, timeout=5.0)
+    assert sections == [('started', 'a')]
+    assert position == 0
+    runner.release.set()
+    queue.get(job.job_id, wait=5.0)
+    assert queue.follow(job.job_id, after=1)[2] == []
+
+
+def test_finished_jobs_expire():
+    queue = AnalysisJobQueue(BlockingRunner(), result_ttl=60.0, max_jobs=2)
+    old = queue.add_finished('a', RESULT)
+    old.finished_at -= 120
+    pending = queue.submit('b')
+    pending.submitted_at -= 120
+
+    queue.add_finished('c', RESULT)
+
+    assert queue.get(old.job_id) is None
+    assert queue.get(pending.job_id) is not None
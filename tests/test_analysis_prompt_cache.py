@@ -0,0 +1,182 @@
+import sys
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+import analysis_prompt_cache
+from analysis_prompt_cache import PromptCache
+
+PROMPT = '分析' * 1200
+MODEL = 'gemini-2.5-flash'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeCaches:
+    def __init__(self):
+        self.entries = []
+        self.created = 0
+        self.updated = 0
+        self.fail_create = None
+        self.fail_update = None
+
+    def list(self):
+        return list(self.entries)
+
+    def create(self, model, config):
+        if self.fail_create:
+            raise self.fail_create
+        self.created += 1
+        cached = types.SimpleNamespace(name=f'cachedContents/{self.created}', display_name=config.display_name,
+                                       model=f'models/{model}', expire_time=None, ttl=config.ttl)
+        self.entries.append(cached)
+        return cached
+
+    def update(self, name, config):
+        if self.fail_update:
+            raise self.fail_update
+        self.updated += 1
+        return types.SimpleNamespace(name=name, expire_time=None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(analysis_prompt_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # google-genai is only needed for its config types
+    genai_types = types.ModuleType('google.genai.types')
+    genai_types.CreateCachedContentConfig = lambda **fields: types.SimpleNamespace(**fields)
+    genai_types.UpdateCachedContentConfig = lambda **fields: types.SimpleNamespace(**fields)
+    genai = types.ModuleType('google.genai')
+    genai.types = genai_types
+    google = types.ModuleType('google')
+    google.genai = genai
+    monkeypatch.setitem(sys.modules, 'google', google)
+    monkeypatch.setitem(sys.modules, 'google.genai', genai)
+    monkeypatch.setitem(sys.modules, 'google.genai.types', genai_types)
+    return types.SimpleNamespace(caches=FakeCaches())
+
+
+def make_cache(client, events=None, **kwargs):
+    on_event = (lambda event, **fields: events.append(event)) if events is not None else None
+    return PromptCache(client, MODEL, PROMPT, 'v1', ttl_seconds=3600, refresh_margin=300, retry_seconds=600,
+                       on_event=on_event, **kwargs)
+
+
+def test_clients_without_caches_send_the_prompt_inline(clock):
+    events = []
+    cache = make_cache(types.SimpleNamespace(), events)
+
+    assert cache.name() is None
+    assert cache.stats()['reason'] == 'unsupported'
+    assert events == ['disabled']
+
+
+def test_small_prompts_are_not_cached(client, clock):
+    cache = PromptCache(client, MODEL, '短提示', 'v1')
+
+    assert cache.name() is None
+    assert cache.reason == 'too_small'
+    assert client.caches.created == 0
+
+
+def test_cached_content_is_created_once(client, clock):
+    events = []
+    cache = make_cache(client, events)
+
+    name = cache.name()
+    clock.now += 60
+
+    assert cache.name() == name
+    assert client.caches.created == 1
+    assert client.caches.entries[0].display_name == 'ielts-analysis-v1'
+    assert client.caches.entries[0].ttl == '3600s'
+    assert events == ['created']
+    assert cache.stats()['expires_in'] == 3540
+
+
+def test_existing_cache_of_the_same_version_is_reused(client, clock):
+    make_cache(client).name()
+    other = types.SimpleNamespace(name='cachedContents/other', display_name='ielts-analysis-v0',
+                                  model=f'models/{MODEL}', expire_time=None)
+    client.caches.entries.insert(0, other)
+    client.caches.entries[1].expire_time = datetime.fromtimestamp(clock.now + 3600, timezone.utc)
+
+    cache = make_cache(client)
+
+    assert cache.name() == 'cachedContents/1'
+    assert client.caches.created == 1
+    assert cache.counts['reused'] == 1
+    assert client.caches.updated == 0
+
+
+def test_reused_cache_close_to_expiry_is_extended(client, clock):
+    make_cache(client).name()
+    client.caches.entries[0].expire_time = datetime.fromtimestamp(clock.now + 60, timezone.utc)
+
+    cache = make_cache(client)
+
+    assert cache.name() == 'cachedContents/1'
+    assert client.caches.updated == 1
+
+
+def test_ttl_is_extended_before_it_expires(client, clock):
+    cache = make_cache(client)
+    name = cache.name()
+    clock.now += 3600 - 299
+
+    assert cache.name() == name
+    assert client.caches.updated == 1
+    assert cache.stats()['expires_in'] == 3600
+
+
+def test_failed_refresh_creates_new_cached_content(client, clock):
+    events = []
+    cache = make_cache(client, events)
+    cache.name()
+    client.caches.fail_update = RuntimeError('not found')
+    clock.now += 3500
+
+    assert cache.name() == 'cachedContents/2'
+    assert events == ['created', 'refresh_failed', 'created']
+
+
+def test_creation_failure_falls_back_inline_and_retries_later(client, clock):
+    events = []
+    cache = make_cache(client, events)
+    client.caches.fail_create = RuntimeError('quota exceeded')
+
+    assert cache.name() is None
+    assert cache.reason == 'RuntimeError: quota exceeded'
+    client.caches.fail_create = None
+    clock.now += 599
+    assert cache.name() is None
+    clock.now += 2
+    assert cache.name() == 'cachedContents/1'
+    assert cache.reason is None
+    assert events == ['failed', 'created']
+
+
+def test_invalidated_cache_is_not_used_until_the_retry(client, clock):
+    cache = make_cache(client)
+    cache.name()
+
+    cache.invalidate(RuntimeError('cached content deleted'))
+
+    assert cache.name() is None
+    assert cache.counts['failed'] == 1
+    clock.now += 601
+    # The old entry is still listed, so it is adopted again
+    assert cache.name() == 'cachedContents/1'
@@ -0,0 +1,125 @@
+import pytest
+
+import analysis_ratelimit
+from analysis_ratelimit import RateLimiter, backoff_delay, estimate_tokens, is_transient_error
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(analysis_ratelimit, 'time', clock)
+    return clock
+
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f'HTTP {code}')
+        self.code = code
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+def test_unlimited_budgets_never_wait(clock):
+    limiter = RateLimiter()
+
+    assert all(limiter.reserve(10_000) == 0.0 for _ in range(100))
+    assert limiter.stats()['throttled'] == 0
+
+
+def test_request_budget_waits_once_exhausted(clock):
+    limiter = RateLimiter(rpm=2)
+
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    # Each reservation past the budget waits one more refill interval (60 / rpm seconds)
+    assert limiter.reserve() == pytest.approx(30.0)
+    assert limiter.reserve() == pytest.approx(60.0)
+    assert limiter.stats()['throttled'] == 2
+
+
+def test_buckets_refill_over_time(clock):
+    limiter = RateLimiter(rpm=60)
+    for _ in range(60):
+        limiter.reserve()
+
+    clock.now += 0.5
+    assert limiter.reserve() == pytest.approx(0.5)
+    clock.now += 120
+    # Refill is capped at the budget
+    assert limiter.stats()['requests_available'] == 60
+
+
+def test_token_budget_waits_for_large_reservations(clock):
+    limiter = RateLimiter(tpm=6000)
+
+    assert limiter.reserve(6000) == 0.0
+    assert limiter.reserve(1000) == pytest.approx(10.0)
+
+
+def test_a_call_larger_than_the_budget_is_let_through(clock):
+    limiter = RateLimiter(tpm=1000)
+
+    assert limiter.reserve(50_000) == 0.0
+    assert limiter.reserve(500) == pytest.approx(30.0)
+
+
+def test_settle_returns_overestimated_tokens(clock):
+    limiter = RateLimiter(tpm=1000)
+    limiter.reserve(800)
+
+    limiter.settle(800, 200)
+
+    assert limiter.stats()['tokens_available'] == 800
+    assert limiter.reserve(800) == 0.0
+
+
+def test_settle_charges_underestimated_tokens(clock):
+    limiter = RateLimiter(tpm=1000)
+    limiter.reserve(100)
+
+    limiter.settle(100, 1100)
+
+    assert limiter.stats()['tokens_available'] == -100
+    assert limiter.reserve(0) == pytest.approx(6.0)
+
+
+def test_settle_without_usage_keeps_the_estimate(clock):
+    limiter = RateLimiter(tpm=1000)
+    limiter.reserve(400)
+
+    limiter.settle(400, None)
+
+    assert limiter.stats()['tokens_available'] == 600
+
+
+def test_transient_errors():
+    assert is_transient_error(ApiError(429))
+    assert is_transient_error(ApiError(503))
+    assert not is_transient_error(ApiError(400))
+    assert not is_transient_error(ApiError(403))
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(ConnectionResetError())
+    assert is_transient_error(ReadTimeout())
+    assert not is_transient_error(ValueError('bad schema'))
+
+
+def test_backoff_is_jittered_and_capped():
+    delays = [backoff_delay(attempt, base=1.0, cap=8.0) for attempt in range(10) for _ in range(20)]
+
+    assert all(0 <= delay <= 8.0 for delay in delays)
+    assert all(0 <= backoff_delay(0, base=1.0) <= 1.0 for _ in range(20))
+    assert len(set(delays)) > 1
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('a' * 400, overhead=50) == 150
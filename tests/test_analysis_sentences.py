@@ -0,0 +1,30 @@
+from analysis_sentences import assign_findings, findings_by_key, sentence_keys, split_sentences
+
+TRANSCRIPT = 'I goes to school. It is fine. I goes to school.'
+
+
+def test_repeated_sentence_keeps_its_findings():
+    sentences = split_sentences(TRANSCRIPT)
+    keys = sentence_keys(sentences, 'model', 'v1')
+    error = {'original_sentence': 'I goes to school.', 'text': 'goes', 'description': 'agreement'}
+    per_sentence, unassigned = assign_findings(sentences, {'grammar_errors': [error]})
+
+    by_key = findings_by_key(keys, per_sentence)
+
+    assert unassigned == []
+    assert len(by_key) == 2
+    assert by_key[keys[0]]['grammar_errors'] == [error]
+    assert by_key[keys[1]]['grammar_errors'] == []
+
+
+def test_findings_of_each_occurrence_are_merged_once():
+    keys = ['a', 'b', 'a']
+    first = {'text': 'goes'}
+    second = {'text': 'school'}
+    per_sentence = [
+        {'grammar_errors': [first], 'word_choice_issues': [], 'vocabulary_suggestions': []},
+        {'grammar_errors': [], 'word_choice_issues': [], 'vocabulary_suggestions': []},
+        {'grammar_errors': [first, second], 'word_choice_issues': [], 'vocabulary_suggestions': []},
+    ]
+
+    assert findings_by_key(keys, per_sentence)['a']['grammar_errors'] == [first, second]
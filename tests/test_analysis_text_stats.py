@@ -0,0 +1,24 @@
+from analysis_text_stats import text_statistics
+
+
+def connectors(text):
+    stats = text_statistics(text)
+    assert stats['connector_count'] == len(stats['connectors_used'])
+    return stats['connectors_used']
+
+
+def test_longer_connector_replaces_its_first_word():
+    assert connectors('It was good because of the weather.') == ['because of']
+    assert connectors('Because, because of the rain, we stayed.') == ['because', 'because of']
+
+
+def test_intensifier_so_is_not_a_connector():
+    assert connectors('It was so good.') == []
+    assert connectors('I was tired, so I went home.') == ['so']
+    assert connectors('I was tired so I went home.') == ['so']
+    assert connectors('And so we left.') == ['so']
+
+
+def test_prepositional_since_and_while_are_not_connectors():
+    assert connectors('I have lived there since 2010 and waited for a while.') == []
+    assert connectors('Since I was young, I read while I eat.') == ['since', 'while']
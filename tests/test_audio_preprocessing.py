@@ -0,0 +1,39 @@
+import numpy as np
+
+from audio_preprocessing import AudioPreprocessor
+
+
+def sequential_declick(samples, threshold, previous=0):
+    """The per-sample loop the vectorized stage replaces: compare with the last kept sample."""
+    out = samples.astype(np.int64)
+    for i in range(len(out)):
+        reference = out[i - 1] if i else previous
+        if abs(out[i] - reference) > threshold:
+            out[i] = reference
+    return out.astype(np.int16)
+
+
+def declick(chunks, threshold=20000):
+    preprocessor = AudioPreprocessor(declick_threshold=threshold)
+    out = [np.frombuffer(preprocessor.process(chunk.tobytes()), dtype=np.int16) for chunk in chunks]
+    return np.concatenate(out), preprocessor
+
+
+def test_sustained_step_is_held_until_the_signal_returns():
+    samples = np.array([0, 100, 30000, 30000, 30100, 29900, 150, 200], dtype=np.int16)
+
+    out, preprocessor = declick([samples])
+
+    assert out.tolist() == [0, 100, 100, 100, 100, 100, 150, 200]
+    assert preprocessor.clicks_repaired == 4
+
+
+def test_matches_sequential_loop_across_chunks():
+    rng = np.random.default_rng(3)
+    samples = rng.integers(-2000, 2000, 20000).astype(np.int16)
+    for start in rng.integers(0, 19000, 40):
+        samples[start:start + rng.integers(1, 600)] = rng.choice([-30000, 30000])
+
+    out, _ = declick(np.array_split(samples, 7))
+
+    assert out.tolist() == sequential_declick(samples, 20000).tolist()
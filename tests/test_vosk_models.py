@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from vosk_models import ModelNotFoundError, ModelRegistry
+
+
+def make_models(root, **sizes):
+    for name, size in sizes.items():
+        os.makedirs(root / name / 'conf')
+        (root / name / 'final.mdl').write_bytes(b'\0' * size)
+    # Not a model: no conf/ directory
+    os.makedirs(root / 'notes', exist_ok=True)
+
+
+def make_registry(root, loaded, **kwargs):
+    def loader(path):
+        loaded.append(os.path.basename(path))
+        return object()
+    return ModelRegistry(str(root), loader, 'small', **kwargs)
+
+
+def test_discovers_models_and_resolves_aliases(tmp_path):
+    make_models(tmp_path, small=10, large=10)
+    registry = make_registry(tmp_path, [], aliases={'accurate': 'large'})
+
+    assert registry.available() == ['large', 'small', 'accurate']
+    assert registry.resolve(None) == 'small'
+    assert registry.resolve('accurate') == 'large'
+
+
+def test_unknown_model_raises(tmp_path):
+    make_models(tmp_path, small=10)
+    registry = make_registry(tmp_path, [])
+
+    with pytest.raises(ModelNotFoundError):
+        registry.get('notes')
+    with pytest.raises(ModelNotFoundError):
+        registry.resolve('missing')
+
+
+def test_models_added_later_are_discovered_on_request(tmp_path):
+    make_models(tmp_path, small=10)
+    registry = make_registry(tmp_path, [])
+    os.makedirs(tmp_path / 'late' / 'conf')
+
+    assert registry.resolve('late') == 'late'
+
+
+def test_model_is_loaded_once(tmp_path):
+    make_models(tmp_path, small=10)
+    loaded = []
+    registry = make_registry(tmp_path, loaded)
+
+    assert registry.get() is registry.get('small')
+    assert loaded == ['small']
+
+
+def test_budget_unloads_the_least_recently_used_model(tmp_path):
+    make_models(tmp_path, small=100, a=100, b=100, c=100)
+    unloaded = []
+    registry = make_registry(tmp_path, [], memory_budget_bytes=300, on_unload=unloaded.append)
+    registry.get()
+    registry.get('a')
+    registry.get('b')
+    registry.get('a')
+
+    registry.get('c')
+
+    assert unloaded == ['b']
+    assert not registry.is_loaded('b')
+    assert registry.is_loaded('a') and registry.is_loaded('c') and registry.is_loaded('small')
+    assert registry.describe()['resident_bytes'] <= 300
+
+
+def test_default_and_requested_models_are_kept_over_budget(tmp_path):
+    make_models(tmp_path, small=200, a=200)
+    registry = make_registry(tmp_path, [], memory_budget_bytes=100)
+    registry.get()
+
+    registry.get('a')
+
+    assert registry.is_loaded('small') and registry.is_loaded('a')
+    assert registry.unloads == 0
+
+
+def test_models_in_use_are_not_unloaded(tmp_path):
+    make_models(tmp_path, small=100, a=100, b=100)
+    registry = make_registry(tmp_path, [], memory_budget_bytes=200, in_use=lambda name: name == 'a')
+    registry.get()
+    registry.get('a')
+
+    registry.get('b')
+
+    assert registry.is_loaded('a')
+    assert registry.describe()['resident_bytes'] == 300
+    # Once the sessions are gone the next load brings the registry back within budget
+    registry.in_use = None
+    assert registry.enforce_budget() == ['a']
+
+
+def test_unloaded_model_is_reloaded_on_demand(tmp_path):
+    make_models(tmp_path, small=100, a=100, b=100)
+    loaded = []
+    registry = make_registry(tmp_path, loaded, memory_budget_bytes=200)
+    registry.get()
+    registry.get('a')
+    registry.get('b')
+
+    registry.get('a')
+
+    assert loaded == ['small', 'a', 'b', 'a']
+    assert registry.is_loaded('a') and not registry.is_loaded('b')
@@ -0,0 +1,151 @@
+import threading
+import time
+
+from vosk_rescoring import PRIORITY_FLUSH, AudioSpool, RescoringQueue
+
+PCM = b'\0\0' * 1600
+
+
+def test_sessions_with_unfinished_jobs_survive_the_session_limit():
+    queue = RescoringQueue(lambda pcm, rate, cancelled: {'text': 'x', 'words': []}, max_sessions=2)
+    # Not started: every job stays pending
+    first = queue.submit('a', PCM, 16000, 'live a')
+    queue.submit('b', PCM, 16000, 'live b')
+    queue.submit('c', PCM, 16000, 'live c')
+
+    assert queue.results('a')['utterances'][0]['id'] == first
+    assert queue.stats()['sessions'] == 3
+
+
+def test_finished_sessions_are_evicted_oldest_first():
+    queue = RescoringQueue(lambda pcm, rate, cancelled: {'text': 'x', 'words': []}, max_sessions=2)
+    queue.submit('a', PCM, 16000, 'live a')
+    queue.cancel('a')
+    queue.submit('b', PCM, 16000, 'live b')
+    queue.submit('c', PCM, 16000, 'live c')
+
+    assert queue.results('a') is None
+    assert queue.results('b') is not None
+    assert queue.results('c') is not None
+
+
+def marker(pcm):
+    return pcm[:1].decode()
+
+
+def test_flush_jobs_run_before_endpoint_jobs():
+    order = []
+    queue = RescoringQueue(lambda pcm, rate, cancelled: order.append(marker(pcm)) or {'text': '', 'words': []})
+    queue.submit('a', b'e' + PCM, 16000, '')
+    queue.submit('a', b'f' + PCM, 16000, '', priority=PRIORITY_FLUSH)
+    queue.submit('a', b'g' + PCM, 16000, '')
+
+    queue.start()
+
+    assert queue.results('a', wait=5.0)['complete']
+    assert order == ['f', 'e', 'g']
+
+
+def test_full_queue_drops_the_newest_lowest_priority_job():
+    queue = RescoringQueue(lambda pcm, rate, cancelled: {'text': '', 'words': []}, max_pending=2)
+    queue.submit('a', PCM, 16000, 'one')
+    queue.submit('a', PCM, 16000, 'two')
+    queue.submit('a', PCM, 16000, 'flushed', priority=PRIORITY_FLUSH)
+
+    utterances = queue.results('a')['utterances']
+    assert [u['status'] for u in utterances] == ['pending', 'cancelled', 'pending']
+    assert utterances[1]['error']
+    assert queue.stats()['dropped'] == 1
+    assert queue.stats()['pending'] == 2
+
+
+def test_cancelled_jobs_fall_back_to_the_live_text():
+    queue = RescoringQueue(lambda pcm, rate, cancelled: {'text': 'rescored', 'words': []})
+    queue.submit('a', PCM, 16000, 'live one')
+    queue.submit('a', PCM, 16000, 'live two')
+
+    assert queue.cancel('a') == 2
+    assert queue.cancel('a') == 0
+    result = queue.results('a')
+    assert result['complete']
+    assert result['text'] == 'live one live two'
+    assert queue.stats()['pending'] == 0
+
+
+def test_cancel_stops_a_running_job():
+    started = threading.Event()
+
+    def decoder(pcm, rate, cancelled):
+        started.set()
+        while not cancelled():
+            time.sleep(0.01)
+        return None
+
+    queue = RescoringQueue(decoder)
+    queue.start()
+    queue.submit('a', PCM, 16000, 'live')
+    assert started.wait(5.0)
+
+    assert queue.cancel('a') == 1
+    result = queue.results('a', wait=5.0)
+    assert result['complete']
+    assert result['utterances'][0]['status'] == 'cancelled'
+    assert result['text'] == 'live'
+
+
+def test_failed_jobs_keep_the_live_text():
+    def decoder(pcm, rate, cancelled):
+        raise RuntimeError('decoder crashed')
+
+    queue = RescoringQueue(decoder)
+    queue.start()
+    queue.submit('a', PCM, 16000, 'live')
+
+    result = queue.results('a', wait=5.0)
+    assert result['utterances'][0]['status'] == 'failed'
+    assert result['utterances'][0]['error'] == 'decoder crashed'
+    assert result['text'] == 'live'
+    assert queue.stats()['failed'] == 1
+
+
+def test_results_wait_for_running_jobs():
+    release = threading.Event()
+
+    def decoder(pcm, rate, cancelled):
+        release.wait(5.0)
+        return {'text': 'rescored', 'words': []}
+
+    queue = RescoringQueue(decoder)
+    queue.start()
+    queue.submit('a', PCM, 16000, 'live')
+
+    assert not queue.results('a', wait=0.05)['complete']
+    release.set()
+    result = queue.results('a', wait=5.0)
+    assert result['complete']
+    assert result['text'] == 'rescored'
+    assert queue.results('missing', wait=0.05) is None
+
+
+def test_finished_results_expire_after_the_ttl():
+    queue = RescoringQueue(lambda pcm, rate, cancelled: {'text': '', 'words': []}, result_ttl=60.0)
+    queue.submit('old', PCM, 16000, 'live')
+    queue.submit('pending', PCM, 16000, 'live')
+    queue.cancel('old')
+    for session_id in ('old', 'pending'):
+        queue._results[session_id][0].submitted_at -= 120
+
+    queue.submit('new', PCM, 16000, 'live')
+
+    assert queue.results('old') is None
+    assert queue.results('pending') is not None
+
+
+def test_spool_truncates_at_the_limit():
+    spool = AudioSpool(16000, max_bytes=10)
+    spool.append(b'\1' * 6)
+    spool.append(b'\2' * 6)
+
+    assert len(spool) == 10
+    assert spool.take() == (b'\1' * 6 + b'\2' * 4, True)
+    assert spool.take() == (b'', False)
@@ -0,0 +1,177 @@
+import time
+
+from vosk_sessions import RecognizerPool, SessionManager
+
+KEY = ('small', 16000)
+
+
+class FakeRecognizer:
+    def __init__(self, key, fail_reset=False):
+        self.key = key
+        self.fail_reset = fail_reset
+        self.resets = 0
+
+    def Reset(self):
+        if self.fail_reset:
+            raise RuntimeError('reset failed')
+        self.resets += 1
+
+
+def make_manager(recycled=None, **kwargs):
+    recycler = None
+    if recycled is not None:
+        recycler = lambda recognizer, key: recycled.append((recognizer, key))
+    return SessionManager(FakeRecognizer, lambda: None, recognizer_recycler=recycler, **kwargs)
+
+
+def test_session_limit_evicts_least_recently_active():
+    manager = make_manager(max_sessions=2)
+    first = manager.acquire('a', 16000)
+    manager.acquire('b', 16000)
+    manager.acquire('a', 16000)
+    manager.acquire('c', 16000)
+
+    assert manager.get('b') is None
+    assert manager.get('a') is first
+    assert not first.closed
+    assert manager.lru_evictions == 1
+    assert len(manager) == 2
+
+
+def test_evicted_session_is_closed():
+    manager = make_manager(max_sessions=1)
+    old = manager.acquire('a', 16000)
+    manager.acquire('b', 16000)
+
+    assert old.closed
+
+
+def test_idle_sessions_are_reaped_oldest_first():
+    manager = make_manager(idle_ttl=60.0)
+    stale = manager.acquire('a', 16000)
+    manager.acquire('b', 16000)
+    stale.last_active = time.monotonic() - 120
+
+    assert manager.evict_idle() == 1
+    assert stale.closed
+    assert manager.get('a') is None
+    assert manager.get('b') is not None
+    assert manager.idle_evictions == 1
+
+
+def test_reaping_stops_at_the_first_active_session():
+    manager = make_manager(idle_ttl=60.0)
+    manager.acquire('a', 16000)
+    manager.acquire('b', 16000)
+    # Only the most recent session is stale; the order is by activity, so it is not reached
+    manager.get('b').last_active = time.monotonic() - 120
+
+    assert manager.evict_idle() == 0
+
+
+def test_discard_recycles_the_recognizer():
+    recycled = []
+    manager = make_manager(recycled)
+    session = manager.acquire('a', 16000, 'small')
+    recognizer = manager.ensure_recognizer(session)
+
+    assert manager.discard('a')
+    assert session.closed
+    assert session.recognizer is None
+    assert recycled == [(recognizer, KEY)]
+    assert not manager.discard('a')
+
+
+def test_recognizer_is_rotated_at_the_endpoint_after_the_limit():
+    recycled = []
+    manager = make_manager(recycled, rotate_after_seconds=10.0)
+    session = manager.acquire('a', 16000, 'small')
+    first = manager.ensure_recognizer(session)
+
+    # Past the limit but mid-utterance: keep decoding with the same recognizer
+    manager.record_decoded(session, 16000 * 11, endpoint=False)
+    assert session.recognizer is first
+
+    manager.record_decoded(session, 1600, endpoint=True)
+    assert session.recognizer is None
+    assert recycled == [(first, KEY)]
+    assert session.rotations == 1
+    assert manager.rotations == 1
+
+    second = manager.ensure_recognizer(session)
+    assert second is not first
+    assert session.recognizer_audio_seconds == 0.0
+    assert session.audio_seconds > 11
+
+
+def test_rotation_disabled():
+    manager = make_manager(rotate_after_seconds=None)
+    session = manager.acquire('a', 16000)
+    recognizer = manager.ensure_recognizer(session)
+    manager.record_decoded(session, 16000 * 3600, endpoint=True)
+
+    assert session.recognizer is recognizer
+    assert session.utterances == 1
+
+
+def test_snapshot_counts_memory_of_sessions_with_recognizers():
+    manager = make_manager(recognizer_memory_bytes=1000)
+    manager.ensure_recognizer(manager.acquire('a', 16000))
+    manager.acquire('b', 16000)
+
+    snapshot = manager.snapshot()
+    assert snapshot['active_sessions'] == 2
+    assert snapshot['memory_estimate_bytes'] == 1000
+    assert snapshot['counters']['recognizers_assigned'] == 1
+
+
+def test_pool_hits_after_fill_and_misses_when_empty():
+    pool = RecognizerPool(FakeRecognizer, size=2, keys=[KEY])
+    pool.fill()
+
+    pool.acquire(KEY)
+    pool.acquire(KEY)
+    created = pool.acquire(KEY)
+
+    assert created.key == KEY
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['created']) == (2, 1, 3)
+    assert stats['idle'] == {'small@16000': 0}
+
+
+def test_pool_release_resets_and_respects_capacity():
+    pool = RecognizerPool(FakeRecognizer, size=1)
+    kept = FakeRecognizer(KEY)
+    extra = FakeRecognizer(KEY)
+    pool.release(kept, KEY)
+    pool.release(extra, KEY)
+
+    assert kept.resets == 1
+    assert pool.recycled == 1
+    assert pool.discarded == 1
+    assert pool.acquire(KEY) is kept
+
+
+def test_pool_drops_recognizers_that_fail_to_reset():
+    pool = RecognizerPool(FakeRecognizer, size=1)
+    pool.release(FakeRecognizer(KEY, fail_reset=True), KEY)
+
+    assert pool.discarded == 1
+    assert pool.recycled == 0
+    assert pool.acquire(KEY) is not None
+    assert pool.misses == 1
+
+
+def test_pool_discard_where_drops_idle_recognizers_of_a_model():
+    other = ('large', 16000)
+    pool = RecognizerPool(FakeRecognizer, size=2, keys=[KEY])
+    pool.fill()
+    pool.release(FakeRecognizer(other), other)
+
+    assert pool.discard_where(lambda key: key[0] == 'large') == 1
+    assert 'large@16000' not in pool.stats()['idle']
+    # Warm-up keys keep their queue so the refill thread can refill them
+    assert pool.discard_where(lambda key: key == KEY) == 2
+    assert pool.stats()['idle'] == {'small@16000': 0}
+    pool.fill()
+    assert pool.stats()['idle'] == {'small@16000': 2}
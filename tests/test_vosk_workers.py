@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import pytest
+
+from vosk_workers import DecoderWorkerPool, HashRing, WorkerError, _WorkerChannel
+
+
+def echo_handler(op, session_id, args, audio):
+    if op == 'fail':
+        raise WorkerError('bad request', 400)
+    return {'op': op, 'session': session_id, 'bytes': len(audio) if audio is not None else None,
+            'sum': sum(audio) if audio is not None else None}
+
+
+def make_channel(ring_size):
+    # Only the ring-buffer bookkeeping; no shared memory or process
+    channel = object.__new__(_WorkerChannel)
+    channel.ring_size = ring_size
+    channel._write_pos = 0
+    channel._read_pos = 0
+    return channel
+
+
+def test_ring_maps_sessions_stably():
+    ring = HashRing(range(4))
+    again = HashRing(range(4))
+
+    assert all(ring.lookup(f's{i}') == again.lookup(f's{i}') for i in range(200))
+
+
+def test_ring_spreads_sessions_over_all_nodes():
+    ring = HashRing(range(4))
+    counts = Counter(ring.lookup(f'session-{i}') for i in range(4000))
+
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 500
+
+
+def test_adding_a_node_moves_only_part_of_the_sessions():
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+    moved = sum(before.lookup(f's{i}') != after.lookup(f's{i}') for i in range(2000))
+
+    assert moved < 2000 * 0.35
+
+
+def test_reserve_allocates_consecutive_regions():
+    channel = make_channel(100)
+
+    assert channel._reserve(40) == (0, 40)
+    assert channel._reserve(40) == (40, 80)
+
+
+def test_reserve_wraps_to_the_start_when_the_tail_is_too_small():
+    channel = make_channel(100)
+    channel._reserve(40)
+    channel._reserve(40)
+    channel._read_pos = 80
+
+    # 20 bytes are left at the tail; the region skips them and starts at offset 0
+    assert channel._reserve(30) == (0, 130)
+    assert channel._write_pos == 130
+
+
+def test_reserve_returns_none_when_the_buffer_is_full():
+    channel = make_channel(100)
+    channel._reserve(60)
+
+    assert channel._reserve(50) is None
+    assert channel._write_pos == 60
+    channel._read_pos = 60
+    # Once read, the tail is skipped and the region starts over at offset 0
+    assert channel._reserve(50) == (0, 150)
+
+
+def test_wrapped_region_waits_for_the_skipped_tail_to_be_read():
+    channel = make_channel(100)
+    channel._reserve(90)
+    channel._read_pos = 40
+
+    # Wrapping skips to position 100, so offsets 0-50 are free only once position 50 is read
+    assert channel._reserve(50) is None
+    channel._read_pos = 50
+    assert channel._reserve(50) == (0, 150)
+
+
+def test_reserve_rejects_chunks_larger_than_the_buffer():
+    channel = make_channel(100)
+
+    assert channel._reserve(101) is None
+    assert channel._write_pos == 0
+
+
+class FakeChannel:
+    def __init__(self, index):
+        self.index = index
+        self.started_at = time.monotonic()
+
+    def submit(self, op, session_id, args=(), audio=None):
+        future = Future()
+        future.set_result(op)
+        return future
+
+
+def make_pool(num_workers=2, session_ttl=600.0):
+    # Routing and session bookkeeping only; _respawn is disabled
+    pool = object.__new__(DecoderWorkerPool)
+    pool._lock = threading.Lock()
+    pool._closing = False
+    pool._delays = {}
+    pool.respawn_delay = 1.0
+    pool.max_respawn_delay = 60.0
+    pool.session_ttl = session_ttl
+    pool._sessions = [{} for _ in range(num_workers)]
+    pool._lost = {}
+    pool._pruned_at = time.monotonic()
+    pool.sessions_lost = 0
+    pool.channels = [FakeChannel(index) for index in range(num_workers)]
+    pool.ring = HashRing(range(num_workers))
+    pool._respawn = lambda channel, delay: None
+    return pool
+
+
+def sessions_on(pool, index, count):
+    return [s for s in (f's{i}' for i in range(100)) if pool.ring.lookup(s) == index][:count]
+
+
+def test_sessions_of_an_exited_worker_are_reported_lost_once():
+    pool = make_pool()
+    lost, kept = sessions_on(pool, 0, 1)[0], sessions_on(pool, 1, 1)[0]
+    pool.call('decode', lost)
+    pool.call('decode', kept)
+
+    pool._worker_exited(pool.channels[0])
+
+    with pytest.raises(WorkerError) as error:
+        pool.call('decode', lost)
+    assert error.value.status == 409
+    assert error.value.session_lost
+    assert pool.sessions_lost == 1
+    # The next request starts over on the restarted worker
+    assert pool.call('decode', lost) == 'decode'
+    assert pool.call('decode', kept) == 'decode'
+
+
+def test_ending_a_lost_session_is_not_an_error():
+    pool = make_pool()
+    session = sessions_on(pool, 0, 1)[0]
+    pool.call('decode', session)
+    pool._worker_exited(pool.channels[0])
+
+    assert pool.call('release', session, ends_session=True) == 'release'
+    assert pool.call('decode', session) == 'decode'
+
+
+def test_ended_sessions_are_not_reported_lost():
+    pool = make_pool()
+    session = sessions_on(pool, 0, 1)[0]
+    pool.call('decode', session)
+    pool.call('release', session, ends_session=True)
+    pool._worker_exited(pool.channels[0])
+
+    assert pool.sessions_lost == 0
+    assert pool.call('decode', session) == 'decode'
+
+
+def test_idle_sessions_are_forgotten_after_the_ttl():
+    pool = make_pool(session_ttl=60.0)
+    session = sessions_on(pool, 0, 1)[0]
+    pool.call('decode', session)
+    pool._sessions[0][session] -= 120
+    pool._pruned_at -= 120
+
+    pool.call('decode', sessions_on(pool, 1, 1)[0])
+    pool._worker_exited(pool.channels[0])
+
+    assert pool.sessions_lost == 0
+
+
+def test_respawn_delay_backs_off_for_workers_that_exit_quickly():
+    pool = make_pool()
+    channel = pool.channels[0]
+
+    delays = []
+    for _ in range(3):
+        pool._worker_exited(channel)
+        delays.append(pool._delays[0])
+    assert delays == [1.0, 2.0, 4.0]
+
+    channel.started_at -= 120
+    pool._worker_exited(channel)
+    assert pool._delays[0] == 1.0
+
+
+def test_forked_workers_decode_through_the_ring_and_inline():
+    pool = DecoderWorkerPool(2, echo_handler, ring_bytes=1000)
+    try:
+        chunk = bytes(range(200)) * 2
+        # Repeated chunks wrap around the ring buffer
+        for _ in range(10):
+            assert pool.call('decode', 'a', audio=chunk) == {'op': 'decode', 'session': 'a', 'bytes': 400,
+                                                             'sum': sum(chunk)}
+        large = b'\x01' * 1500
+        assert pool.call('decode', 'a', audio=large)['sum'] == 1500
+        with pytest.raises(WorkerError) as error:
+            pool.call('fail', 'a')
+        assert error.value.status == 400
+
+        described = pool.describe()
+        assert sum(worker['shm_messages'] for worker in described) == 10
+        assert sum(worker['inline_messages'] for worker in described) == 1
+        assert all(worker['ring_in_use_bytes'] <= 1000 for worker in described)
+    finally:
+        pool.shutdown()
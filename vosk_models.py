@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vosk 模型注册表
+扫描模型目录发现可用模型，首次使用时加载；在内存预算内按 LRU 卸载空闲模型。
+默认模型在启动时加载且常驻（多进程模式下在 fork 之前加载，由解码进程共享）。
+"""
+
+import os
+import threading
+import time
+
+
+class ModelNotFoundError(Exception):
+    """请求的模型不存在"""
+
+
+def _directory_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class _ModelEntry:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        # 以磁盘大小估算加载后的常驻内存
+        self.size_bytes = _directory_bytes(path)
+        self.model = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+        self.loads = 0
+        self.load_seconds = None
+
+
+class ModelRegistry:
+    """按名称管理 Vosk 模型
+
+    Args:
+        models_dir: 模型目录，其中每个包含 conf/ 子目录的文件夹视为一个模型
+        loader: callable(path) -> vosk.Model
+        default_model: 默认模型名称，常驻不卸载
+        aliases: {别名: 模型名称}，如 {'fast': 'vosk-model-small-en-us-0.15'}
+        memory_budget_bytes: 已加载模型的估算内存上限，超出时卸载最久未用的空闲模型；None 不限制
+        in_use: callable(name) -> bool，返回模型是否仍被会话使用（使用中的模型不会被卸载）
+        on_unload: callable(name)，模型卸载后调用（如清理识别器池中该模型的识别器）
+    """
+
+    def __init__(self, models_dir, loader, default_model, aliases=None, memory_budget_bytes=None,
+                 in_use=None, on_unload=None):
+        self.models_dir = models_dir
+        self.loader = loader
+        self.default_model = default_model
+        self.aliases = dict(aliases or {})
+        self.memory_budget_bytes = memory_budget_bytes
+        self.in_use = in_use
+        self.on_unload = on_unload
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.unloads = 0
+        self.discover()
+
+    def discover(self):
+        """扫描模型目录，登记新出现的模型，返回模型名称列表"""
+        try:
+            names = sorted(os.listdir(self.models_dir))
+        except OSError:
+            names = []
+        with self._lock:
+            for name in names:
+                path = os.path.join(self.models_dir, name)
+                if name not in self._entries and os.path.isdir(os.path.join(path, 'conf')):
+                    self._entries[name] = _ModelEntry(name, path)
+            return list(self._entries)
+
+    def resolve(self, name=None):
+        """将名称或别名解析为已登记的模型名称；None 表示默认模型"""
+        if not name:
+            return self.default_model
+        name = self.aliases.get(name, name)
+        if name not in self._entries:
+            self.discover()
+        if name not in self._entries:
+            raise ModelNotFoundError(f'模型不存在: {name}，可选: {", ".join(self.available())}')
+        return name
+
+    def available(self):
+        with self._lock:
+            return list(self._entries) + sorted(self.aliases)
+
+    def is_loaded(self, name=None):
+        entry = self._entries.get(self.resolve(name))
+        return entry is not None and entry.model is not None
+
+    def get(self, name=None):
+        """返回已加载的模型，未加载时在调用线程中加载（同一模型只加载一次）"""
+        name = self.resolve(name)
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ModelNotFoundError(f'模型不存在: {name}')
+        entry.last_used = time.monotonic()
+        model = entry.model
+        if model is not None:
+            return model
+        with entry.lock:
+            if entry.model is None:
+                print(f"📦 加载 Vosk 模型: {entry.path}")
+                start = time.perf_counter()
+                entry.model = self.loader(entry.path)
+                entry.load_seconds = round(time.perf_counter() - start, 2)
+                entry.loads += 1
+                print(f"📦 模型 {name} 加载完成，用时 {entry.load_seconds} 秒")
+            model = entry.model
+        self.enforce_budget(keep=name)
+        return model
+
+    def _resident_bytes(self):
+        return sum(e.size_bytes for e in self._entries.values() if e.model is not None)
+
+    def enforce_budget(self, keep=None):
+        """卸载最久未用的空闲模型，直到估算内存不超过预算；返回卸载的模型名称"""
+        if not self.memory_budget_bytes:
+            return []
+        unloaded = []
+        with self._lock:
+            candidates = sorted(
+                (e for e in self._entries.values()
+                 if e.model is not None and e.name not in (keep, self.default_model)),
+                key=lambda e: e.last_used,
+            )
+        for entry in candidates:
+            if self._resident_bytes() <= self.memory_budget_bytes:
+                break
+            if self.in_use is not None and self.in_use(entry.name):
+                continue
+            with entry.lock:
+                entry.model = None
+            self.unloads += 1
+            unloaded.append(entry.name)
+            print(f"♻️ 模型内存超过预算，卸载最久未用的模型: {entry.name}")
+            if self.on_unload is not None:
+                self.on_unload(entry.name)
+        return unloaded
+
+    def describe(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            'default': self.default_model,
+            'aliases': self.aliases,
+            'memory_budget_bytes': self.memory_budget_bytes,
+            'resident_bytes': self._resident_bytes(),
+            'unloads': self.unloads,
+            'models': [
+                {
+                    'name': e.name,
+                    'loaded': e.model is not None,
+                    'size_bytes': e.size_bytes,
+                    'loads': e.loads,
+                    'load_seconds': e.load_seconds,
+                    'idle_seconds': round(now - e.last_used, 1) if e.last_used else None,
+                }
+                for e in entries
+            ],
+        }
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vosk 两遍识别：后台用大模型重新解码
+实时解码时把会话的 PCM 写入有界的内存缓冲（AudioSpool），话段结束后将整段音频
+提交给后台重打分队列，用更准确的模型重新解码；结果按会话保存，供结果接口查询。
+
+后台线程以较低的调度优先级（nice）运行，任务按优先级出队（用户主动结束的话段优先），
+未开始或正在解码的任务都可以取消，实时解码的延迟不受影响。
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# 任务优先级：数值越小越先执行
+PRIORITY_FLUSH = 0      # 客户端主动结束话段，通常马上要提交分析
+PRIORITY_ENDPOINT = 1   # 会话中途的端点
+
+
+class AudioSpool:
+    """一个话段的 int16 PCM 缓冲，超过 max_bytes 后不再追加并标记为截断"""
+
+    def __init__(self, sample_rate, max_bytes):
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self.truncated = False
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def append(self, audio_bytes):
+        room = self.max_bytes - len(self._buffer)
+        if room <= 0:
+            self.truncated = True
+            return
+        if len(audio_bytes) > room:
+            audio_bytes = audio_bytes[:room]
+            self.truncated = True
+        self._buffer += audio_bytes
+
+    def take(self):
+        """取出已缓冲的音频并清空，开始下一个话段"""
+        pcm = bytes(self._buffer)
+        truncated = self.truncated
+        self._buffer = bytearray()
+        self.truncated = False
+        return pcm, truncated
+
+
+class RescoreJob:
+    def __init__(self, job_id, session_id, pcm, sample_rate, live_text, priority, truncated):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.live_text = live_text
+        self.priority = priority
+        self.truncated = truncated
+        self.audio_seconds = round(len(pcm) / 2 / sample_rate, 2)
+        self.status = 'pending'
+        self.text = None
+        self.words = None
+        self.error = None
+        self.cancelled = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def describe(self):
+        return {
+            'id': self.job_id,
+            'status': self.status,
+            'live_text': self.live_text,
+            'text': self.text,
+            'words': self.words,
+            'error': self.error,
+            'audio_seconds': self.audio_seconds,
+            'truncated': self.truncated,
+            'queue_seconds': round(self.started_at - self.submitted_at, 3) if self.started_at else None,
+            'decode_seconds': round(self.finished_at - self.started_at, 3)
+            if self.started_at and self.finished_at else None,
+        }
+
+
+class RescoringQueue:
+    """后台重打分任务队列
+
+    Args:
+        decoder: callable(pcm, sample_rate, cancelled) -> {'text', 'words'}，取消时返回 None
+        workers: 后台解码线程数
+        nice: 后台线程的 nice 值（Linux 下按线程生效），使实时解码优先获得 CPU
+        max_pending: 排队任务上限，超过时丢弃最低优先级、最新的任务
+        max_sessions: 保留结果的会话数上限（LRU；仍有未完成任务的会话不会被丢弃，可暂时超出）
+        result_ttl: 会话结果保留的秒数
+    """
+
+    def __init__(self, decoder, workers=1, nice=10, max_pending=64, max_sessions=1000, result_ttl=600.0):
+        self.decoder = decoder
+        self.workers = workers
+        self.nice = nice
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.result_ttl = result_ttl
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._results = OrderedDict()  # session_id -> [RescoreJob]
+        self._threads = []
+
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """启动后台解码线程（重复调用无副作用）"""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'vosk-rescore-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, session_id, pcm, sample_rate, live_text, priority=PRIORITY_ENDPOINT, truncated=False):
+        """提交一个话段，返回任务ID"""
+        with self._cond:
+            jobs = self._results.get(session_id)
+            if jobs is None:
+                jobs = self._results[session_id] = []
+            else:
+                self._results.move_to_end(session_id)
+            job = RescoreJob(f'{session_id}:{len(jobs)}', session_id, pcm, sample_rate, live_text, priority,
+                             truncated)
+            jobs.append(job)
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self.submitted += 1
+            if len(self._heap) > self.max_pending:
+                # 丢弃优先级最低、最晚提交的任务
+                victim = max(self._heap)
+                self._heap.remove(victim)
+                heapq.heapify(self._heap)
+                self._finish(victim[2], 'cancelled', error='重打分队列已满')
+                self.dropped += 1
+            self._expire()
+            self._cond.notify()
+        return job.job_id
+
+    def cancel(self, session_id):
+        """取消会话所有未完成的任务（正在解码的任务在下一个音频块前停止），返回取消数量"""
+        count = 0
+        with self._cond:
+            for job in self._results.get(session_id, ()):
+                if not job.done and not job.cancelled:
+                    job.cancelled = True
+                    count += 1
+                    if job.status == 'pending':
+                        self._finish(job, 'cancelled')
+            if count:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+            self._cond.notify_all()
+        return count
+
+    def results(self, session_id, wait=0.0):
+        """返回会话的重打分结果；wait > 0 时最多等待该秒数直到所有任务完成。会话不存在时返回 None"""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                jobs = self._results.get(session_id)
+                if jobs is None:
+                    return None
+                complete = all(job.done for job in jobs)
+                remaining = deadline - time.monotonic()
+                if complete or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            texts = [job.text if job.status == 'done' else job.live_text for job in jobs]
+            return {
+                'session_id': session_id,
+                'complete': complete,
+                'text': ' '.join(t for t in texts if t),
+                'utterances': [job.describe() for job in jobs],
+            }
+
+    def _finish(self, job, status, error=None):
+        """需持有 _cond"""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        # 结束的任务不再需要音频
+        job.pcm = None
+        if status == 'cancelled':
+            self.cancelled += 1
+        self._cond.notify_all()
+
+    def _expire(self):
+        """丢弃过期或超出数量上限的会话结果；仍有未完成任务的会话保留，以免结果丢失。需持有 _cond"""
+        deadline = time.time() - self.result_ttl
+        # 会话按最近提交排序，遇到既未过期、数量也未超限的会话即可停止
+        for session_id, jobs in list(self._results.items()):
+            if len(self._results) <= self.max_sessions and jobs[-1].submitted_at >= deadline:
+                break
+            if all(job.done for job in jobs):
+                del self._results[session_id]
+
+    def _run(self):
+        if self.nice:
+            try:
+                # Linux 下 setpriority 作用于单个线程
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+            except (AttributeError, OSError):
+                pass
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled:
+                    continue
+                job.status = 'running'
+                job.started_at = time.time()
+            try:
+                result = self.decoder(job.pcm, job.sample_rate, lambda: job.cancelled)
+            except Exception as e:
+                with self._cond:
+                    self.failed += 1
+                    self._finish(job, 'failed', error=str(e))
+                print(f"❌ 重打分失败 {job.job_id}: {e}")
+                continue
+            with self._cond:
+                if result is None or job.cancelled:
+                    self._finish(job, 'cancelled')
+                else:
+                    job.text = result['text']
+                    job.words = result['words']
+                    self.completed += 1
+                    self._finish(job, 'done')
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'pending': len(self._heap),
+                'sessions': len(self._results),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
@@ -5,35 +5,134 @@ Vosk 语音识别服务
 提供 HTTP API 接口供前端调用
 """
 
+import argparse
+import io
 import json
+import logging
 import os
-import wave
-import tempfile
-from flask import Flask, request, jsonify
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, Request, Response, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import vosk
-import numpy as np
-import threading
+import uuid
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+
+from service_startup import StartupTracker
+from service_metrics import (
+    RTF_BUCKETS, MetricsRegistry, configure_logging, log_event, merge_snapshots, render_prometheus, summarize,
+)
+from audio_preprocessing import AudioPreprocessor, BYTES_PER_SAMPLE, VoiceActivityDetector
+from vosk_models import ModelNotFoundError, ModelRegistry
+from vosk_rescoring import PRIORITY_ENDPOINT, PRIORITY_FLUSH, AudioSpool, RescoringQueue
+from vosk_sessions import RecognizerPool, SessionManager
+from vosk_standby import StandbySupervisor
+from vosk_transcription import TranscriptionError, decode_segment, read_wav, transcribe
+from vosk_workers import DecoderWorkerPool, WorkerError
+
+class InMemoryRequest(Request):
+    """上传文件始终保存在内存中（默认超过 500KB 会写入临时文件）"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 CORS(app)  # 允许跨域请求
+sock = Sock(app)  # WebSocket 流式识别
+
+# 结构化日志（LOG_LEVEL / LOG_FORMAT）与指标；逐块事件为 DEBUG 级别，关闭时不产生开销
+logger = configure_logging('vosk_service')
+metrics = MetricsRegistry('vosk_')
+# 启动进度：先监听端口，模型在后台加载；/livez 与 /readyz 分别报告存活与就绪
+startup = StartupTracker('vosk_service')
 
 # 全局变量
 model = None
-rec = None
-recognizers = {}
-# 为每个会话提供互斥锁，避免并发请求对同一识别器造成竞态
-session_locks = {}
-# 标记会话是否已结束（flush），用于忽略迟到的音频块
-session_closed = set()
-request_count = 0  # 请求计数器，用于定期重置识别器
+# 多进程模式下的解码进程池（--workers N），单进程模式为 None
+decoder_workers = None
+
+# 模型配置：模型目录、默认模型（启动时加载并常驻）、模型别名、已加载模型的估算内存预算（MB，0 不限制）
+MODELS_DIR = os.getenv('VOSK_MODELS_DIR', './public/models')
+DEFAULT_MODEL = os.getenv('VOSK_MODEL', 'vosk-model-small-en-us-0.15')
+MODEL_ALIASES = dict(
+    pair.split('=', 1) for pair in os.getenv(
+        'VOSK_MODEL_ALIASES', 'fast=vosk-model-small-en-us-0.15,accurate=vosk-model-en-us-0.22-lgraph 2'
+    ).split(',') if '=' in pair
+)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv('VOSK_MODEL_MEMORY_MB', '4096'))
+MODEL_PATH = os.path.join(MODELS_DIR, DEFAULT_MODEL)
+
+# 流式识别支持的音频线路格式：小端 int16 PCM、小端 Float32、8 位 μ-law
+SUPPORTED_AUDIO_FORMATS = ('s16le', 'f32le', 'mulaw')
+DEFAULT_AUDIO_FORMAT = 'f32le'  # 兼容旧客户端
+DEFAULT_SAMPLE_RATE = 16000
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+# 音频预处理配置：去爆音阈值（int16 刻度，0 关闭）、去直流偏置、增益归一化目标 RMS（0 关闭）
+PREPROCESS_DECLICK_THRESHOLD = int(os.getenv('VOSK_DECLICK_THRESHOLD', '20000')) or None
+PREPROCESS_REMOVE_DC = os.getenv('VOSK_REMOVE_DC', '0').lower() in ('1', 'true', 'yes')
+PREPROCESS_TARGET_RMS = float(os.getenv('VOSK_TARGET_RMS', '0')) or None
+
+# 语音活动检测配置：开关、语音帧最低 RMS（int16 刻度）、语音前后保留的静音（毫秒）、
+# 尾部静音达到该时长后自动输出 final（毫秒，0 关闭）
+VAD_ENABLED = os.getenv('VOSK_VAD', '1').lower() in ('1', 'true', 'yes')
+VAD_ENERGY_THRESHOLD = float(os.getenv('VOSK_VAD_THRESHOLD', '200'))
+VAD_PADDING_MS = int(os.getenv('VOSK_VAD_PADDING_MS', '300'))
+VAD_ENDPOINT_MS = int(os.getenv('VOSK_VAD_ENDPOINT_MS', '1000'))
+
+# 会话管理配置：并发会话上限、空闲回收时间、识别器轮换时长（秒，0 关闭）、单个识别器估算内存
+MAX_SESSIONS = int(os.getenv('VOSK_MAX_SESSIONS', '100'))
+SESSION_IDLE_TTL = float(os.getenv('VOSK_SESSION_IDLE_TTL', '120'))
+ROTATE_AFTER_SECONDS = float(os.getenv('VOSK_ROTATE_AFTER_SECONDS', '600')) or None
+RECOGNIZER_MEMORY_MB = float(os.getenv('VOSK_RECOGNIZER_MEMORY_MB', '30'))
+
+# 识别器池配置：每个采样率预热的识别器数量（0 关闭）与预热的采样率（麦克风 16kHz、Gemini 音频 24kHz）
+RECOGNIZER_POOL_SIZE = int(os.getenv('VOSK_POOL_SIZE', '4'))
+RECOGNIZER_POOL_SAMPLE_RATES = [
+    int(rate) for rate in os.getenv('VOSK_POOL_SAMPLE_RATES', '16000,24000').split(',') if rate.strip()
+]
+
+# 整段识别配置：并行解码的线程数、片段时长范围（秒，切点取该范围内最安静的位置）
+TRANSCRIBE_THREADS = int(os.getenv('VOSK_TRANSCRIBE_THREADS', str(os.cpu_count() or 4)))
+TRANSCRIBE_MIN_SEGMENT_SECONDS = float(os.getenv('VOSK_TRANSCRIBE_MIN_SEGMENT', '10'))
+TRANSCRIBE_MAX_SEGMENT_SECONDS = float(os.getenv('VOSK_TRANSCRIBE_MAX_SEGMENT', '30'))
+
+# 请求体上限（MB）：上传与音频块都整体缓存在内存中，超过时返回 413
+MAX_UPLOAD_MB = float(os.getenv('VOSK_MAX_UPLOAD_MB', '100'))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+# 两遍识别配置：开关、重打分模型（名称或别名）、后台解码线程数与 nice 值、
+# 单个话段缓冲的最长秒数、重打分结果保留的秒数。
+# 默认关闭：开启后会加载大模型并缓冲、重新解码每个话段，CPU 与内存开销约翻倍
+RESCORE_ENABLED = os.getenv('VOSK_RESCORE', '0').lower() in ('1', 'true', 'yes')
+RESCORE_MODEL = os.getenv('VOSK_RESCORE_MODEL', 'accurate')
+RESCORE_WORKERS = int(os.getenv('VOSK_RESCORE_WORKERS', '1'))
+RESCORE_NICE = int(os.getenv('VOSK_RESCORE_NICE', '10'))
+RESCORE_MAX_SECONDS = float(os.getenv('VOSK_RESCORE_MAX_SECONDS', '300'))
+RESCORE_RESULT_TTL = float(os.getenv('VOSK_RESCORE_RESULT_TTL', '600'))
+
+# 大块音频按该长度（毫秒）分帧依次送入识别器；单个音频块的最长秒数（超过返回 413）
+STREAM_FRAME_MS = int(os.getenv('VOSK_STREAM_FRAME_MS', '200'))
+STREAM_MAX_CHUNK_SECONDS = float(os.getenv('VOSK_STREAM_MAX_CHUNK_SECONDS', '60'))
 
-# 模型路径
-MODEL_PATH = "./public/models/vosk-model-small-en-us-0.15"
+# partial 结果的最短计算间隔（毫秒，0 表示每块都计算）；间隔内的音频块照常解码，但不调用 PartialResult
+PARTIAL_MIN_INTERVAL = float(os.getenv('VOSK_PARTIAL_INTERVAL_MS', '100')) / 1000
+# partial 响应模式：full 每次返回完整文本；delta 未变化时只返回 unchanged，在上次结果后追加时只返回 append
+PARTIAL_MODES = ('full', 'delta')
+
+# ASGI 模式下执行 AcceptWaveform 的线程数上限
+DECODE_THREADS = int(os.getenv('VOSK_DECODE_THREADS', str(os.cpu_count() or 4)))
 
 def init_vosk_model():
     """初始化 Vosk 模型"""
-    global model, rec
+    global model
     
     if not os.path.exists(MODEL_PATH):
         print(f"错误: 模型路径不存在: {MODEL_PATH}")
@@ -42,323 +141,1094 @@ def init_vosk_model():
     
     try:
         print(f"正在加载 Vosk 模型: {MODEL_PATH}")
-        model = vosk.Model(MODEL_PATH)
-        rec = vosk.KaldiRecognizer(model, 16000)  # 16kHz 采样率
+        model = models.get(DEFAULT_MODEL)
         print("Vosk 模型加载成功")
         return True
     except Exception as e:
         print(f"加载 Vosk 模型失败: {e}")
         return False
 
+def health_payload():
+    """健康检查内容：只读本进程状态，不与解码进程通信（各解码进程已加载的模型见 /admin/sessions）"""
+    return {
+        'status': 'ok',
+        'model_loaded': model is not None,
+        'ready': startup.ready,
+        'startup': startup.describe(),
+        'decoder_workers': len(decoder_workers) if decoder_workers is not None else 0,
+        'recognizer_pool': recognizer_pool.stats() if decoder_workers is None else None,
+        'models': models.describe() if decoder_workers is None else {
+            'default': models.default_model,
+            'available': models.available(),
+        }
+    }
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
-    return jsonify({
-        'status': 'ok',
-        'model_loaded': model is not None
-    })
+    return jsonify(health_payload())
+
+def liveness_payload():
+    """存活状态：进程能响应即存活；模型加载失败后返回 503，交由外部重启"""
+    return {
+        'alive': not startup.failed,
+        'pid': os.getpid(),
+        'uptime_seconds': startup.describe()['uptime_seconds'],
+    }, 503 if startup.failed else 200
+
+@app.route('/livez', methods=['GET'])
+def liveness_check():
+    """存活检查：服务绑定端口后立即可用，不等待模型加载"""
+    payload, status = liveness_payload()
+    return jsonify(payload), status
+
+@app.route('/readyz', methods=['GET'])
+def readiness_check():
+    """就绪检查：模型与识别器池就绪前返回 503，附带各启动步骤的进度与耗时"""
+    payload, status = startup.probe()
+    return jsonify(payload), status
+
+def upload_too_large():
+    return {'error': f'请求体过大，上限 {MAX_UPLOAD_MB:g} MB', 'success': False}, 413
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_entity_too_large(e):
+    """Flask 按 MAX_CONTENT_LENGTH 拒绝的请求：返回与其他错误一致的 JSON"""
+    payload, status = upload_too_large()
+    return jsonify(payload), status
+
+def model_unavailable():
+    """模型不可用时的错误响应：加载中返回 503 并附带加载进度，加载失败返回 500"""
+    if startup.failed:
+        return {'error': 'Vosk 模型未初始化', 'success': False, 'startup': startup.describe()}, 500
+    return {'error': 'Vosk 模型加载中，请稍后重试', 'success': False, 'startup': startup.describe()}, 503
+
+_transcribe_executor = None
+_transcribe_executor_lock = threading.Lock()
+
+def get_transcribe_executor():
+    """整段识别的解码线程池，首次使用时创建（多进程模式下只存在于前端进程）"""
+    global _transcribe_executor
+    with _transcribe_executor_lock:
+        if _transcribe_executor is None:
+            _transcribe_executor = ThreadPoolExecutor(
+                max_workers=TRANSCRIBE_THREADS, thread_name_prefix='vosk-transcribe'
+            )
+        return _transcribe_executor
+
+def create_word_recognizer(sample_rate, model_name=None):
+    """整段识别使用的识别器：每个片段独立创建，输出词级时间戳"""
+    recognizer = vosk.KaldiRecognizer(models.get(model_name), sample_rate)
+    recognizer.SetWords(True)
+    return recognizer
+
+def metrics_snapshot():
+    """本进程的指标；多进程模式下合并所有解码进程的指标"""
+    snapshot = metrics.snapshot()
+    if decoder_workers is not None:
+        snapshot = merge_snapshots([snapshot] + decoder_workers.broadcast('metrics'))
+    return snapshot
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 文本格式指标；?format=json 返回分位数摘要"""
+    snapshot = metrics_snapshot()
+    if request.args.get('format') == 'json':
+        return jsonify(summarize(snapshot))
+    return Response(render_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
 
 @app.route('/recognize', methods=['POST'])
 def recognize_audio():
-    """语音识别接口"""
-    global rec
-    
-    if not model or not rec:
-        return jsonify({
-            'error': 'Vosk 模型未初始化',
-            'success': False
-        }), 500
-    
+    """整段语音识别接口
+
+    接受 multipart 字段 audio 或请求体中的 WAV 数据（16 位，单/多声道，8-48kHz），
+    在内存中解析后于静音处切分，各片段并行解码，返回拼接文本与词级时间戳。
+    """
+    if not model:
+        payload, status = model_unavailable()
+        return jsonify(payload), status
+
     try:
-        # 获取音频数据
-        if 'audio' not in request.files:
+        # 获取音频数据（上传文件已由 InMemoryRequest 保存在内存中）
+        if 'audio' in request.files:
+            source = request.files['audio'].stream
+        elif request.mimetype in ('audio/wav', 'audio/x-wav', 'audio/wave'):
+            source = request.get_data()
+        else:
             return jsonify({
                 'error': '未找到音频文件',
                 'success': False
             }), 400
-        
-        audio_file = request.files['audio']
-        
-        # 保存临时文件
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            audio_file.save(tmp_file.name)
-            
-            # 读取 WAV 文件
-            with wave.open(tmp_file.name, 'rb') as wf:
-                # 检查音频格式
-                if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
-                    return jsonify({
-                        'error': f'音频格式不支持。需要: 单声道, 16位, 16kHz。当前: {wf.getnchannels()}声道, {wf.getsampwidth()*8}位, {wf.getframerate()}Hz',
-                        'success': False
-                    }), 400
-                
-                # 读取音频数据
-                audio_data = wf.readframes(wf.getnframes())
-        
-        # 删除临时文件
-        os.unlink(tmp_file.name)
-        
-        # 进行语音识别
-        if rec.AcceptWaveform(audio_data):
-            result = json.loads(rec.Result())
-            return jsonify({
-                'text': result.get('text', ''),
-                'confidence': result.get('confidence', 0),
-                'success': True,
-                'type': 'final'
-            })
-        else:
-            partial = json.loads(rec.PartialResult())
-            return jsonify({
-                'text': partial.get('partial', ''),
-                'success': True,
-                'type': 'partial'
-            })
-            
+
+        try:
+            model_name = models.resolve(request.form.get('model') or request.args.get('model'))
+        except ModelNotFoundError as e:
+            raise TranscriptionError(str(e), 400)
+        samples, sample_rate = read_wav(source, MIN_SAMPLE_RATE, MAX_SAMPLE_RATE)
+        start = time.perf_counter()
+        result = transcribe(
+            samples,
+            sample_rate,
+            lambda rate: create_word_recognizer(rate, model_name),
+            get_transcribe_executor(),
+            min_segment_seconds=TRANSCRIBE_MIN_SEGMENT_SECONDS,
+            max_segment_seconds=TRANSCRIBE_MAX_SEGMENT_SECONDS,
+        )
+        elapsed = time.perf_counter() - start
+        metrics.observe('transcribe_seconds', elapsed)
+        if result['duration']:
+            metrics.observe('transcribe_rtf', elapsed / result['duration'])
+        metrics.inc('requests_total', endpoint='recognize', status=200)
+        log_event(logger, logging.INFO, 'transcribed', audio_seconds=result['duration'],
+                  segments=len(result['segments']), elapsed=round(elapsed, 3))
+        result.update({'success': True, 'type': 'final', 'model': model_name})
+        return jsonify(result)
+
+    except TranscriptionError as e:
+        metrics.inc('requests_total', endpoint='recognize', status=e.status)
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), e.status
     except Exception as e:
-        print(f"语音识别错误: {e}")
+        metrics.inc('requests_total', endpoint='recognize', status=500)
+        logger.exception('transcribe_failed')
         return jsonify({
             'error': str(e),
             'success': False
         }), 500
 
-@app.route('/recognize_stream', methods=['POST'])
-def recognize_audio_stream():
-    """流式语音识别接口"""
-    global model
-    
+class StreamRequestError(Exception):
+    """流式识别请求错误，携带返回给客户端的 HTTP 状态码；session_lost 表示服务端会话状态已丢失"""
+
+    def __init__(self, message, status=400, session_lost=False):
+        super().__init__(message)
+        self.status = status
+        self.session_lost = session_lost
+
+def stream_error_payload(error):
+    """流式识别错误的响应内容；会话丢失时带 session_lost，客户端据此重新开始当前话段"""
+    payload = {
+        'error': str(error),
+        'success': False
+    }
+    if error.session_lost:
+        payload['session_lost'] = True
+    return payload
+
+def release_stream_session(session_id):
+    """丢弃会话的识别器（不计算最终结果），用于连接断开等场景；返回会话是否存在"""
+    return sessions.discard(session_id)
+
+def finalize_stream_session(session_id):
+    """结束会话的当前话段：返回 FinalResult 并清理该会话的识别器"""
+    session = sessions.pop(session_id)
+    if session is None:
+        # 没有可用的会话，返回空的final，避免阻塞前端流程
+        return {
+            'text': '',
+            'success': True,
+            'type': 'final'
+        }
+    # 等待进行中的音频块解码完成，再标记会话已关闭，忽略迟到的音频块
+    with session.lock:
+        session.closed = True
+        rec_session = session.recognizer
+        if rec_session is None:
+            return {
+                'text': '',
+                'success': True,
+                'type': 'final'
+            }
+        with metrics.timer('decode_seconds', stage='final'):
+            result_str = rec_session.FinalResult()
+        # 识别器重置后放回识别器池，供下一个话段复用
+        sessions.recycle_recognizer(session)
+        with metrics.timer('json_seconds', stage='parse'):
+            result = json.loads(result_str) if result_str else {}
+        log_event(logger, logging.INFO, 'final', session=session_id, text=result.get('text', ''), reason='flush')
+        payload = {
+            'text': result.get('text', ''),
+            'confidence': result.get('confidence', 0),
+            'success': True,
+            'type': 'final'
+        }
+        rescore_id = submit_rescore(session, payload['text'], PRIORITY_FLUSH)
+        if rescore_id is not None:
+            payload['rescore_id'] = rescore_id
+        return payload
+
+def resolve_model(model_name=None):
+    """将客户端选择的模型名称或别名解析为已登记的模型，缺省为默认模型"""
+    try:
+        return models.resolve(model_name)
+    except ModelNotFoundError as e:
+        raise StreamRequestError(str(e))
+
+def parse_stream_format(audio_format=None, sample_rate=None):
+    """校验客户端协商的音频格式与采样率，缺省时沿用 Float32 / 16kHz"""
+    audio_format = (audio_format or DEFAULT_AUDIO_FORMAT).lower()
+    if audio_format not in SUPPORTED_AUDIO_FORMATS:
+        raise StreamRequestError(
+            f'不支持的音频格式: {audio_format}，可选: {", ".join(SUPPORTED_AUDIO_FORMATS)}', 415)
+    try:
+        sample_rate = int(sample_rate or DEFAULT_SAMPLE_RATE)
+    except (TypeError, ValueError):
+        raise StreamRequestError(f'采样率无效: {sample_rate}')
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise StreamRequestError(f'采样率超出范围: {sample_rate}，应在 {MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE}Hz 之间')
+    return audio_format, sample_rate
+
+def prepare_stream_audio(audio_data, audio_format=DEFAULT_AUDIO_FORMAT, sample_rate=DEFAULT_SAMPLE_RATE):
+    """校验客户端发送的音频块长度，返回待预处理的原始字节
+
+    返回 None 表示音频过短（<20ms）、应直接返回空的 partial；数据无效或超过
+    STREAM_MAX_CHUNK_SECONDS 时抛出 StreamRequestError。格式转换与清理由会话的 AudioPreprocessor 完成，
+    长音频由 decode_stream_chunk 分帧解码。
+    """
+    log_event(logger, logging.DEBUG, 'chunk_received', bytes=len(audio_data), format=audio_format,
+              sample_rate=sample_rate)
+    if len(audio_data) == 0:
+        log_event(logger, logging.WARNING, 'chunk_empty')
+        raise StreamRequestError('音频数据为空')
+
+    sample_width = BYTES_PER_SAMPLE[audio_format]
+    if len(audio_data) % sample_width != 0:
+        log_event(logger, logging.WARNING, 'chunk_misaligned', bytes=len(audio_data), sample_width=sample_width)
+        raise StreamRequestError(f'音频数据长度无效: {len(audio_data)} bytes，应为{sample_width}的倍数')
+
+    samples_count = len(audio_data) // sample_width
+    if samples_count < sample_rate // 50:  # <20ms
+        log_event(logger, logging.DEBUG, 'chunk_too_short', samples=samples_count)
+        return None
+    if samples_count > sample_rate * STREAM_MAX_CHUNK_SECONDS:
+        log_event(logger, logging.WARNING, 'chunk_too_long', samples=samples_count, sample_rate=sample_rate)
+        raise StreamRequestError(
+            f'音频块过长: {samples_count / sample_rate:.1f} 秒，上限 {STREAM_MAX_CHUNK_SECONDS:g} 秒', 413)
+    return audio_data
+
+def create_preprocessor():
+    """按服务配置为会话创建预处理阶段"""
+    return AudioPreprocessor(
+        declick_threshold=PREPROCESS_DECLICK_THRESHOLD,
+        remove_dc=PREPROCESS_REMOVE_DC,
+        target_rms=PREPROCESS_TARGET_RMS,
+    )
+
+def create_vad(sample_rate):
+    """按服务配置为会话创建语音活动检测器"""
+    return VoiceActivityDetector(
+        sample_rate,
+        energy_threshold=VAD_ENERGY_THRESHOLD,
+        padding_ms=VAD_PADDING_MS,
+        endpoint_ms=VAD_ENDPOINT_MS,
+    )
+
+def create_recognizer(key):
+    """按会话选择的模型与客户端采样率创建会话识别器，模型在首次使用时加载"""
+    model_name, sample_rate = key
+    return vosk.KaldiRecognizer(models.get(model_name), sample_rate)
+
+recognizer_pool = RecognizerPool(
+    create_recognizer,
+    size=RECOGNIZER_POOL_SIZE,
+    keys=[(DEFAULT_MODEL, rate) for rate in RECOGNIZER_POOL_SAMPLE_RATES],
+)
+
+sessions = SessionManager(
+    recognizer_pool.acquire,
+    create_preprocessor,
+    recognizer_recycler=recognizer_pool.release,
+    vad_factory=create_vad if VAD_ENABLED else None,
+    max_sessions=MAX_SESSIONS,
+    idle_ttl=SESSION_IDLE_TTL,
+    rotate_after_seconds=ROTATE_AFTER_SECONDS,
+    recognizer_memory_bytes=int(RECOGNIZER_MEMORY_MB * 1024 * 1024),
+)
+
+models = ModelRegistry(
+    MODELS_DIR,
+    vosk.Model,
+    DEFAULT_MODEL,
+    aliases=MODEL_ALIASES,
+    memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024) or None,
+    in_use=sessions.uses_model,
+    # 卸载模型时丢弃池中该模型的空闲识别器（识别器持有模型引用）
+    on_unload=lambda name: recognizer_pool.discard_where(lambda key: key[0] == name),
+)
+
+try:
+    RESCORE_MODEL_NAME = models.resolve(RESCORE_MODEL) if RESCORE_ENABLED else None
+except ModelNotFoundError as e:
+    print(f"⚠️ 两遍识别已关闭: {e}")
+    RESCORE_MODEL_NAME = None
+else:
+    if RESCORE_MODEL_NAME:
+        print(f"🔁 两遍识别已开启，重打分模型: {RESCORE_MODEL_NAME}")
+    else:
+        print("🔁 两遍识别未开启（设置 VOSK_RESCORE=1 开启）")
+
+def rescore_decode(pcm, sample_rate, cancelled):
+    """后台重打分：用重打分模型重新解码整个话段，取消时返回 None"""
+    recognizer = create_word_recognizer(sample_rate, RESCORE_MODEL_NAME)
+    utterances = decode_segment(recognizer, pcm, 0.0, cancelled=cancelled)
+    if utterances is None:
+        return None
+    return {
+        'text': ' '.join(u['text'] for u in utterances if u['text']),
+        'words': [word for u in utterances for word in u['words']],
+    }
+
+rescorer = RescoringQueue(
+    rescore_decode,
+    workers=RESCORE_WORKERS,
+    nice=RESCORE_NICE,
+    result_ttl=RESCORE_RESULT_TTL,
+)
+
+def submit_rescore(session, live_text, priority):
+    """将会话缓冲的话段音频提交后台重打分，返回任务ID（未缓冲音频时为 None）；需在 session.lock 内调用"""
+    if session.spool is None or not len(session.spool):
+        return None
+    pcm, truncated = session.spool.take()
+    job_id = rescorer.submit(session.session_id, pcm, session.sample_rate, live_text, priority, truncated)
+    metrics.inc('rescore_jobs_total', reason='flush' if priority == PRIORITY_FLUSH else 'endpoint')
+    return job_id
+
+metrics.counter('requests_total', '识别请求数（按接口与状态码）')
+metrics.histogram('preprocess_seconds', '音频块格式转换与预处理耗时')
+metrics.histogram('decode_seconds', 'Kaldi 解码耗时（AcceptWaveform 与取结果）')
+metrics.histogram('json_seconds', '结果 JSON 解析与序列化耗时')
+metrics.histogram('decoder_rtf', '流式解码实时率（解码耗时 / 音频时长）', buckets=RTF_BUCKETS)
+metrics.histogram('transcribe_seconds', '整段识别耗时')
+metrics.histogram('transcribe_rtf', '整段识别实时率', buckets=RTF_BUCKETS)
+metrics.counter('rescore_jobs_total', '提交后台重打分的话段数')
+metrics.counter('partials_total', 'partial 结果数（按结果：changed、unchanged、throttled、skipped）')
+metrics.gauge('rescore_pending', '排队中的重打分任务数', lambda: rescorer.stats()['pending'])
+metrics.gauge('active_sessions', '活跃流式会话数', lambda: len(sessions))
+metrics.gauge('recognizers_created', '已创建的识别器数量', lambda: recognizer_pool.created)
+metrics.gauge('recognizers_assigned', '分配给会话的识别器次数', lambda: sessions.recognizers_assigned)
+metrics.gauge('recognizer_pool_hits', '识别器池命中次数', lambda: recognizer_pool.hits)
+metrics.gauge('recognizer_pool_misses', '识别器池未命中次数', lambda: recognizer_pool.misses)
+
+def parse_partial_mode(value=None):
+    mode = (value or 'full').lower()
+    if mode not in PARTIAL_MODES:
+        raise StreamRequestError(f'不支持的 partial 模式: {value}，可选: {", ".join(PARTIAL_MODES)}')
+    return mode
+
+def partial_payload(session, text, changed, partial_mode):
+    """构造 partial 响应：full 模式返回完整文本；delta 模式未变化时只返回 unchanged，
+    新结果以上次结果开头时只返回追加的部分（append），否则返回完整文本"""
+    if not changed:
+        if partial_mode == 'delta':
+            return {'success': True, 'type': 'partial', 'unchanged': True}
+        return {'text': text, 'success': True, 'type': 'partial', 'unchanged': True}
+    previous = session.last_partial
+    session.last_partial = text
+    if partial_mode == 'delta' and previous and text.startswith(previous):
+        return {'append': text[len(previous):], 'success': True, 'type': 'partial'}
+    return {'text': text, 'success': True, 'type': 'partial'}
+
+def decode_stream_chunk(session_id, audio_data, audio_format=DEFAULT_AUDIO_FORMAT, sample_rate=DEFAULT_SAMPLE_RATE,
+                        model_name=None, partial_mode='full'):
+    """将一段音频经会话预处理后送入会话识别器，返回 partial 或 final 结果
+
+    识别器在会话的第一个音频块时按会话选择的模型与客户端采样率创建，Kaldi 特征前端负责适配模型采样率。
+    启用语音活动检测时，长时间静音不送入解码器（直接返回上一次的部分结果），
+    语音之后的尾部静音达到阈值时自动输出 final（带 'endpoint': 'vad'）。
+    partial 结果最多每 PARTIAL_MIN_INTERVAL 秒计算一次，与上次相同时不解析 JSON，
+    响应带 'unchanged': True（delta 模式下不再重复文本）。
+
+    超过 STREAM_FRAME_MS 的音频块按帧依次解码，不丢弃音频。块内产生一个 final 时返回该 final，
+    产生多个时合并文本并在 'segments' 中给出逐段结果；最后一个 final 之后还有音频时，
+    其部分结果放在 'partial' 中，会话继续累积。
+    """
+    try:
+        # 获取或创建该会话，会话锁保证对识别器的串行访问
+        session = sessions.acquire(session_id, sample_rate, model_name or DEFAULT_MODEL)
+        with session.lock:
+            # 如果会话已标记关闭，忽略迟到的音频
+            if session.closed:
+                log_event(logger, logging.DEBUG, 'late_chunk_ignored', session=session_id)
+                return partial_payload(session, '', False, partial_mode)
+            try:
+                created = session.recognizer is None
+                local_rec = sessions.ensure_recognizer(session)
+                if created:
+                    log_event(logger, logging.DEBUG, 'recognizer_assigned', session=session_id,
+                              model=session.model_name, sample_rate=session.sample_rate)
+            except Exception as e:
+                logger.exception('recognizer_create_failed')
+                raise StreamRequestError(f'创建识别器失败: {str(e)}', 500)
+            started = time.perf_counter()
+            audio_bytes = session.preprocessor.process(audio_data, audio_format)
+            preprocess_seconds = time.perf_counter() - started
+            decode_seconds = 0.0
+            decoded_samples = 0
+            finals = []
+            payload = None
+            # 大块音频按固定长度的帧依次送入识别器，收集其中每个话段的 final
+            frame_bytes = max(2, int(session.sample_rate * STREAM_FRAME_MS / 1000) * 2)
+            for offset in range(0, len(audio_bytes), frame_bytes):
+                frame = audio_bytes[offset:offset + frame_bytes]
+                last_frame = offset + frame_bytes >= len(audio_bytes)
+                if RESCORE_MODEL_NAME and session.model_name != RESCORE_MODEL_NAME:
+                    # 两遍识别：缓冲完整话段（包括被 VAD 跳过的静音）供后台大模型重新解码
+                    if session.spool is None:
+                        session.spool = AudioSpool(session.sample_rate,
+                                                   int(RESCORE_MAX_SECONDS * session.sample_rate) * 2)
+                    session.spool.append(frame)
+                frame_started = time.perf_counter()
+                if session.vad is not None:
+                    feed, vad_endpoint = session.vad.process(frame)
+                else:
+                    feed, vad_endpoint = frame, False
+                preprocessed = time.perf_counter()
+                preprocess_seconds += preprocessed - frame_started
+
+                # 进行识别（会话内累积）；端点处的识别器轮换会替换识别器，因此每帧重新获取
+                local_rec = sessions.ensure_recognizer(session)
+                accept_result = False
+                if feed is not None:
+                    accept_result = local_rec.AcceptWaveform(feed)
+                    if accept_result and session.vad is not None:
+                        session.vad.reset_utterance()
+
+                # 先取出结果，再记录解码的样本（端点处的识别器轮换会重置识别器）；
+                # 批量音频中间的帧不计算 partial，只有最后一帧需要
+                if accept_result:
+                    result_str = local_rec.Result()
+                elif vad_endpoint:
+                    result_str = local_rec.FinalResult()
+                elif (last_frame and feed is not None
+                      and preprocessed - session.last_partial_at >= PARTIAL_MIN_INTERVAL):
+                    session.last_partial_at = preprocessed
+                    result_str = local_rec.PartialResult()
+                else:
+                    result_str = None
+                decoded = time.perf_counter()
+                decode_seconds += decoded - preprocessed
+                final = accept_result or vad_endpoint
+                result = None
+                if result_str is not None and (final or result_str != session.last_partial_json):
+                    result = json.loads(result_str)
+                    metrics.observe('json_seconds', time.perf_counter() - decoded, stage='parse')
+                frame_samples = len(feed) // 2 if feed is not None else 0
+                decoded_samples += frame_samples
+
+                if final:
+                    session.last_partial = ''
+                    session.last_partial_json = None
+                    session.last_partial_at = float('-inf')
+                    final_payload = {
+                        'text': result.get('text', ''),
+                        'confidence': result.get('confidence', 0),
+                        'success': True,
+                        'type': 'final'
+                    }
+                    if not accept_result:
+                        final_payload['endpoint'] = 'vad'
+                    rescore_id = submit_rescore(session, final_payload['text'], PRIORITY_ENDPOINT)
+                    if rescore_id is not None:
+                        final_payload['rescore_id'] = rescore_id
+                    log_event(logger, logging.INFO, 'final', session=session_id, text=final_payload['text'],
+                              reason='decoder' if accept_result else 'vad')
+                    finals.append(final_payload)
+                    payload = None
+                elif not last_frame:
+                    payload = None
+                elif result is None:
+                    # 静音被跳过、partial 被节流，或 PartialResult 与上次完全相同
+                    if feed is None:
+                        outcome = 'skipped'
+                    elif result_str is None:
+                        outcome = 'throttled'
+                    else:
+                        outcome = 'unchanged'
+                    metrics.inc('partials_total', outcome=outcome)
+                    payload = partial_payload(session, session.last_partial, False, partial_mode)
+                else:
+                    session.last_partial_json = result_str
+                    text = result.get('partial', '')
+                    changed = text != session.last_partial
+                    metrics.inc('partials_total', outcome='changed' if changed else 'unchanged')
+                    if changed:
+                        log_event(logger, logging.DEBUG, 'partial', session=session_id, text=text)
+                    payload = partial_payload(session, text, changed, partial_mode)
+                sessions.record_decoded(session, frame_samples, final)
+
+            metrics.observe('preprocess_seconds', preprocess_seconds)
+            if decoded_samples or finals:
+                metrics.observe('decode_seconds', decode_seconds, stage='chunk')
+            if decoded_samples:
+                metrics.observe('decoder_rtf', decode_seconds / (decoded_samples / session.sample_rate))
+            sessions.record_chunk(session, len(audio_data))
+
+            if not finals and payload is None:
+                payload = partial_payload(session, session.last_partial, False, partial_mode)
+            elif finals:
+                # 批量音频可能包含多个话段：合并文本，逐段结果放在 segments 中；
+                # 最后一个 final 之后还有音频时，附带其 partial 文本（会话继续）
+                trailing = payload
+                if len(finals) == 1:
+                    payload = finals[0]
+                else:
+                    payload = {
+                        'text': ' '.join(f['text'] for f in finals if f['text']),
+                        'confidence': round(sum(f['confidence'] for f in finals) / len(finals), 3),
+                        'success': True,
+                        'type': 'final',
+                        'segments': finals
+                    }
+                if trailing is not None:
+                    payload['partial'] = session.last_partial
+            return payload
+    except StreamRequestError:
+        raise
+    except Exception as vosk_error:
+        logger.exception('decode_failed')
+        raise StreamRequestError(f'Vosk处理失败: {str(vosk_error)}', 500)
+
+def start_session_background():
+    """启动会话回收与识别器池线程：单进程模式在主进程、多进程模式在每个解码进程中调用"""
+    sessions.start_reaper()
+    if RECOGNIZER_POOL_SIZE > 0:
+        recognizer_pool.start()
+    if RESCORE_MODEL_NAME:
+        rescorer.start()
+
+def start_decoder_workers(count):
+    """fork 解码进程（必须在默认模型加载之后）"""
+    global decoder_workers
+    decoder_workers = DecoderWorkerPool(
+        count,
+        handle_worker_request,
+        initializer=start_session_background,
+        session_ttl=max(SESSION_IDLE_TTL, RESCORE_RESULT_TTL),
+    )
+    print(f"已启动 {count} 个解码进程")
+
+def startup_steps(workers=0):
+    """启动步骤：加载默认模型，然后预热识别器池（多进程模式下改为 fork 解码进程）"""
+    steps = [('model', init_vosk_model)]
+    if workers > 0:
+        steps.append(('decoder_workers', lambda: start_decoder_workers(workers)))
+    else:
+        steps.append(('recognizer_pool', start_session_background))
+    return steps
+
+def handle_worker_request(op, session_id, args, audio_data):
+    """在解码进程中执行前端路由过来的请求"""
+    if op == 'decode':
+        return decode_stream_chunk(session_id, audio_data, *args)
+    if op == 'finalize':
+        return finalize_stream_session(session_id)
+    if op == 'release':
+        return release_stream_session(session_id)
+    if op == 'rescore_results':
+        return rescorer.results(session_id)
+    if op == 'rescore_cancel':
+        return rescorer.cancel(session_id)
+    if op == 'metrics':
+        return metrics.snapshot()
+    if op == 'stats':
+        snapshot = sessions.snapshot()
+        snapshot['recognizer_pool'] = recognizer_pool.stats()
+        snapshot['models'] = models.describe()
+        snapshot['rescoring'] = rescorer.stats()
+        return snapshot
+    raise StreamRequestError(f'未知的解码进程请求: {op}', 500)
+
+def _call_decoder(op, session_id, args=(), audio_data=None):
+    try:
+        return decoder_workers.call(op, session_id, args, audio_data, ends_session=op == 'release')
+    except WorkerError as e:
+        raise StreamRequestError(str(e), e.status, session_lost=e.session_lost)
+    except FutureTimeoutError:
+        raise StreamRequestError('解码进程响应超时', 504)
+
+def stream_decode(session_id, audio_data, audio_format, sample_rate, model_name=None, partial_mode='full'):
+    """解码一块音频；多进程模式下路由到会话所属的解码进程"""
+    if decoder_workers is None:
+        return decode_stream_chunk(session_id, audio_data, audio_format, sample_rate, model_name, partial_mode)
+    return _call_decoder('decode', session_id, (audio_format, sample_rate, model_name, partial_mode), audio_data)
+
+def stream_finalize(session_id):
+    """结束会话的当前话段；多进程模式下路由到会话所属的解码进程"""
+    if decoder_workers is None:
+        return finalize_stream_session(session_id)
+    return _call_decoder('finalize', session_id)
+
+def rescore_results(session_id, wait=0.0):
+    """会话的重打分结果；多进程模式下在前端轮询，避免长时间等待占用解码进程"""
+    if decoder_workers is None:
+        return rescorer.results(session_id, wait)
+    deadline = time.monotonic() + wait
+    while True:
+        results = _call_decoder('rescore_results', session_id)
+        if results is None or results['complete'] or time.monotonic() >= deadline:
+            return results
+        time.sleep(0.2)
+
+def rescore_cancel(session_id):
+    """取消会话未完成的重打分任务，返回取消数量"""
+    if decoder_workers is None:
+        return rescorer.cancel(session_id)
+    return _call_decoder('rescore_cancel', session_id)
+
+def stream_release(session_id):
+    """丢弃会话；多进程模式下路由到会话所属的解码进程"""
+    if decoder_workers is None:
+        return release_stream_session(session_id)
+    try:
+        return _call_decoder('release', session_id)
+    except StreamRequestError as e:
+        log_event(logger, logging.WARNING, 'release_failed', session=session_id, error=str(e))
+        return False
+
+def handle_stream_request(headers, args, body, remote_addr):
+    """处理一次 /recognize_stream 请求，返回 (payload, status)；WSGI 与 ASGI 模式共用"""
+    payload, status = _handle_stream_request(headers, args, body, remote_addr)
+    metrics.inc('requests_total', endpoint='recognize_stream', status=status)
+    return payload, status
+
+def _handle_stream_request(headers, args, body, remote_addr):
     if not model:
-        return jsonify({
-            'error': 'Vosk 模型未初始化',
-            'success': False
-        }), 500
+        return model_unavailable()
     
     # 基于会话维持识别器状态，避免每次请求都新建导致始终只有 partial
     try:
         # 读取会话ID与结束标志
-        session_id = request.headers.get('X-Session-Id') or request.args.get('session_id')
+        session_id = headers.get('X-Session-Id') or args.get('session_id')
         if not session_id:
             # 退化处理：使用远端地址作为会话ID，仍建议前端显式传递 X-Session-Id
-            session_id = request.remote_addr or 'default'
-        end_of_utt = str(request.headers.get('X-End-Of-Utterance', '0')).lower() in ('1', 'true', 'yes')
-
-        # 为该会话准备互斥锁
-        lock = session_locks.setdefault(session_id, threading.Lock())
+            session_id = remote_addr or 'default'
+        end_of_utt = str(headers.get('X-End-Of-Utterance', '0')).lower() in ('1', 'true', 'yes')
+        # 音频格式协商：X-Audio-Format（s16le/f32le/mulaw）与 X-Sample-Rate，缺省为 f32le/16kHz
+        audio_format, sample_rate = parse_stream_format(
+            headers.get('X-Audio-Format') or args.get('format'),
+            headers.get('X-Sample-Rate') or args.get('sample_rate'),
+        )
+        # 模型选择：X-Model 或 ?model=（名称或别名），只在会话创建时生效
+        model_name = resolve_model(headers.get('X-Model') or args.get('model'))
+        # partial 响应模式：X-Partial-Mode 或 ?partials=（full/delta）；delta 要求客户端按顺序应用响应
+        partial_mode = parse_partial_mode(headers.get('X-Partial-Mode') or args.get('partials'))
     
         # 如果是结束标志请求（允许空body），直接返回最终结果并清理该会话的识别器
         if end_of_utt:
-            with lock:
-                rec_session = recognizers.pop(session_id, None)
-                # 标记会话已关闭，忽略迟到的音频块
-                session_closed.add(session_id)
-                try:
-                    if rec_session is None:
-                        # 没有可用的会话，返回空的final，避免阻塞前端流程
-                        return jsonify({
-                            'text': '',
-                            'success': True,
-                            'type': 'final'
-                        })
-                    result_str = rec_session.FinalResult()
-                    result = json.loads(result_str) if result_str else {}
-                    print(f"✅ 会话 {session_id} 最终结果: {result}")
-                    return jsonify({
-                        'text': result.get('text', ''),
-                        'confidence': result.get('confidence', 0),
-                        'success': True,
-                        'type': 'final'
-                    })
-                finally:
-                    # 清理该会话的锁与关闭标志
-                    session_locks.pop(session_id, None)
-                    session_closed.discard(session_id)
+            return stream_finalize(session_id), 200
     
         # 普通音频数据处理分支
-        audio_data = request.get_data()
-        print(f"📥 收到音频数据: {len(audio_data)} bytes (session={session_id})")
-        if len(audio_data) == 0:
-            print("⚠️ 音频数据为空")
-            return jsonify({
-                'error': '音频数据为空',
-                'success': False
-            }), 400
-    
-        if len(audio_data) % 4 != 0:
-            print(f"⚠️ 音频数据长度不是4的倍数: {len(audio_data)}")
-            return jsonify({
-                'error': f'音频数据长度无效: {len(audio_data)} bytes，应为4的倍数',
-                'success': False
-            }), 400
-    
-        # 将 Float32Array 转换为 int16
-        try:
-            float_data = np.frombuffer(audio_data, dtype=np.float32)
-            print(f"🔢 Float32数据: {len(float_data)} samples, 范围: [{float_data.min():.3f}, {float_data.max():.3f}]")
-            if len(float_data) == 0:
-                print("⚠️ Float32数据为空")
-                return jsonify({
-                    'error': 'Float32数据为空',
-                    'success': False
-                }), 400
-            if np.any(np.isnan(float_data)) or np.any(np.isinf(float_data)):
-                print("⚠️ 检测到NaN或Inf值，进行清理")
-                float_data = np.nan_to_num(float_data, nan=0.0, posinf=1.0, neginf=-1.0)
-            float_data = np.clip(float_data, -1.0, 1.0)
-            data_range = float_data.max() - float_data.min()
-            if data_range < 1e-6:
-                print(f"⚠️ 音频数据范围过小: {data_range}, 可能是静音")
-            int16_data = (float_data * 32767).astype(np.int16)
-            print(f"🔄 转换为Int16: {len(int16_data)} samples, 范围: [{int16_data.min()}, {int16_data.max()}]")
-        except Exception as conv_error:
-            print(f"❌ 数据转换错误: {conv_error}")
-            print(f"❌ 原始数据长度: {len(audio_data)} bytes")
-            import traceback
-            print(f"❌ 转换错误堆栈: {traceback.format_exc()}")
-            return jsonify({
-                'error': f'数据转换失败: {str(conv_error)}',
-                'success': False
-            }), 400
-    
-        try:
-            audio_bytes = int16_data.tobytes()
-            print(f"🎤 发送到Vosk: {len(audio_bytes)} bytes")
-            if len(audio_bytes) < 640:  # <20ms
-                print(f"⚠️ 音频数据过短: {len(audio_bytes)} bytes, 跳过处理")
-                return jsonify({
-                    'text': '',
-                    'success': True,
-                    'type': 'partial'
-                })
-            if len(audio_bytes) % 2 != 0:
-                print(f"⚠️ 音频数据长度不是偶数: {len(audio_bytes)} bytes, 截断1字节")
-                audio_bytes = audio_bytes[:-1]
-            max_bytes = 16000 * 2
-            if len(audio_bytes) > max_bytes:
-                print(f"⚠️ 音频数据过长: {len(audio_bytes)} bytes, 截断到 {max_bytes} bytes")
-                audio_bytes = audio_bytes[:max_bytes]
-            samples_count = len(audio_bytes) // 2
-            print(f"📊 音频样本数: {samples_count}, 预期时长: {samples_count/16000:.3f}秒")
-    
-            audio_samples = np.frombuffer(audio_bytes, dtype=np.int16)
-            if len(audio_samples) > 1:
-                diff = np.abs(np.diff(audio_samples.astype(np.float32)))
-                max_diff = np.max(diff)
-                if max_diff > 20000:
-                    print(f"⚠️ 检测到音频数据跳跃过大: {max_diff}, 进行平滑处理")
-                    for i in range(1, len(audio_samples)):
-                        if abs(int(audio_samples[i]) - int(audio_samples[i-1])) > 20000:
-                            audio_samples[i] = audio_samples[i-1]
-                    audio_bytes = audio_samples.tobytes()
-    
-            min_samples = 160
-            if len(audio_samples) < min_samples:
-                print(f"⚠️ 音频数据样本数过少: {len(audio_samples)}, 最少需要: {min_samples}")
-                padding = np.zeros(min_samples - len(audio_samples), dtype=np.int16)
-                audio_samples = np.concatenate([audio_samples, padding])
-                audio_bytes = audio_samples.tobytes()
-                print(f"🔧 已填充到: {len(audio_samples)} 样本")
-    
-            # 获取或创建该会话的识别器，并保证串行访问
-            lock = session_locks.setdefault(session_id, threading.Lock())
-            with lock:
-                # 如果会话已标记关闭，忽略迟到的音频
-                if session_id in session_closed:
-                    print(f"ℹ️ 会话 {session_id} 已关闭，忽略迟到音频块")
-                    return jsonify({
-                        'text': '',
-                        'success': True,
-                        'type': 'partial'
-                    })
-                local_rec = recognizers.get(session_id)
-                if local_rec is None:
-                    try:
-                        local_rec = vosk.KaldiRecognizer(model, 16000)
-                        recognizers[session_id] = local_rec
-                        print(f"🆕 创建会话识别器: {session_id}")
-                    except Exception as e:
-                        print(f"❌ 创建识别器失败: {e}")
-                        return jsonify({
-                            'error': f'创建识别器失败: {str(e)}',
-                            'success': False
-                        }), 500
-
-                # 进行识别（会话内累积）
-                accept_result = local_rec.AcceptWaveform(audio_bytes)
-                if accept_result:
-                    result_str = local_rec.Result()
-                    result = json.loads(result_str)
-                    print(f"✅ 会话 {session_id} 最终结果: {result}")
-                    return jsonify({
-                        'text': result.get('text', ''),
-                        'confidence': result.get('confidence', 0),
-                        'success': True,
-                        'type': 'final'
-                    })
-                else:
-                    partial_str = local_rec.PartialResult()
-                    partial = json.loads(partial_str)
-                    print(f"🎤 会话 {session_id} 部分结果: {partial}")
-                    return jsonify({
-                        'text': partial.get('partial', ''),
-                        'success': True,
-                        'type': 'partial'
-                    })
-        except Exception as vosk_error:
-            print(f"❌ Vosk处理错误: {vosk_error}")
-            print(f"❌ 错误类型: {type(vosk_error)}")
-            import traceback
-            print(f"❌ 错误堆栈: {traceback.format_exc()}")
-            return jsonify({
-                'error': f'Vosk处理失败: {str(vosk_error)}',
-                'success': False
-            }), 500
+        audio_bytes = prepare_stream_audio(body, audio_format, sample_rate)
+        if audio_bytes is None and partial_mode == 'delta':
+            return {'success': True, 'type': 'partial', 'unchanged': True}, 200
+        if audio_bytes is None:
+            return {
+                'text': '',
+                'success': True,
+                'type': 'partial'
+            }, 200
+        return stream_decode(session_id, audio_bytes, audio_format, sample_rate, model_name, partial_mode), 200
 
+    except StreamRequestError as e:
+        return stream_error_payload(e), e.status
     except Exception as e:
-        print(f"❌ 流式语音识别错误: {e}")
-        print(f"❌ 错误类型: {type(e)}")
-        import traceback
-        print(f"❌ 错误堆栈: {traceback.format_exc()}")
-        return jsonify({
+        logger.exception('stream_request_failed')
+        return {
             'error': str(e),
             'success': False
-        }), 500
+        }, 500
 
-@app.route('/reset', methods=['POST'])
-def reset_recognizer():
-    """重置识别器"""
-    global rec
-    
+@app.route('/recognize_stream', methods=['POST'])
+def recognize_audio_stream():
+    """流式语音识别接口"""
+    payload, status = handle_stream_request(request.headers, request.args, request.get_data(), request.remote_addr)
+    with metrics.timer('json_seconds', stage='serialize'):
+        response = jsonify(payload)
+    return response, status
+
+class StreamSocketProtocol:
+    """WebSocket 流式语音识别协议（与具体 WebSocket 实现无关，WSGI 与 ASGI 模式共用）
+
+    一个连接对应一个会话：二进制帧为 PCM 音频，文本帧为 JSON 控制消息。
+    音频格式与模型由查询参数 format/sample_rate/model 或
+    {"type": "start", "format": ..., "sample_rate": ..., "model": ...} 控制消息协商，缺省为 f32le/16kHz 与默认模型。{"type": "end"} 结束当前话段并返回 final
+    （取代 X-End-Of-Utterance 请求），连接保持打开以继续下一个话段。识别结果仅在变化时推送；
+    partials=delta（查询参数或 start 消息）时，在上次结果后追加的 partial 只推送追加部分（append）。
+    """
+
+    def __init__(self, args):
+        self.session_id = args.get('session_id') or uuid.uuid4().hex
+        self.audio_format, self.sample_rate = parse_stream_format(args.get('format'), args.get('sample_rate'))
+        self.model_name = resolve_model(args.get('model'))
+        self.partial_mode = parse_partial_mode(args.get('partials'))
+        self.last_partial = ''
+        log_event(logger, logging.INFO, 'ws_open', session=self.session_id, format=self.audio_format,
+                  sample_rate=self.sample_rate, model=self.model_name, partials=self.partial_mode)
+
+    def ready_message(self):
+        return {
+            'success': True,
+            'type': 'ready',
+            'session_id': self.session_id,
+            'format': self.audio_format,
+            'sample_rate': self.sample_rate,
+            'model': self.model_name,
+            'partials': self.partial_mode
+        }
+
+    def handle(self, message):
+        """处理一帧消息，返回 (需要推送给客户端的消息列表, 是否保持连接)"""
+        # 文本帧：控制消息
+        if isinstance(message, str):
+            return self._handle_control(message)
+
+        # 二进制帧：音频数据
+        try:
+            audio_bytes = prepare_stream_audio(message, self.audio_format, self.sample_rate)
+            if audio_bytes is None:
+                return [], True
+            payload = stream_decode(self.session_id, audio_bytes, self.audio_format, self.sample_rate,
+                                    self.model_name, self.partial_mode)
+        except StreamRequestError as e:
+            metrics.inc('requests_total', endpoint='recognize_ws', status=e.status)
+            return [stream_error_payload(e)], True
+        metrics.inc('requests_total', endpoint='recognize_ws', status=200)
+
+        if payload['type'] == 'final':
+            # 批量音频在 final 之后还有语音时附带 partial，会话继续
+            self.last_partial = payload.get('partial', '')
+            return ([payload] if payload['text'] or self.last_partial else []), True
+        if payload.get('unchanged'):
+            return [], True
+        if self.partial_mode == 'delta':
+            return [payload], True
+        if payload['text'] != self.last_partial:
+            self.last_partial = payload['text']
+            return [payload], True
+        return [], True
+
+    def _handle_control(self, message):
+        try:
+            control = json.loads(message)
+        except ValueError:
+            control = {}
+        msg_type = control.get('type') if isinstance(control, dict) else None
+
+        if msg_type == 'start':
+            try:
+                new_format, new_rate = parse_stream_format(
+                    control.get('format', self.audio_format), control.get('sample_rate', self.sample_rate))
+                new_model = resolve_model(control.get('model', self.model_name))
+                new_partial_mode = parse_partial_mode(control.get('partials', self.partial_mode))
+            except StreamRequestError as e:
+                return [{
+                    'error': str(e),
+                    'success': False
+                }], True
+            if new_rate != self.sample_rate or new_model != self.model_name:
+                # 识别器按模型与采样率创建，二者变化时丢弃旧识别器
+                stream_release(self.session_id)
+                self.last_partial = ''
+            self.audio_format, self.sample_rate, self.model_name = new_format, new_rate, new_model
+            self.partial_mode = new_partial_mode
+            return [self.ready_message()], True
+        if msg_type == 'end':
+            self.last_partial = ''
+            return [stream_finalize(self.session_id)], True
+        if msg_type == 'close':
+            return [], False
+        return [{
+            'error': f'未知控制消息: {message}',
+            'success': False
+        }], True
+
+    def close(self):
+        # 连接断开时释放会话识别器，避免客户端未发送 end 导致泄漏
+        stream_release(self.session_id)
+        log_event(logger, logging.INFO, 'ws_close', session=self.session_id)
+
+@sock.route('/recognize_ws')
+def recognize_audio_ws(ws):
+    """WebSocket 流式语音识别接口，协议见 StreamSocketProtocol"""
     if not model:
-        return jsonify({
-            'error': 'Vosk 模型未初始化',
+        ws.send(json.dumps(model_unavailable()[0]))
+        return
+
+    try:
+        protocol = StreamSocketProtocol(request.args)
+    except StreamRequestError as e:
+        ws.send(json.dumps({
+            'error': str(e),
             'success': False
-        }), 500
-    
+        }))
+        return
+    ws.send(json.dumps(protocol.ready_message()))
+
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                continue
+            replies, keep_open = protocol.handle(message)
+            for reply in replies:
+                ws.send(json.dumps(reply))
+            if not keep_open:
+                break
+    except ConnectionClosed:
+        pass
+    finally:
+        protocol.close()
+
+@app.route('/rescore/<session_id>', methods=['GET'])
+def get_rescore_results(session_id):
+    """两遍识别结果：会话各话段的大模型转写；?wait=秒 等待全部完成（最多 25 秒）"""
     try:
-        rec = vosk.KaldiRecognizer(model, 16000)
+        wait = min(max(float(request.args.get('wait', 0)), 0.0), 25.0)
+        results = rescore_results(session_id, wait)
+    except ValueError:
         return jsonify({
-            'success': True,
-            'message': '识别器已重置'
-        })
-    except Exception as e:
+            'error': f"wait 参数无效: {request.args.get('wait')}",
+            'success': False
+        }), 400
+    except StreamRequestError as e:
         return jsonify({
             'error': str(e),
             'success': False
-        }), 500
+        }), e.status
+    if results is None:
+        return jsonify({
+            'error': f'没有该会话的重打分结果: {session_id}',
+            'success': False
+        }), 404
+    results['success'] = True
+    return jsonify(results)
+
+@app.route('/rescore/<session_id>', methods=['DELETE'])
+def cancel_rescore(session_id):
+    """取消会话未完成的重打分任务"""
+    try:
+        cancelled = rescore_cancel(session_id)
+    except StreamRequestError as e:
+        return jsonify({
+            'error': str(e),
+            'success': False
+        }), e.status
+    return jsonify({
+        'success': True,
+        'cancelled': cancelled
+    })
+
+@app.route('/admin/sessions', methods=['GET'])
+def admin_sessions():
+    """会话管理器状态：活跃会话、内存与字节计数、回收/轮换统计与识别器池"""
+    if decoder_workers is None:
+        snapshot = sessions.snapshot()
+        snapshot['recognizer_pool'] = recognizer_pool.stats()
+        snapshot['rescoring'] = rescorer.stats()
+        return jsonify(snapshot)
+
+    # 多进程模式：汇总每个解码进程的会话状态
+    workers = []
+    for channel_info, worker_snapshot in zip(decoder_workers.describe(), decoder_workers.broadcast('stats')):
+        channel_info['state'] = worker_snapshot
+        workers.append(channel_info)
+    return jsonify({
+        'active_sessions': sum(w['state']['active_sessions'] for w in workers if w['state']),
+        'memory_estimate_bytes': sum(w['state']['memory_estimate_bytes'] for w in workers if w['state']),
+        'sessions_lost': decoder_workers.sessions_lost,
+        'workers': workers
+    })
+
+@app.route('/admin/sessions/<session_id>', methods=['DELETE'])
+def admin_evict_session(session_id):
+    """强制回收指定会话"""
+    if not stream_release(session_id):
+        return jsonify({
+            'error': f'会话不存在: {session_id}',
+            'success': False
+        }), 404
+    return jsonify({
+        'success': True,
+        'message': f'会话 {session_id} 已回收'
+    })
+
+@app.route('/reset', methods=['POST'])
+def reset_recognizer():
+    """重置会话的识别器（X-Session-Id 或 ?session_id=）：丢弃会话的识别器与未结束的话段，
+    下一块音频以同一会话ID重新开始"""
+    session_id = request.headers.get('X-Session-Id') or request.args.get('session_id')
+    if not session_id:
+        return jsonify({
+            'error': '缺少会话ID（X-Session-Id 或 session_id 参数）',
+            'success': False
+        }), 400
+    existed = stream_release(session_id)
+    return jsonify({
+        'success': True,
+        'reset': existed,
+        'message': f'会话 {session_id} 的识别器已重置' if existed else f'会话 {session_id} 不存在，无需重置'
+    })
+
+def create_asgi_app():
+    """ASGI 服务模式（--asgi）
+
+    健康检查在事件循环中直接返回，不再与解码请求争抢线程；/recognize_stream 与
+    /recognize_ws 的解码在有界线程池（VOSK_DECODE_THREADS）中执行。
+    其余接口挂载原 Flask 应用，请求与响应格式保持不变。
+    """
+    import asyncio
+
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.responses import JSONResponse
+    from starlette.routing import Mount, Route, WebSocketRoute
+    from starlette.websockets import WebSocketDisconnect
+
+    decode_executor = ThreadPoolExecutor(max_workers=DECODE_THREADS, thread_name_prefix='vosk-decode')
+
+    async def health(request):
+        return JSONResponse(health_payload())
+
+    async def livez(request):
+        payload, status = liveness_payload()
+        return JSONResponse(payload, status_code=status)
+
+    async def readyz(request):
+        payload, status = startup.probe()
+        return JSONResponse(payload, status_code=status)
+
+    async def read_limited_body(request):
+        """读取请求体；超过 MAX_UPLOAD_BYTES 时返回 None（先看 Content-Length，再按已读字节数，覆盖分块传输）"""
+        declared = request.headers.get('content-length', '')
+        if declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES:
+            return None
+        chunks = []
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    async def recognize_stream(request):
+        body = await read_limited_body(request)
+        if body is None:
+            metrics.inc('requests_total', endpoint='recognize_stream', status=413)
+            payload, status = upload_too_large()
+            return JSONResponse(payload, status_code=status)
+        remote_addr = request.client.host if request.client else None
+        payload, status = await asyncio.get_running_loop().run_in_executor(
+            decode_executor, handle_stream_request, request.headers, request.query_params, body, remote_addr)
+        return JSONResponse(payload, status_code=status)
+
+    async def recognize_ws(websocket):
+        await websocket.accept()
+        if not model:
+            await websocket.send_text(json.dumps(model_unavailable()[0]))
+            await websocket.close()
+            return
+        try:
+            protocol = StreamSocketProtocol(websocket.query_params)
+        except StreamRequestError as e:
+            await websocket.send_text(json.dumps({
+                'error': str(e),
+                'success': False
+            }))
+            await websocket.close()
+            return
+        await websocket.send_text(json.dumps(protocol.ready_message()))
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                data = message.get('bytes')
+                if data is None:
+                    data = message.get('text')
+                replies, keep_open = await loop.run_in_executor(decode_executor, protocol.handle, data)
+                for reply in replies:
+                    await websocket.send_text(json.dumps(reply))
+                if not keep_open:
+                    await websocket.close()
+                    break
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await loop.run_in_executor(decode_executor, protocol.close)
+
+    return Starlette(
+        routes=[
+            Route('/health', health, methods=['GET']),
+            Route('/livez', livez, methods=['GET']),
+            Route('/readyz', readyz, methods=['GET']),
+            Route('/recognize_stream', recognize_stream, methods=['POST']),
+            WebSocketRoute('/recognize_ws', recognize_ws),
+            Mount('/', app=WSGIMiddleware(app)),
+        ],
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        ],
+    )
+
+def serve(port, asgi=False, debug=False, fd=None):
+    """启动 HTTP 服务；fd 为继承的监听 socket（备用进程模式），否则自行绑定端口"""
+    if asgi:
+        import uvicorn
+        uvicorn.run(create_asgi_app(), host='0.0.0.0', port=port, fd=fd)
+    elif fd is not None:
+        from werkzeug.serving import make_server
+        make_server('0.0.0.0', port, app, threaded=True, fd=fd).serve_forever()
+    else:
+        app.run(host='0.0.0.0', port=port, debug=debug)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vosk 语音识别服务')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('VOSK_WORKERS', '0')),
+                        help='解码进程数量，0 表示在服务进程内解码')
+    parser.add_argument('--port', type=int, default=5001, help='监听端口')
+    parser.add_argument('--asgi', action='store_true', default=os.getenv('VOSK_ASGI', '0') == '1',
+                        help='使用 ASGI（uvicorn）服务模式')
+    parser.add_argument('--standby', action='store_true', default=os.getenv('VOSK_STANDBY', '0') == '1',
+                        help='保留一个已加载模型的备用进程，服务进程退出或 SIGHUP 时立即接管')
+    args = parser.parse_args()
+
     print("启动 Vosk 语音识别服务...")
-    
-    # 初始化模型
-    if not init_vosk_model():
-        print("模型初始化失败，退出")
-        exit(1)
-    
-    print("服务启动成功，监听端口 5001")
     print("API 端点:")
     print("  GET  /health - 健康检查")
+    print("  GET  /livez - 存活检查（绑定端口后立即可用）")
+    print("  GET  /readyz - 就绪检查（模型加载完成前返回 503 与加载进度）")
     print("  POST /recognize - 文件语音识别")
     print("  POST /recognize_stream - 流式语音识别")
-    print("  POST /reset - 重置识别器")
-    
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    print("  WS   /recognize_ws - WebSocket 流式语音识别")
+    print("  GET  /metrics - 指标（Prometheus 文本，?format=json 为摘要）")
+    print("  GET  /rescore/<id> - 两遍识别结果（大模型重新解码）")
+    print("  GET  /admin/sessions - 会话管理状态")
+    print("  DELETE /admin/sessions/<id> - 回收会话")
+    print("  POST /reset - 重置会话的识别器")
+
+    # 多进程模式下模型必须在 fork 之前加载（解码进程以写时复制共享模型），只能先加载再提供服务；
+    # 单进程模式先绑定端口，模型在后台线程加载
+    background = args.workers == 0
+    # debug 重载器仅用于单进程 Flask 模式；重载器的父进程只监控文件、不提供服务，无需加载模型
+    reloader = background and not args.asgi and not args.standby
+
+    if args.standby:
+        StandbySupervisor(
+            '0.0.0.0', args.port,
+            prepare=lambda: startup.run(startup_steps(args.workers), background=background),
+            serve=lambda fd: serve(args.port, asgi=args.asgi, fd=fd),
+        ).run()
+    else:
+        if not reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            if not startup.run(startup_steps(args.workers), background=background):
+                print("模型初始化失败，退出")
+                exit(1)
+        print(f"服务启动成功，监听端口 {args.port}")
+        serve(args.port, asgi=args.asgi, debug=reloader)
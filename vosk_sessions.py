@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vosk 流式识别会话管理
+统一管理每个会话的识别器、预处理阶段与锁：空闲超时回收、并发会话上限（LRU 淘汰）、
+按会话的字节/内存计数，以及长会话在端点处自动轮换识别器。
+每个会话可持有一个语音活动检测器，用于跳过静音解码与自动端点。
+RecognizerPool 预先创建并复用识别器，消除话段首个音频块的构造延迟。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RecognizerPool:
+    """按 (模型名称, 采样率) 分组的预热识别器池
+
+    acquire 优先取出已重置的空闲识别器（命中），池空时同步创建（未命中）并唤醒后台线程补充；
+    release 将用完的识别器 Reset 后放回池中，超出容量的直接丢弃。
+
+    Args:
+        factory: callable(key) -> KaldiRecognizer，key 为 (模型名称, 采样率)
+        size: 每个 key 保留的空闲识别器数量
+        keys: 后台预热的 key
+    """
+
+    def __init__(self, factory, size=4, keys=()):
+        self.factory = factory
+        self.size = size
+        self.keys = tuple(keys)
+        self._idle = {key: deque() for key in self.keys}
+        self._lock = threading.Lock()
+        self._refill = threading.Event()
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.recycled = 0
+        self.discarded = 0
+
+    def acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.hits += 1
+                recognizer = idle.popleft()
+            else:
+                self.misses += 1
+                recognizer = None
+        self._refill.set()
+        if recognizer is None:
+            recognizer = self._create(key)
+        return recognizer
+
+    def release(self, recognizer, key):
+        """重置识别器并放回池中；重置失败或池已满时丢弃"""
+        try:
+            recognizer.Reset()
+        except Exception as e:
+            print(f"⚠️ 识别器重置失败，丢弃: {e}")
+            with self._lock:
+                self.discarded += 1
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < self.size:
+                idle.append(recognizer)
+                self.recycled += 1
+            else:
+                self.discarded += 1
+
+    def discard_where(self, predicate):
+        """丢弃 key 满足 predicate 的空闲识别器（如所属模型已卸载），返回丢弃数量"""
+        with self._lock:
+            keys = [key for key in self._idle if predicate(key)]
+            count = sum(len(self._idle[key]) for key in keys)
+            for key in keys:
+                if key in self.keys:
+                    self._idle[key].clear()
+                else:
+                    del self._idle[key]
+            self.discarded += count
+        return count
+
+    def _create(self, key):
+        recognizer = self.factory(key)
+        with self._lock:
+            self.created += 1
+        return recognizer
+
+    def fill(self):
+        """将预热 key 的空闲识别器补足到 size"""
+        for key in self.keys:
+            while True:
+                with self._lock:
+                    if len(self._idle[key]) >= self.size:
+                        break
+                recognizer = self._create(key)
+                with self._lock:
+                    self._idle[key].append(recognizer)
+
+    def start(self):
+        """同步预热一次，然后启动后台补充线程（重复调用无副作用）"""
+        if self._thread is not None:
+            return
+        self.fill()
+
+        def refill():
+            while True:
+                self._refill.wait()
+                self._refill.clear()
+                try:
+                    self.fill()
+                except Exception as e:
+                    print(f"❌ 识别器池补充失败: {e}")
+                    time.sleep(1.0)
+
+        self._thread = threading.Thread(target=refill, name='vosk-recognizer-pool', daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': self.size,
+                'keys': [f'{name}@{rate}' for name, rate in self.keys],
+                'idle': {f'{name}@{rate}': len(idle) for (name, rate), idle in self._idle.items()},
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 3) if requests else None,
+                'created': self.created,
+                'recycled': self.recycled,
+                'discarded': self.discarded,
+            }
+
+
+class StreamSession:
+    """单个流式识别会话的状态，recognizer/preprocessor/vad 只能在 lock 内访问"""
+
+    def __init__(self, session_id, sample_rate, preprocessor, vad=None, model_name=None):
+        self.session_id = session_id
+        self.sample_rate = sample_rate
+        self.model_name = model_name
+        self.preprocessor = preprocessor
+        self.vad = vad
+        self.recognizer = None
+        # 最近一次解码得到的部分结果（跳过静音或节流时直接返回）、其原始 JSON 与计算时间
+        self.last_partial = ''
+        self.last_partial_json = None
+        self.last_partial_at = float('-inf')
+        # 两遍识别时缓冲当前话段音频的 AudioSpool，未启用时为 None
+        self.spool = None
+        self.lock = threading.Lock()
+        # 会话已结束（flush）或被回收时置为 True，迟到的音频块将被忽略
+        self.closed = False
+
+        now = time.monotonic()
+        self.created_at = now
+        self.last_active = now
+
+        self.bytes_received = 0
+        self.chunks = 0
+        self.audio_seconds = 0.0
+        # 当前识别器已解码的音频时长，用于判断是否需要轮换
+        self.recognizer_audio_seconds = 0.0
+        self.utterances = 0
+        self.rotations = 0
+
+    @property
+    def recognizer_key(self):
+        """识别器池的分组 key"""
+        return self.model_name, self.sample_rate
+
+    def memory_estimate(self, recognizer_bytes):
+        """估算会话占用的内存：识别器解码状态 + 预处理缓冲区 + 话段音频缓冲"""
+        total = self.preprocessor.buffer_bytes if self.preprocessor is not None else 0
+        if self.spool is not None:
+            total += len(self.spool)
+        if self.recognizer is not None:
+            total += recognizer_bytes
+        return total
+
+    def describe(self, now, recognizer_bytes):
+        return {
+            'session_id': self.session_id,
+            'model': self.model_name,
+            'sample_rate': self.sample_rate,
+            'age_seconds': round(now - self.created_at, 1),
+            'idle_seconds': round(now - self.last_active, 1),
+            'bytes_received': self.bytes_received,
+            'chunks': self.chunks,
+            'audio_seconds': round(self.audio_seconds, 2),
+            'utterances': self.utterances,
+            'rotations': self.rotations,
+            'has_recognizer': self.recognizer is not None,
+            'memory_estimate_bytes': self.memory_estimate(recognizer_bytes),
+            'vad': self.vad.stats() if self.vad is not None else None,
+        }
+
+
+class SessionManager:
+    """有界的会话表
+
+    会话按最近活跃时间排列（OrderedDict 末尾最新），因此空闲回收只需从头部扫描，
+    超过 max_sessions 时淘汰最久未活跃的会话。
+
+    Args:
+        recognizer_factory: callable((模型名称, 采样率)) -> KaldiRecognizer
+        preprocessor_factory: callable() -> AudioPreprocessor
+        recognizer_recycler: callable(recognizer, (模型名称, 采样率))，会话用完的识别器交给它回收（如放回识别器池）
+        vad_factory: callable(sample_rate) -> VoiceActivityDetector；None 关闭语音活动检测
+        max_sessions: 并发会话上限
+        idle_ttl: 会话空闲超过该秒数后被回收
+        rotate_after_seconds: 识别器累计解码超过该时长后，在下一个端点处替换为新识别器；None 关闭
+        recognizer_memory_bytes: 单个识别器解码状态的估算内存，用于内存计数
+    """
+
+    def __init__(self, recognizer_factory, preprocessor_factory, recognizer_recycler=None, vad_factory=None,
+                 max_sessions=100, idle_ttl=120.0, rotate_after_seconds=600.0,
+                 recognizer_memory_bytes=30 * 1024 * 1024):
+        self.recognizer_factory = recognizer_factory
+        self.preprocessor_factory = preprocessor_factory
+        self.recognizer_recycler = recognizer_recycler
+        self.vad_factory = vad_factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.rotate_after_seconds = rotate_after_seconds
+        self.recognizer_memory_bytes = recognizer_memory_bytes
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper = None
+
+        self.sessions_created = 0
+        self.recognizers_assigned = 0
+        self.idle_evictions = 0
+        self.lru_evictions = 0
+        self.rotations = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def acquire(self, session_id, sample_rate, model_name=None):
+        """获取（必要时创建）会话并标记为最近活跃；模型只在创建会话时生效"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                vad = self.vad_factory(sample_rate) if self.vad_factory is not None else None
+                session = StreamSession(session_id, sample_rate, self.preprocessor_factory(), vad, model_name)
+                self._sessions[session_id] = session
+                self.sessions_created += 1
+                while len(self._sessions) > self.max_sessions:
+                    _, evicted = self._sessions.popitem(last=False)
+                    evicted.closed = True
+                    self.lru_evictions += 1
+                    print(f"♻️ 会话数超过上限 {self.max_sessions}，淘汰最久未活跃会话: {evicted.session_id}")
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_active = time.monotonic()
+            return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def uses_model(self, model_name):
+        """是否有会话正在使用该模型"""
+        with self._lock:
+            return any(s.model_name == model_name for s in self._sessions.values())
+
+    def pop(self, session_id):
+        """从会话表移除会话并返回；调用方负责在会话锁内结束它"""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def discard(self, session_id):
+        """直接结束会话（不计算最终结果）并回收其识别器，返回是否存在"""
+        session = self.pop(session_id)
+        if session is None:
+            return False
+        with session.lock:
+            session.closed = True
+            self.recycle_recognizer(session)
+        return True
+
+    def recycle_recognizer(self, session):
+        """将会话的识别器交给回收器并从会话上摘除；需在 session.lock 内调用"""
+        recognizer = session.recognizer
+        session.recognizer = None
+        if recognizer is not None and self.recognizer_recycler is not None:
+            self.recognizer_recycler(recognizer, session.recognizer_key)
+
+    def ensure_recognizer(self, session):
+        """返回会话的识别器，不存在时创建；需在 session.lock 内调用"""
+        if session.recognizer is None:
+            session.recognizer = self.recognizer_factory(session.recognizer_key)
+            session.recognizer_audio_seconds = 0.0
+            with self._lock:
+                self.recognizers_assigned += 1
+        return session.recognizer
+
+    def record_chunk(self, session, byte_count):
+        """记录收到的一块音频（一个请求或 WebSocket 帧）。需在 session.lock 内调用"""
+        session.bytes_received += byte_count
+        session.chunks += 1
+        session.last_active = time.monotonic()
+
+    def record_decoded(self, session, sample_count, endpoint):
+        """记录送入解码器的样本数（大块音频分帧解码时逐帧调用）；在端点处按需轮换识别器。需在 session.lock 内调用"""
+        seconds = sample_count / session.sample_rate
+        session.audio_seconds += seconds
+        session.recognizer_audio_seconds += seconds
+        if not endpoint:
+            return
+        session.utterances += 1
+        if self.rotate_after_seconds and session.recognizer_audio_seconds >= self.rotate_after_seconds:
+            # 端点处解码器没有未完成的话段，替换识别器可释放累积的解码状态
+            self.recycle_recognizer(session)
+            session.rotations += 1
+            with self._lock:
+                self.rotations += 1
+            print(f"🔁 会话 {session.session_id} 已解码 {session.audio_seconds:.0f} 秒，轮换识别器")
+
+    def evict_idle(self):
+        """回收空闲超时的会话，返回回收数量"""
+        deadline = time.monotonic() - self.idle_ttl
+        evicted = []
+        with self._lock:
+            while self._sessions:
+                session = next(iter(self._sessions.values()))
+                if session.last_active > deadline:
+                    break
+                self._sessions.popitem(last=False)
+                session.closed = True
+                evicted.append(session.session_id)
+            self.idle_evictions += len(evicted)
+        for session_id in evicted:
+            print(f"🧹 会话 {session_id} 空闲超过 {self.idle_ttl:.0f} 秒，已回收")
+        return len(evicted)
+
+    def start_reaper(self, interval=None):
+        """启动后台线程定期回收空闲会话（重复调用无副作用）"""
+        if self._reaper is not None:
+            return
+        interval = interval or max(1.0, min(self.idle_ttl / 4, 30.0))
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    print(f"❌ 会话回收失败: {e}")
+
+        self._reaper = threading.Thread(target=reap, name='vosk-session-reaper', daemon=True)
+        self._reaper.start()
+
+    def snapshot(self):
+        """会话管理器状态，供管理接口使用"""
+        now = time.monotonic()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            counters = {
+                'sessions_created': self.sessions_created,
+                'recognizers_assigned': self.recognizers_assigned,
+                'idle_evictions': self.idle_evictions,
+                'lru_evictions': self.lru_evictions,
+                'rotations': self.rotations,
+            }
+        described = [s.describe(now, self.recognizer_memory_bytes) for s in sessions]
+        return {
+            'active_sessions': len(described),
+            'max_sessions': self.max_sessions,
+            'idle_ttl_seconds': self.idle_ttl,
+            'rotate_after_seconds': self.rotate_after_seconds,
+            'bytes_received': sum(s['bytes_received'] for s in described),
+            'memory_estimate_bytes': sum(s['memory_estimate_bytes'] for s in described),
+            'counters': counters,
+            'sessions': described,
+        }
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vosk 预热备用进程（--standby）
+监督进程启动后立即绑定监听端口，然后 fork 两个服务进程：一个对外服务（active），
+另一个在后台加载好模型后阻塞等待（standby）。active 退出（崩溃，或监督进程收到 SIGHUP 重启）时，
+立即唤醒 standby 在同一个监听 socket 上接受连接，再 fork 新的 standby 在后台预热，
+因此重启几乎没有冷启动时间，期间到达的连接在 listen 队列中等待而不会被拒绝。
+
+代价是常驻两份模型内存；监督进程本身只导入模块，不加载模型、不启动线程，以便安全 fork。
+"""
+
+import os
+import signal
+import socket
+import threading
+import time
+
+# standby 连续异常退出时，重新 fork 前等待的秒数
+RESPAWN_DELAY = 1.0
+
+
+class _Child:
+    def __init__(self, pid, wake_fd, standby):
+        self.pid = pid
+        self.wake_fd = wake_fd
+        self.standby = standby
+        self.started_at = time.monotonic()
+
+
+class StandbySupervisor:
+    """监督 active 与 standby 两个服务进程
+
+    Args:
+        host, port: 监听地址
+        prepare: callable()，在子进程中调用，开始（后台）加载模型
+        serve: callable(fd)，在继承的监听 socket 上提供服务，不返回
+    """
+
+    def __init__(self, host, port, prepare, serve):
+        self.host = host
+        self.port = port
+        self.prepare = prepare
+        self.serve = serve
+        self.listener = None
+        self.active = None
+        self.standby = None
+        self.restarts = 0
+
+    def run(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(128)
+        self.listener.set_inheritable(True)
+        print(f"🛡️ 备用进程模式：监督进程 {os.getpid()} 已监听端口 {self.port}（SIGHUP 切换到备用进程）")
+
+        self.active = self._spawn(standby=False)
+        self.standby = self._spawn(standby=True)
+        signal.signal(signal.SIGHUP, self._on_restart)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+
+        while True:
+            pid, status = os.wait()
+            code = os.waitstatus_to_exitcode(status)
+            if self.active is not None and pid == self.active.pid:
+                print(f"⚠️ 服务进程 {pid} 已退出（{code}），切换到备用进程 {self.standby.pid}")
+                os.close(self.active.wake_fd)
+                self.active = None
+                self._promote()
+            elif self.standby is not None and pid == self.standby.pid:
+                print(f"⚠️ 备用进程 {pid} 已退出（{code}），重新创建")
+                started_at = self.standby.started_at
+                os.close(self.standby.wake_fd)
+                self.standby = None
+                if time.monotonic() - started_at < RESPAWN_DELAY:
+                    time.sleep(RESPAWN_DELAY)
+                self.standby = self._spawn(standby=True)
+
+    def _promote(self):
+        """唤醒 standby 接管监听 socket，并 fork 新的 standby"""
+        self.active = self.standby
+        self.active.standby = False
+        os.write(self.active.wake_fd, b'1')
+        self.restarts += 1
+        self.standby = self._spawn(standby=True)
+
+    def _spawn(self, standby):
+        wake_r, wake_w = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(wake_r)
+            return _Child(pid, wake_w, standby)
+
+        # 子进程：恢复默认信号处理，关闭其他子进程的管道写端，否则监督进程退出时读不到 EOF
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        os.close(wake_w)
+        for fd in {child.wake_fd for child in (self.active, self.standby) if child is not None}:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        try:
+            self._child_main(wake_r, standby)
+        except BaseException as e:
+            print(f"❌ 服务进程异常退出: {e}")
+        os._exit(1)
+
+    def _child_main(self, wake_fd, standby):
+        self.prepare()
+        if standby:
+            # 等待被唤醒；读到 EOF 说明监督进程已退出
+            if not os.read(wake_fd, 1):
+                os._exit(0)
+            print(f"🚀 备用进程 {os.getpid()} 接管服务")
+
+        def lifeline():
+            # 监督进程退出（包括被 SIGKILL）后管道关闭，服务进程随之退出
+            while os.read(wake_fd, 1):
+                pass
+            os._exit(0)
+
+        threading.Thread(target=lifeline, name='vosk-standby-lifeline', daemon=True).start()
+        self.serve(self.listener.fileno())
+
+    def _on_restart(self, signum, frame):
+        """SIGHUP：让当前服务进程退出，主循环随即切换到 standby"""
+        if self.active is None:
+            return
+        print(f"🔄 收到重启信号，停止服务进程 {self.active.pid}")
+        os.kill(self.active.pid, signal.SIGTERM)
+
+    def _on_stop(self, signum, frame):
+        for child in (self.active, self.standby):
+            if child is not None:
+                try:
+                    os.kill(child.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+        raise SystemExit(0)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vosk 离线整段转写
+直接从内存中的 WAV 数据解析 PCM（不落盘），在静音处切分长录音，
+各片段使用独立识别器并行解码，最后按时间顺序拼接文本与词级时间戳。
+"""
+
+import io
+import json
+import wave
+
+import numpy as np
+
+
+class TranscriptionError(Exception):
+    """整段转写的请求错误，携带 HTTP 状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_wav(source, min_sample_rate=8000, max_sample_rate=48000):
+    """从文件对象或字节解析 16 位 PCM WAV，返回 (int16 单声道样本, 采样率)
+
+    多声道音频按声道取平均混为单声道。
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        with wave.open(source, 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            sample_rate = wf.getframerate()
+            if sample_width != 2 or not min_sample_rate <= sample_rate <= max_sample_rate:
+                raise TranscriptionError(
+                    f'音频格式不支持。需要: 16位, {min_sample_rate}-{max_sample_rate}Hz。'
+                    f'当前: {channels}声道, {sample_width * 8}位, {sample_rate}Hz',
+                    415,
+                )
+            frames = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise TranscriptionError(f'无法解析 WAV 文件: {e}', 400)
+
+    samples = np.frombuffer(frames, dtype='<i2')
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+        samples = samples.mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def split_at_silences(samples, sample_rate, min_seconds=10.0, max_seconds=30.0, frame_ms=30):
+    """将长录音切分为 [min_seconds, max_seconds] 之间的片段，返回 [(start, end)] 样本区间
+
+    每个切点取窗口内能量最低的帧，使切分尽量落在停顿处，避免把单词切成两半。
+    """
+    n = len(samples)
+    max_len = int(max_seconds * sample_rate)
+    if n <= max_len:
+        return [(0, n)] if n else []
+
+    frame_len = max(1, sample_rate * frame_ms // 1000)
+    n_frames = n // frame_len
+    frames = samples[:n_frames * frame_len].reshape(-1, frame_len).astype(np.float32)
+    energy = np.einsum('ij,ij->i', frames, frames)
+
+    min_frames = max(1, int(min_seconds * sample_rate) // frame_len)
+    max_frames = max(min_frames + 1, max_len // frame_len)
+    segments = []
+    start = 0
+    while n - start > max_len:
+        first = start // frame_len + min_frames
+        window = energy[first:start // frame_len + max_frames]
+        # 取窗口内能量最低帧的中点作为切点
+        cut = (first + int(np.argmin(window))) * frame_len + frame_len // 2
+        segments.append((start, cut))
+        start = cut
+    segments.append((start, n))
+    return segments
+
+
+def decode_segment(recognizer, pcm, offset_seconds, block_bytes=64000, cancelled=None):
+    """用一个独立识别器解码一个片段，返回其中各话段的文本与词（时间戳已加上片段偏移）
+
+    cancelled: 可选 callable() -> bool，每个音频块之前检查，返回 True 时放弃解码并返回 None
+    """
+    results = []
+    for pos in range(0, len(pcm), block_bytes):
+        if cancelled is not None and cancelled():
+            return None
+        if recognizer.AcceptWaveform(pcm[pos:pos + block_bytes]):
+            results.append(json.loads(recognizer.Result()))
+    results.append(json.loads(recognizer.FinalResult()))
+
+    utterances = []
+    for result in results:
+        words = result.get('result', [])
+        if not result.get('text') and not words:
+            continue
+        for word in words:
+            word['start'] = round(word['start'] + offset_seconds, 3)
+            word['end'] = round(word['end'] + offset_seconds, 3)
+        utterances.append({'text': result.get('text', ''), 'words': words})
+    return utterances
+
+
+def transcribe(samples, sample_rate, recognizer_factory, executor, min_segment_seconds=10.0,
+               max_segment_seconds=30.0):
+    """切分并在线程池中并行解码整段录音，返回拼接后的转写结果
+
+    Args:
+        samples: int16 单声道样本
+        sample_rate: 采样率
+        recognizer_factory: callable(sample_rate) -> 开启了 SetWords 的新识别器；每个片段一个
+        executor: 解码用的线程池（Vosk 调用期间释放 GIL）
+    """
+    segments = split_at_silences(samples, sample_rate, min_segment_seconds, max_segment_seconds)
+
+    def run(bounds):
+        start, end = bounds
+        recognizer = recognizer_factory(sample_rate)
+        return decode_segment(recognizer, samples[start:end].tobytes(), start / sample_rate)
+
+    decoded = list(executor.map(run, segments))
+
+    words = []
+    texts = []
+    segment_results = []
+    for (start, end), utterances in zip(segments, decoded):
+        segment_text = ' '.join(u['text'] for u in utterances if u['text'])
+        segment_results.append({
+            'start': round(start / sample_rate, 3),
+            'end': round(end / sample_rate, 3),
+            'text': segment_text,
+        })
+        if segment_text:
+            texts.append(segment_text)
+        for utterance in utterances:
+            words.extend(utterance['words'])
+
+    confidence = float(np.mean([w.get('conf', 0) for w in words])) if words else 0
+    return {
+        'text': ' '.join(texts),
+        'confidence': round(confidence, 3),
+        'words': words,
+        'segments': segment_results,
+        'duration': round(len(samples) / sample_rate, 3),
+    }
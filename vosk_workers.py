@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vosk 多进程解码
+前端进程在 fork 之前加载模型（子进程以写时复制共享模型内存），然后启动 N 个解码进程。
+每个会话按一致性哈希固定路由到同一个解码进程；音频经共享内存环形缓冲区传递，
+控制消息与结果经 Pipe 传递。意外退出的解码进程在原位置重新启动。
+"""
+
+import atexit
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+
+class WorkerError(Exception):
+    """解码进程返回的错误，携带 HTTP 状态码；session_lost 表示会话所在的解码进程已退出，会话状态丢失"""
+
+    def __init__(self, message, status=500, session_lost=False):
+        super().__init__(message)
+        self.status = status
+        self.session_lost = session_lost
+
+
+class HashRing:
+    """带虚拟节点的一致性哈希环，将会话ID映射到解码进程编号"""
+
+    def __init__(self, nodes, replicas=64):
+        self._ring = sorted(
+            (self._hash(f'{node}:{replica}'), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+    def lookup(self, key):
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[index][1]
+
+
+def _worker_main(index, conn, shm, handler, initializer):
+    """解码进程主循环：按顺序处理请求，结果按请求顺序返回"""
+    if initializer is not None:
+        initializer()
+    print(f"🧵 解码进程 {index} 已启动")
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        req_id, op, session_id, args, location = message
+        audio = None
+        if location is not None:
+            if location[0] == 'shm':
+                _, offset, length = location
+                # 从环形缓冲区复制一次，之后前端即可复用该区域
+                audio = bytes(shm.buf[offset:offset + length])
+            else:
+                audio = location[1]
+        try:
+            reply = (req_id, True, handler(op, session_id, args, audio))
+        except Exception as e:
+            reply = (req_id, False, (str(e), getattr(e, 'status', 500)))
+        try:
+            conn.send(reply)
+        except (EOFError, OSError):
+            break
+
+
+class _WorkerChannel:
+    """前端进程中与一个解码进程通信的通道
+
+    创建后先 start_process() 启动解码进程，再 start_reader() 启动读取线程；
+    解码进程退出时读取线程调用 on_exit(channel)。
+    """
+
+    def __init__(self, index, ctx, ring_bytes, handler, initializer, on_exit=None, restarts=0):
+        self.index = index
+        self.ring_size = ring_bytes
+        self.on_exit = on_exit
+        self.restarts = restarts
+        self.started_at = None
+        self.shm = shared_memory.SharedMemory(create=True, size=ring_bytes)
+        self.conn, self._child_conn = ctx.Pipe(duplex=True)
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(index, self._child_conn, self.shm, handler, initializer),
+            name=f'vosk-decoder-{index}',
+            daemon=True,
+        )
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending = {}
+        # 环形缓冲区使用单调递增的逻辑位置，取模得到物理偏移
+        self._write_pos = 0
+        self._read_pos = 0
+        self.alive = True
+        self.shm_messages = 0
+        self.inline_messages = 0
+        self._reader = threading.Thread(target=self._read_replies, name=f'vosk-decoder-{index}-reader', daemon=True)
+
+    def start_process(self):
+        self.process.start()
+        self._child_conn.close()
+        self.started_at = time.monotonic()
+
+    def start_reader(self):
+        self._reader.start()
+
+    def _reserve(self, length):
+        """在环形缓冲区中为 length 字节分配连续区域，空间不足时返回 None；需持有 _lock"""
+        if length > self.ring_size:
+            return None
+        start = self._write_pos
+        offset = start % self.ring_size
+        if offset + length > self.ring_size:
+            # 末尾剩余空间不足，跳过到缓冲区开头
+            start += self.ring_size - offset
+            offset = 0
+        end = start + length
+        if end - self._read_pos > self.ring_size:
+            return None
+        self._write_pos = end
+        return offset, end
+
+    def submit(self, op, session_id, args=(), audio=None):
+        future = Future()
+        with self._lock:
+            if not self.alive:
+                future.set_exception(WorkerError(f'解码进程 {self.index} 不可用', 503))
+                return future
+            req_id = next(self._ids)
+            location = None
+            end_pos = None
+            if audio is not None:
+                reserved = self._reserve(len(audio))
+                if reserved is not None:
+                    offset, end_pos = reserved
+                    self.shm.buf[offset:offset + len(audio)] = audio
+                    location = ('shm', offset, len(audio))
+                    self.shm_messages += 1
+                else:
+                    location = ('inline', bytes(audio))
+                    self.inline_messages += 1
+            self._pending[req_id] = (future, end_pos)
+            self.conn.send((req_id, op, session_id, args, location))
+        return future
+
+    def _read_replies(self):
+        while True:
+            try:
+                req_id, ok, payload = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future, end_pos = self._pending.pop(req_id)
+                if end_pos is not None:
+                    # 请求按顺序处理，该请求之前的环形缓冲区区域均已被读取
+                    self._read_pos = max(self._read_pos, end_pos)
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(WorkerError(*payload))
+
+        with self._lock:
+            self.alive = False
+            pending, self._pending = self._pending, {}
+        print(f"❌ 解码进程 {self.index} 已退出")
+        for future, _ in pending.values():
+            future.set_exception(WorkerError(f'解码进程 {self.index} 已退出', 503))
+        if self.on_exit is not None:
+            self.on_exit(self)
+
+    def describe(self):
+        with self._lock:
+            return {
+                'index': self.index,
+                'pid': self.process.pid,
+                'alive': self.alive and self.process.is_alive(),
+                'restarts': self.restarts,
+                'pending_requests': len(self._pending),
+                'ring_bytes': self.ring_size,
+                'ring_in_use_bytes': self._write_pos - self._read_pos,
+                'shm_messages': self.shm_messages,
+                'inline_messages': self.inline_messages,
+            }
+
+    def shutdown(self, timeout=2.0):
+        try:
+            with self._lock:
+                self.conn.send(None)
+        except (EOFError, OSError):
+            pass
+        self.process.join(timeout)
+        self.release()
+
+    def release(self):
+        """释放已退出（或未能启动）的解码进程的管道与共享内存"""
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.started_at is not None:
+            self.process.join(0.1)
+        self.conn.close()
+        self._child_conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class DecoderWorkerPool:
+    """N 个 fork 出的解码进程，按会话ID一致性哈希路由
+
+    必须在前端进程启动任何线程之前创建（fork 只复制调用线程），并在此之前加载模型，
+    使所有解码进程以写时复制方式共享模型内存。全部解码进程 fork 完成后才启动前端的读取线程。
+
+    解码进程意外退出时，其未完成的请求以 503 失败，并在后台重新启动一个解码进程占据同一哈希位置。
+    此前路由到该进程的会话状态已丢失：这些会话的下一个请求以 409（session_lost）失败，
+    客户端据此重新开始当前话段，之后的请求照常路由（重启完成前返回 503）。此时前端已有多个线程，
+    不能再安全地 fork，因此重启的解码进程以 spawn 方式启动，自行导入服务模块并加载模型，
+    不与其他解码进程共享模型内存。启动后很快再次退出的进程按指数退避延迟重启。
+
+    Args:
+        num_workers: 解码进程数量
+        handler: callable(op, session_id, args, audio) -> 可 pickle 的结果，在解码进程中执行；
+            抛出的异常以 (message, status) 形式转为前端的 WorkerError。须为模块级函数（spawn 重启时按名称导入）
+        initializer: 解码进程启动后调用一次（如启动会话回收与识别器池线程）
+        ring_bytes: 每个解码进程的共享内存环形缓冲区大小
+        respawn_delay: 重启前的初始等待秒数，连续重启时加倍
+        max_respawn_delay: 重启等待的上限；存活超过该时长的进程退出后重新从 respawn_delay 开始
+        session_ttl: 会话空闲多久后不再记录其所在的解码进程（应不短于解码进程回收空闲会话的时间）
+    """
+
+    def __init__(self, num_workers, handler, initializer=None, ring_bytes=4 * 1024 * 1024,
+                 respawn_delay=1.0, max_respawn_delay=60.0, session_ttl=600.0):
+        self._args = (ring_bytes, handler, initializer)
+        self._spawn = multiprocessing.get_context('spawn')
+        self.respawn_delay = respawn_delay
+        self.max_respawn_delay = max_respawn_delay
+        self._lock = threading.Lock()
+        self._closing = False
+        self._delays = {}
+        self.session_ttl = session_ttl
+        # 每个解码进程上的会话 -> 最近请求时间；进程退出时转入 _lost，会话的下一个请求报告 session_lost
+        self._sessions = [{} for _ in range(num_workers)]
+        self._lost = {}
+        self._pruned_at = time.monotonic()
+        self.sessions_lost = 0
+        ctx = multiprocessing.get_context('fork')
+        channels = []
+        # 逐个 fork（之前解码进程的子端管道已在前端关闭，进程退出时前端才能读到 EOF），
+        # 全部 fork 完成后再启动读取线程：每次 fork 时前端进程只有调用线程
+        for index in range(num_workers):
+            channel = self._channel(index, ctx)
+            channel.start_process()
+            channels.append(channel)
+        for channel in channels:
+            channel.start_reader()
+        self.channels = channels
+        self.ring = HashRing(range(num_workers))
+        atexit.register(self.shutdown)
+
+    def _channel(self, index, ctx, restarts=0):
+        ring_bytes, handler, initializer = self._args
+        return _WorkerChannel(index, ctx, ring_bytes, handler, initializer,
+                              on_exit=self._worker_exited, restarts=restarts)
+
+    def _worker_exited(self, channel):
+        """读取线程检测到解码进程退出：在后台线程中重启（重启可能需要数秒加载模型）"""
+        with self._lock:
+            if self._closing or channel not in self.channels:
+                return
+            lived = time.monotonic() - channel.started_at
+            delay = self._delays.get(channel.index, 0.0)
+            delay = self.respawn_delay if lived > self.max_respawn_delay or not delay else \
+                min(delay * 2, self.max_respawn_delay)
+            self._delays[channel.index] = delay
+            now = time.monotonic()
+            for session_id in self._sessions[channel.index]:
+                self._lost[session_id] = now
+            self.sessions_lost += len(self._sessions[channel.index])
+            self._sessions[channel.index] = {}
+        threading.Thread(target=self._respawn, args=(channel, delay),
+                         name=f'vosk-decoder-{channel.index}-respawn', daemon=True).start()
+
+    def _respawn(self, dead, delay):
+        time.sleep(delay)
+        with self._lock:
+            if self._closing:
+                return
+        print(f"🔄 重启解码进程 {dead.index}（第 {dead.restarts + 1} 次）")
+        channel = None
+        try:
+            channel = self._channel(dead.index, self._spawn, restarts=dead.restarts + 1)
+            channel.start_process()
+        except Exception as e:
+            print(f"❌ 解码进程 {dead.index} 重启失败: {e}")
+            if channel is not None:
+                channel.release()
+            # 启动失败按退出处理，退避后再次尝试
+            dead.started_at = time.monotonic()
+            self._worker_exited(dead)
+            return
+        with self._lock:
+            replaced = not self._closing
+            if replaced:
+                self.channels[dead.index] = channel
+        if replaced:
+            channel.start_reader()
+        else:
+            channel.shutdown()
+        dead.release()
+
+    def __len__(self):
+        return len(self.channels)
+
+    def channel_for(self, session_id):
+        return self.channels[self.ring.lookup(session_id)]
+
+    def call(self, op, session_id, args=(), audio=None, timeout=30.0, ends_session=False):
+        """将请求路由到会话所属的解码进程并等待结果
+
+        会话所在的解码进程退出后，该会话的第一个请求抛出 session_lost 的 WorkerError（409）；
+        ends_session 表示请求结束会话（如丢弃会话），此时不报告丢失，也不再记录该会话。
+        """
+        index = self.ring.lookup(session_id)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at > self.session_ttl:
+                self._prune(now)
+            lost = self._lost.pop(session_id, None) is not None
+            if ends_session:
+                self._sessions[index].pop(session_id, None)
+            elif not lost:
+                self._sessions[index][session_id] = now
+        if lost and not ends_session:
+            raise WorkerError(f'会话 {session_id} 所在的解码进程已退出，会话状态已丢失，请重新开始当前话段',
+                              409, session_lost=True)
+        return self.channels[index].submit(op, session_id, args, audio).result(timeout)
+
+    def _prune(self, now):
+        """忘记空闲超过 session_ttl 的会话（解码进程也已回收它们）；需持有 _lock"""
+        cutoff = now - self.session_ttl
+        for sessions in self._sessions + [self._lost]:
+            for session_id in [session_id for session_id, seen in sessions.items() if seen < cutoff]:
+                del sessions[session_id]
+        self._pruned_at = now
+
+    def broadcast(self, op, timeout=10.0):
+        """向所有解码进程发送请求，返回各进程的结果（失败的进程为 None）"""
+        futures = [channel.submit(op, None) for channel in self.channels]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout))
+            except Exception:
+                results.append(None)
+        return results
+
+    def describe(self):
+        return [channel.describe() for channel in self.channels]
+
+    def shutdown(self):
+        with self._lock:
+            self._closing = True
+            channels, self.channels = self.channels, []
+        for channel in channels:
+            channel.shutdown()